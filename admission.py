@@ -0,0 +1,201 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """An execution was not admitted; the caller should retry after `retry_after` seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Admission control for function executions in this API process
+
+    The process may run at most `budget` executions at once. Each function
+    can reserve slots out of that budget, which only it may use, and can be
+    capped at a maximum concurrency. Executions beyond a function's
+    reservation share whatever part of the budget is not reserved.
+
+    An execution that cannot start right away waits in a FIFO queue of at
+    most `queue_size` entries for up to `queue_timeout` seconds, and is
+    rejected with AdmissionRejected when the queue is full or the wait runs
+    out. Every released slot is offered to the oldest waiter that can use it,
+    so a function at its cap does not hold up the others.
+
+    All methods must be called from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        budget: int = 10,
+        queue_size: int = 100,
+        queue_timeout: float = 5.0,
+        retry_after: int = 1
+    ):
+        self.budget = budget
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._running: Dict[int, int] = {}
+        self._reserved: Dict[int, int] = {}
+        self._limits: Dict[int, Optional[int]] = {}
+        self._waiters: deque = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def configure(self, function_id: int, reserved: Optional[int], maximum: Optional[int]):
+        """Set a function's reserved and maximum concurrency (None or 0: no reservation / no cap)"""
+        self._reserved[function_id] = max(0, reserved or 0)
+        self._limits[function_id] = maximum or None
+        self._dispatch()
+
+    def forget(self, function_id: int):
+        self._reserved.pop(function_id, None)
+        self._limits.pop(function_id, None)
+        self._dispatch()
+
+    def reserved_total(self, exclude: Optional[int] = None) -> int:
+        return sum(n for function_id, n in self._reserved.items() if function_id != exclude)
+
+    @asynccontextmanager
+    async def admit(self, function):
+        """Hold an execution slot for `function` while the block runs; yields the queue wait in ms"""
+        waited_ms = await self.acquire(function)
+        try:
+            yield waited_ms
+        finally:
+            self.release(function.id)
+
+    async def acquire(self, function) -> float:
+        """
+        Take an execution slot for `function`, waiting in the queue if needed
+
+        Returns:
+            Time spent waiting in the queue, in milliseconds
+        """
+        function_id = function.id
+        # Keep limits current when another worker changed them
+        self.configure(
+            function_id,
+            getattr(function, "reserved_concurrency", None),
+            getattr(function, "max_concurrency", None)
+        )
+
+        # Waiters are only ever left queued when they cannot start, so
+        # starting right away cannot take a slot one of them could use
+        if self._try_start(function_id):
+            self.admitted += 1
+            return 0.0
+
+        if len(self._waiters) >= self.queue_size or self.queue_timeout <= 0:
+            self.rejected += 1
+            raise AdmissionRejected("Too many concurrent executions", self.retry_after)
+
+        self.queued += 1
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        entry = (function_id, future)
+        self._waiters.append(entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            # A slot may have been handed over just as the wait ran out
+            if not future.done():
+                self._remove_waiter(entry)
+                self.rejected += 1
+                raise AdmissionRejected(
+                    f"No execution slot became free within {self.queue_timeout} seconds",
+                    self.retry_after
+                )
+        except asyncio.CancelledError:
+            if future.done():
+                self.release(function_id)
+            else:
+                self._remove_waiter(entry)
+            raise
+
+        self.admitted += 1
+        return (time.perf_counter() - started) * 1000
+
+    def release(self, function_id: int):
+        running = self._running.get(function_id, 0) - 1
+        if running > 0:
+            self._running[function_id] = running
+        else:
+            self._running.pop(function_id, None)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "reserved": self.reserved_total(),
+            "running": sum(self._running.values()),
+            "shared_in_use": self._shared_in_use(),
+            "waiting": len(self._waiters),
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "by_function": {
+                function_id: {
+                    "running": running,
+                    "reserved": self._reserved.get(function_id, 0),
+                    "max": self._limits.get(function_id),
+                }
+                for function_id, running in self._running.items()
+            },
+        }
+
+    def _shared_in_use(self) -> int:
+        return sum(
+            max(0, running - self._reserved.get(function_id, 0))
+            for function_id, running in self._running.items()
+        )
+
+    def _try_start(self, function_id: int) -> bool:
+        running = self._running.get(function_id, 0)
+        limit = self._limits.get(function_id)
+        if limit is not None and running >= limit:
+            return False
+        if running >= self._reserved.get(function_id, 0):
+            # Beyond the reservation, draw from the unreserved part of the budget
+            if self._shared_in_use() >= self.budget - self.reserved_total():
+                return False
+        self._running[function_id] = running + 1
+        return True
+
+    def _dispatch(self):
+        """Hand free slots to waiters, oldest first"""
+        for entry in list(self._waiters):
+            function_id, future = entry
+            if future.done():
+                self._remove_waiter(entry)
+            elif self._try_start(function_id):
+                self._remove_waiter(entry)
+                future.set_result(None)
+
+    def _remove_waiter(self, entry):
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            pass
+
+
+admission = AdmissionController(
+    budget=int(os.getenv("HOST_CONCURRENCY_BUDGET", os.getenv("MAX_CONCURRENT_EXECUTIONS", "10"))),
+    queue_size=int(os.getenv("ADMISSION_QUEUE_SIZE", "100")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5")),
+    retry_after=int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+)
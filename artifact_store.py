@@ -0,0 +1,137 @@
+import hashlib
+import os
+import py_compile
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Iterable, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    """
+    Content-addressed store of function code on the host
+
+    Each artifact lives in `<root>/<key>/` where the key is a hash of the
+    language and code, so identical code is written exactly once. The root is
+    bind-mounted read-only into runner containers. Python artifacts also carry
+    bytecode in `__pycache__` when the host interpreter matches the runner's,
+    so the runner can skip compiling the source.
+    """
+
+    filenames = {
+        "python": "function.py",
+        "javascript": "function.js",
+    }
+
+    def __init__(self, root: str, python_cache_tag: str = "cpython-310"):
+        self.root = os.path.abspath(root)
+        self.python_cache_tag = python_cache_tag
+        self._known: Set[str] = set()
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def key(language: str, code: str) -> str:
+        """Content address of a piece of code"""
+        return hashlib.sha256(f"{language}\0{code}".encode('utf-8')).hexdigest()
+
+    def relative_path(self, language: str, key: str) -> str:
+        """Path of the code file relative to the store root"""
+        return os.path.join(key, self.filenames[language])
+
+    def put(self, language: str, code: str) -> str:
+        """Make sure the artifact for `code` exists and return its key"""
+        key = self.key(language, code)
+        if key in self._known:
+            return key
+
+        target = os.path.join(self.root, key)
+        if not os.path.isdir(target):
+            self._write(target, language, code)
+
+        with self._lock:
+            self._known.add(key)
+        return key
+
+    def collect_garbage(self, live_keys: Iterable[str], min_age: float = 3600) -> int:
+        """
+        Remove artifacts not in `live_keys`
+
+        Artifacts younger than `min_age` seconds are kept so that one written
+        for an invocation racing with the collection is not pulled out from
+        under it. Returns the number of artifacts removed.
+        """
+        live = set(live_keys)
+        cutoff = time.time() - min_age
+        removed = 0
+
+        for entry in os.scandir(self.root):
+            if entry.name in live or not entry.is_dir():
+                continue
+            try:
+                if entry.stat().st_mtime > cutoff:
+                    continue
+                with self._lock:
+                    self._known.discard(entry.name)
+                shutil.rmtree(entry.path)
+                removed += 1
+            except OSError as e:
+                logger.error(f"Failed to remove artifact {entry.name}: {str(e)}")
+
+        if removed:
+            logger.info(f"Removed {removed} unreferenced code artifacts")
+        return removed
+
+    def _write(self, target: str, language: str, code: str):
+        # Build in a scratch directory and rename into place so readers never
+        # see a half-written artifact
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            code_file = os.path.join(staging, self.filenames[language])
+            with open(code_file, "w") as f:
+                f.write(code)
+
+            if language == "python":
+                self._compile_python(code_file)
+
+            for root, dirs, files in os.walk(staging):
+                os.chmod(root, 0o755)
+                for name in files:
+                    os.chmod(os.path.join(root, name), 0o644)
+
+            try:
+                os.rename(staging, target)
+            except OSError:
+                # Another writer got there first; its copy is identical
+                if not os.path.isdir(target):
+                    raise
+        finally:
+            if os.path.isdir(staging):
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def _compile_python(self, code_file: str):
+        """Precompile bytecode when the host Python matches the runner's"""
+        if sys.implementation.cache_tag != self.python_cache_tag:
+            return
+
+        name = os.path.splitext(os.path.basename(code_file))[0]
+        cfile = os.path.join(
+            os.path.dirname(code_file), "__pycache__", f"{name}.{self.python_cache_tag}.pyc"
+        )
+        try:
+            # The source never changes under a content address, so the
+            # runner can trust the bytecode without checking it
+            py_compile.compile(
+                code_file,
+                cfile=cfile,
+                doraise=True,
+                invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH
+            )
+        except py_compile.PyCompileError as e:
+            # Syntax errors are reported by the runner when it loads the code
+            logger.info(f"Skipping bytecode for {code_file}: {e.msg}")
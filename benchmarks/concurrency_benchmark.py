@@ -0,0 +1,82 @@
+"""
+Measure how execution throughput scales with the number of concurrent invocations
+
+Runs a handler that sleeps for a fixed time through DockerManager at several
+concurrency levels and prints invocations per second for each. With a
+non-blocking execution path throughput should grow roughly linearly with N
+until MAX_CONCURRENT_EXECUTIONS or POOL_MAX_SIZE is reached.
+
+Requires a running Docker daemon:
+
+    python benchmarks/concurrency_benchmark.py --levels 1 2 4 8 --requests 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docker_manager import DockerManager
+
+SLEEP_HANDLER = """
+import time
+
+def handler(event, context):
+    time.sleep(event.get("work_seconds", 0.2))
+    return {"ok": True}
+"""
+
+
+async def run_level(manager: DockerManager, concurrency: int, requests: int, work_seconds: float):
+    """Run `requests` invocations with at most `concurrency` in flight"""
+    gate = asyncio.Semaphore(concurrency)
+
+    async def invoke():
+        async with gate:
+            return await manager.execute_function(
+                function_id="bench",
+                function_name="concurrency-benchmark",
+                language="python",
+                code=SLEEP_HANDLER,
+                event={"work_seconds": work_seconds},
+                timeout=30000
+            )
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(invoke() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for result in results if result.get("error"))
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--work-seconds", type=float, default=0.2)
+    args = parser.parse_args()
+
+    manager = DockerManager()
+    manager.prepare()
+    try:
+        # Warm up so the first level does not pay for container creation
+        await run_level(manager, max(args.levels), max(args.levels), 0)
+
+        for level in args.levels:
+            print(json.dumps(await run_level(manager, level, args.requests, args.work_seconds)))
+    finally:
+        manager.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,339 @@
+"""
+In-process stand-in for the Docker client, for running the platform without a daemon
+
+Each "container" runs the real runner entrypoint from docker-runners/ as a
+host subprocess, and its attach socket carries the same multiplexed
+stdout/stderr frames the Docker API produces, so DockerManager, the
+container pool and RunnerClient run unmodified. Select it with
+
+    DOCKER_CLIENT_FACTORY=fake_docker:create_client
+
+(with benchmarks/ on sys.path). Because runners see the host filesystem,
+RUNNER_ARTIFACT_MOUNT must be set to ARTIFACT_DIR and RUNNER_PAYLOAD_MOUNT to
+PAYLOAD_DIR. Resource limits are
+ignored (stats report the runner process's own usage), and functions with dependencies are not supported since images
+are not really built.
+
+FAKE_DOCKER_START_LATENCY_MS adds a fixed delay to every container start,
+to approximate the create/start cost of a real daemon. Each client is a
+separate host, so DOCKER_HOSTS can list any names to simulate several
+daemons; hosts named in FAKE_DOCKER_DOWN_HOSTS fail to respond until
+removed from that variable. FAKE_DOCKER_BUILD_LATENCY_MS delays every image
+build, to approximate preparing runner images at startup.
+FAKE_DOCKER_REMOVE_LATENCY_MS likewise delays every container removal.
+"""
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional, List
+
+import docker
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNNERS = os.path.join(ROOT, "docker-runners")
+
+# Command used to start a runner for each language
+RUNNER_COMMANDS = {
+    "python": [sys.executable, os.path.join(RUNNERS, "python-runner", "entrypoint.py")],
+    "javascript": ["node", os.path.join(RUNNERS, "javascript-runner", "entrypoint.js")],
+}
+
+# Runner build context directory -> language
+RUNNER_DIRECTORIES = {
+    "python-runner": "python",
+    "javascript-runner": "javascript",
+}
+
+STDOUT = 1
+STDERR = 2
+
+
+class FakeImage:
+    def __init__(self, tag: str, language: str, labels: Optional[Dict[str, str]] = None):
+        self.id = "sha256:" + uuid.uuid4().hex
+        self.tags = [tag]
+        self.labels = dict(labels or {}, **{"serverless.language": language})
+        self.attrs = {"Id": self.id, "RepoTags": self.tags}
+
+
+class FakeImages:
+    """Image registry that remembers which runner language each tag resolves to"""
+
+    def __init__(self, build_latency: float = 0.0):
+        self.build_latency = build_latency
+        self._images: Dict[str, FakeImage] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> FakeImage:
+        with self._lock:
+            image = self._images.get(name)
+        if image is None:
+            raise docker.errors.ImageNotFound(f"No such image: {name}")
+        return image
+
+    def build(self, path: str, tag: str, **kwargs):
+        """Register `tag`, inheriting the language of the runner directory or FROM image"""
+        language = RUNNER_DIRECTORIES.get(os.path.basename(os.path.normpath(path)))
+        if language is None:
+            with open(os.path.join(path, "Dockerfile")) as f:
+                parent = f.readline().split()[1]
+            language = self.get(parent).labels["serverless.language"]
+
+        time.sleep(self.build_latency)
+        image = FakeImage(tag, language, kwargs.get("labels"))
+        with self._lock:
+            self._images[tag] = image
+        return image, iter(())
+
+    def language_of(self, name: str) -> str:
+        return self.get(name).labels["serverless.language"]
+
+
+class FakeSocket:
+    """The client end of a container's attach socket"""
+
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+
+    def fileno(self) -> int:
+        return self._sock.fileno()
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+
+class FakeContainer:
+    """A runner subprocess behind a Docker-compatible attach socket"""
+
+    def __init__(self, client: "FakeDockerClient", image: str, name: str, command: List[str], **options):
+        self.client = client
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.image = image
+        self.labels = options.get("labels") or {}
+        self.options = options
+        self.status = "running"
+
+        env = dict(os.environ)
+        env.update(options.get("environment") or {})
+        self._client_end, self._container_end = socket.socketpair()
+        self._logs = bytearray()
+        self._process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+        )
+        self._send_lock = threading.Lock()
+        for pipe, stream in ((self._process.stdout, STDOUT), (self._process.stderr, STDERR)):
+            threading.Thread(target=self._pump_output, args=(pipe, stream), daemon=True).start()
+        threading.Thread(target=self._pump_input, daemon=True).start()
+
+    @property
+    def attrs(self) -> Dict[str, Any]:
+        return {
+            "Id": self.id,
+            "Name": "/" + self.name,
+            "State": {"Status": self.status, "Pid": self._process.pid},
+            "Config": {"Labels": self.labels, "Image": self.image},
+        }
+
+    def _pump_output(self, pipe, stream: int):
+        """Forward runner output as Docker stream frames"""
+        fd = pipe.fileno()
+        while True:
+            data = os.read(fd, 65536)
+            if not data:
+                break
+            if stream == STDERR:
+                self._logs.extend(data)
+            try:
+                with self._send_lock:
+                    self._container_end.sendall(struct.pack(">BxxxI", stream, len(data)) + data)
+            except OSError:
+                break
+
+    def _pump_input(self):
+        """Forward bytes written to the attach socket to the runner's stdin"""
+        while True:
+            try:
+                data = self._container_end.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            try:
+                self._process.stdin.write(data)
+                self._process.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                break
+        try:
+            self._process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def attach_socket(self, params: Optional[Dict[str, Any]] = None) -> FakeSocket:
+        return FakeSocket(self._client_end)
+
+    def reload(self):
+        if self.status == "running" and self._process.poll() is not None:
+            self.status = "exited"
+
+    def stats(self, stream: bool = False, one_shot: bool = False) -> Dict[str, Any]:
+        """Memory and CPU counters of the runner process, in the Docker stats layout"""
+        pid = self._process.pid
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, StopIteration):
+            raise docker.errors.APIError(f"Container {self.name} is not running")
+        # utime and stime, in clock ticks
+        ticks = int(fields[11]) + int(fields[12])
+        return {
+            "memory_stats": {"usage": rss_kb * 1024, "stats": {}},
+            "cpu_stats": {"cpu_usage": {"total_usage": ticks * 10 ** 9 // os.sysconf("SC_CLK_TCK")}},
+        }
+    
+    def logs(self, stdout: bool = True, stderr: bool = True, **kwargs) -> bytes:
+        return bytes(self._logs) if stderr else b""
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        try:
+            code = self._process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(f"Container {self.name} still running")
+        self.reload()
+        return {"StatusCode": code}
+
+    def kill(self, signal=None):
+        self._process.kill()
+        self._process.wait()
+        self.status = "exited"
+
+    def stop(self, timeout: int = 10):
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self.status = "exited"
+
+    def remove(self, force: bool = False):
+        if self.status == "removed":
+            raise docker.errors.NotFound(f"No such container: {self.name}")
+        if self._process.poll() is None:
+            if not force:
+                raise docker.errors.APIError(f"Container {self.name} is running")
+            self.kill()
+        if self.client.remove_latency:
+            time.sleep(self.client.remove_latency)
+        for sock in (self._container_end, self._client_end):
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self.status = "removed"
+        self.client.containers._forget(self)
+
+
+class FakeContainers:
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+        self._containers: Dict[str, FakeContainer] = {}
+        self._lock = threading.Lock()
+
+    def run(self, image: str, name: Optional[str] = None, detach: bool = True, **options) -> FakeContainer:
+        language = self.client.images.language_of(image)
+        if self.client.start_latency:
+            time.sleep(self.client.start_latency)
+
+        container = FakeContainer(
+            self.client, image, name or f"fake-{uuid.uuid4().hex[:12]}",
+            RUNNER_COMMANDS[language], **options
+        )
+        with self._lock:
+            self._containers[container.id] = container
+        return container
+
+    def get(self, container_id: str) -> FakeContainer:
+        with self._lock:
+            for container in self._containers.values():
+                if container_id in (container.id, container.name):
+                    return container
+        raise docker.errors.NotFound(f"No such container: {container_id}")
+
+    def list(self, all: bool = False, filters: Optional[Dict[str, Any]] = None) -> List[FakeContainer]:
+        labels = (filters or {}).get("label", [])
+        if isinstance(labels, str):
+            labels = [labels]
+
+        with self._lock:
+            containers = list(self._containers.values())
+        for container in containers:
+            container.reload()
+
+        def matches(container: FakeContainer) -> bool:
+            for label in labels:
+                key, _, value = label.partition("=")
+                if key not in container.labels or (value and container.labels[key] != value):
+                    return False
+            return True
+
+        return [
+            container for container in containers
+            if (all or container.status == "running") and matches(container)
+        ]
+
+    def _forget(self, container: FakeContainer):
+        with self._lock:
+            self._containers.pop(container.id, None)
+
+
+class FakeDockerClient:
+    """Subset of docker.DockerClient used by the platform"""
+
+    def __init__(
+        self,
+        start_latency: float = 0.0,
+        base_url: Optional[str] = None,
+        build_latency: float = 0.0,
+        remove_latency: float = 0.0
+    ):
+        self.start_latency = start_latency
+        self.remove_latency = remove_latency
+        self.base_url = base_url
+        self.images = FakeImages(build_latency)
+        self.containers = FakeContainers(self)
+
+    def ping(self) -> bool:
+        down = [host.strip() for host in os.getenv("FAKE_DOCKER_DOWN_HOSTS", "").split(",")]
+        if self.base_url is not None and self.base_url in down:
+            raise docker.errors.APIError(f"Cannot connect to {self.base_url}")
+        return True
+
+    def close(self):
+        for container in self.containers.list(all=True):
+            container.remove(force=True)
+
+
+def create_client(base_url: Optional[str] = None) -> FakeDockerClient:
+    """Factory for DOCKER_CLIENT_FACTORY, configured from the environment"""
+    return FakeDockerClient(
+        start_latency=float(os.getenv("FAKE_DOCKER_START_LATENCY_MS", "0")) / 1000,
+        base_url=base_url,
+        build_latency=float(os.getenv("FAKE_DOCKER_BUILD_LATENCY_MS", "0")) / 1000,
+        remove_latency=float(os.getenv("FAKE_DOCKER_REMOVE_LATENCY_MS", "0")) / 1000
+    )
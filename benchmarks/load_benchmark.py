@@ -0,0 +1,278 @@
+"""
+Load test the execute endpoint and report latency percentiles and throughput
+
+Drives the FastAPI app in-process (over httpx's ASGI transport) at several
+concurrency levels and event payload sizes, for Python and/or JavaScript
+handlers, on the warm path (pooled containers are reused) and the cold path
+(every invocation gets a freshly started container). Each mode runs in its
+own subprocess with a fresh SQLite database and artifact directory.
+
+By default Docker is replaced by the in-process fake from fake_docker.py,
+so no daemon is needed; pass --docker to run against the real daemon, and
+--hosts N to spread executions over N fake daemons.
+Results are printed as a table and can be written as JSON with --output;
+--baseline compares against a previous JSON result:
+
+    python benchmarks/load_benchmark.py --concurrency 1 8 32 --payload-bytes 100 100000 \\
+        --output bench.json
+    python benchmarks/load_benchmark.py --baseline bench.json
+
+Requires httpx.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+HANDLERS = {
+    "python": (
+        "def handler(event, context):\n"
+        "    payload = event.get('payload', '')\n"
+        "    return {'size': len(payload), 'echo': payload if event.get('echo') else None}\n"
+    ),
+    "javascript": (
+        "exports.handler = async (event, context) => {\n"
+        "  const payload = event.payload || '';\n"
+        "  return {size: payload.length, echo: event.echo ? payload : null};\n"
+        "};\n"
+    ),
+}
+
+# Pool settings that make every invocation start a new container
+COLD_ENVIRONMENT = {"POOL_MIN_SIZE": "0", "POOL_MAX_USES": "1"}
+
+# Fields that identify one measurement across runs
+RESULT_KEY = ("mode", "language", "concurrency", "payload_bytes")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(latencies) / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50), 3),
+        "p95_ms": round(percentile(ordered, 0.95), 3),
+        "p99_ms": round(percentile(ordered, 0.99), 3),
+        "max_ms": round(ordered[-1], 3) if ordered else 0.0,
+    }
+
+
+async def run_level(client, route: str, concurrency: int, requests: int, event: Dict[str, Any]):
+    """Send `requests` invocations with at most `concurrency` in flight"""
+    gate = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def invoke():
+        nonlocal errors
+        async with gate:
+            started = time.perf_counter()
+            response = await client.post(f"/api/functions/{route}/execute", json={"event": event})
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200 or response.json().get("error"):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(invoke() for _ in range(requests)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run_mode(args) -> List[Dict[str, Any]]:
+    """Benchmark one mode inside this process; the environment is already configured"""
+    import httpx
+    import main
+
+    await main.app.router.startup()
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            # Runner images are prepared in the background after startup
+            while (await client.get("/ready")).status_code != 200:
+                await asyncio.sleep(0.1)
+
+            for language in args.languages:
+                route = f"bench-{language}"
+                response = await client.post("/api/functions/", json={
+                    "name": route,
+                    "route": "/" + route,
+                    "language": language,
+                    "code": HANDLERS[language],
+                    "timeout": 60000,
+                })
+                response.raise_for_status()
+
+                for payload_bytes in args.payload_bytes:
+                    event = {"payload": "x" * payload_bytes, "echo": args.echo}
+                    if args.mode == "warm":
+                        # Bring the pool up to the highest concurrency first
+                        await run_level(client, route, max(args.concurrency), max(args.concurrency), event)
+
+                    for concurrency in args.concurrency:
+                        result = await run_level(client, route, concurrency, args.requests, event)
+                        result.update(
+                            mode=args.mode,
+                            language=language,
+                            concurrency=concurrency,
+                            payload_bytes=payload_bytes,
+                        )
+                        results.append(result)
+    finally:
+        await main.app.router.shutdown()
+    return results
+
+
+def run_mode_subprocess(mode: str, args, workdir: str) -> List[Dict[str, Any]]:
+    """Run one mode in a fresh interpreter so module-level state starts clean"""
+    modedir = os.path.join(workdir, mode)
+    os.makedirs(modedir)
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(modedir, 'db.sqlite3')}",
+        "ARTIFACT_DIR": os.path.join(modedir, "artifacts"),
+        "PAYLOAD_DIR": os.path.join(modedir, "payloads"),
+        "RESULT_CACHE_BACKEND": "memory",
+        "POOL_MAX_SIZE": str(max(args.concurrency)),
+        "MAX_CONCURRENT_EXECUTIONS": str(max(args.concurrency)),
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, BENCH_DIR, env.get("PYTHONPATH")])),
+    })
+    if not args.docker:
+        env.update({
+            "DOCKER_CLIENT_FACTORY": "fake_docker:create_client",
+            "FAKE_DOCKER_START_LATENCY_MS": str(args.start_latency_ms),
+            # Fake runners read artifacts straight from the host
+            "RUNNER_ARTIFACT_MOUNT": env["ARTIFACT_DIR"],
+            "RUNNER_PAYLOAD_MOUNT": env["PAYLOAD_DIR"],
+            "RUNNER_PYTHON_CACHE_TAG": sys.implementation.cache_tag,
+        })
+        if args.hosts > 1:
+            env["DOCKER_HOSTS"] = ",".join(f"fake://host-{i}" for i in range(1, args.hosts + 1))
+    if mode == "cold":
+        env.update(COLD_ENVIRONMENT)
+
+    command = [sys.executable, os.path.abspath(__file__), "--run-mode", mode] + args.forwarded
+    completed = subprocess.run(command, env=env, stdout=subprocess.PIPE, cwd=modedir)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{mode} benchmark exited with status {completed.returncode}")
+    return json.loads(completed.stdout.decode("utf-8").strip().splitlines()[-1])
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+        ).stdout.decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def print_table(results: List[Dict[str, Any]], baseline: Dict[tuple, Dict[str, Any]]):
+    header = f"{'mode':<5} {'lang':<10} {'conc':>5} {'payload':>9} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'err':>5}"
+    print(header)
+    for result in results:
+        line = (
+            f"{result['mode']:<5} {result['language']:<10} {result['concurrency']:>5} "
+            f"{result['payload_bytes']:>9} {result['throughput_rps']:>9.1f} {result['p50_ms']:>9.2f} "
+            f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>5}"
+        )
+        previous = baseline.get(tuple(result[field] for field in RESULT_KEY))
+        if previous is not None and previous["p99_ms"] and previous["throughput_rps"]:
+            line += (
+                f"   rps {100 * (result['throughput_rps'] / previous['throughput_rps'] - 1):+.1f}%"
+                f"  p99 {100 * (result['p99_ms'] / previous['p99_ms'] - 1):+.1f}%"
+            )
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", nargs="+", choices=["warm", "cold"], default=["warm", "cold"])
+    parser.add_argument("--languages", nargs="+", choices=sorted(HANDLERS), default=["python"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--payload-bytes", type=int, nargs="+", default=[100, 10000])
+    parser.add_argument("--requests", type=int, default=200, help="invocations per measurement")
+    parser.add_argument("--echo", action="store_true", help="return the payload in the result")
+    parser.add_argument("--start-latency-ms", type=float, default=0,
+                        help="simulated container start time of the fake Docker client")
+    parser.add_argument("--docker", action="store_true", help="use the real Docker daemon")
+    parser.add_argument("--hosts", type=int, default=1, help="number of fake Docker hosts")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="previous JSON result to compare against")
+    parser.add_argument("--run-mode", choices=["warm", "cold"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.mode = args.run_mode
+
+    # Options passed through to the per-mode subprocesses
+    args.forwarded = [
+        "--languages", *args.languages,
+        "--concurrency", *map(str, args.concurrency),
+        "--payload-bytes", *map(str, args.payload_bytes),
+        "--requests", str(args.requests),
+    ] + (["--echo"] if args.echo else [])
+    return args
+
+
+def main():
+    args = parse_args()
+
+    if args.run_mode:
+        results = asyncio.run(run_mode(args))
+        # The parent reads the last line; anything logged before it is ignored
+        sys.stdout.write(json.dumps(results) + "\n")
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="serverless-bench-") as workdir:
+        for mode in args.modes:
+            results.extend(run_mode_subprocess(mode, args, workdir))
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            for result in json.load(f)["results"]:
+                baseline[tuple(result[field] for field in RESULT_KEY)] = result
+
+    print_table(results, baseline)
+
+    if args.output:
+        report = {
+            "meta": {
+                "revision": git_revision(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "backend": "docker" if args.docker else "fake",
+                "start_latency_ms": args.start_latency_ms,
+                "hosts": args.hosts,
+                "requests": args.requests,
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
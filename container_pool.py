@@ -0,0 +1,379 @@
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Set
+import logging
+
+import docker
+
+logger = logging.getLogger(__name__)
+
+# Label applied to every container the platform creates so they can be found again
+MANAGED_LABEL = "serverless.managed"
+# Label naming the platform instance that created a container
+OWNER_LABEL = "serverless.owner"
+
+
+class PooledContainer:
+    """A runner container owned by the pool, either idle or checked out"""
+
+    def __init__(self, container, key: str, runner=None):
+        self.container = container
+        self.key = key
+        self.runner = runner
+        self.uses = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    @property
+    def name(self) -> str:
+        return self.container.name
+
+
+class ContainerPool:
+    """
+    Pool of pre-created, idle runner containers keyed by language or image
+
+    Containers are started as long-lived runners and `connect` is called on
+    each new container to open the client used to talk to it. Callers check
+    a container out, run their work inside it and hand it back; the pool
+    recycles containers after `max_uses`, evicts idle ones above `min_size`
+    after `idle_timeout` seconds and health checks the idle set from a
+    background maintenance thread.
+
+    Discarded containers are handed to `reaper` for removal in the
+    background when one is given, and removed inline otherwise. Containers
+    are labelled with `owner` so a reaper sweeping a shared daemon only
+    considers this instance's containers.
+    """
+
+    def __init__(
+        self,
+        client,
+        min_size: int = 1,
+        max_size: int = 10,
+        idle_timeout: float = 300,
+        max_uses: int = 100,
+        maintenance_interval: float = 30,
+        container_options: Optional[Dict[str, Any]] = None,
+        connect: Optional[Callable] = None,
+        reaper=None,
+        owner: Optional[str] = None
+    ):
+        self.client = client
+        self.connect = connect
+        self.reaper = reaper
+        self.owner = owner
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+        self.maintenance_interval = maintenance_interval
+        self.container_options = container_options or {}
+
+        self._images: Dict[str, str] = {}
+        self._options: Dict[str, Dict[str, Any]] = {}
+        self._min_sizes: Dict[str, int] = {}
+        self._idle: Dict[str, deque] = {}
+        self._total: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        # Ids of every container created and not yet destroyed
+        self._owned: Set[str] = set()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(
+        self,
+        key: str,
+        image: str,
+        min_size: Optional[int] = None,
+        container_options: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Register a pool for `key` backed by `image`
+
+        `min_size` overrides the pool-wide minimum for this key, e.g. 0 for
+        per-function images that should only be kept warm while in use, and
+        `container_options` override the pool-wide ones (e.g. resource limits).
+        """
+        with self._cond:
+            self._images[key] = image
+            self._options[key] = container_options or {}
+            self._min_sizes[key] = self.min_size if min_size is None else min_size
+            self._idle.setdefault(key, deque())
+            self._total.setdefault(key, 0)
+            self._stats.setdefault(key, {
+                "hits": 0,
+                "misses": 0,
+                "created": 0,
+                "recycled": 0,
+                "evicted": 0,
+                "unhealthy": 0,
+            })
+
+    def start(self):
+        """Fill every pool up to `min_size` and start the maintenance thread"""
+        for key in list(self._images):
+            self._fill(key)
+
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._maintenance_loop, name="container-pool", daemon=True
+            )
+            self._thread.start()
+
+    def fill(self, key: str):
+        """Create containers for `key` up to its minimum now, instead of on first use"""
+        self._fill(key)
+
+    def is_registered(self, key: str) -> bool:
+        return key in self._images
+
+    def idle_count(self, key: str) -> int:
+        """Number of warm containers waiting for `key`"""
+        idle = self._idle.get(key)
+        return len(idle) if idle is not None else 0
+
+    def owns(self, container_id: str) -> bool:
+        """Whether a container was created by this pool and is still in use or idle"""
+        with self._cond:
+            return container_id in self._owned
+
+    def checkout(self, key: str, timeout: float) -> PooledContainer:
+        """
+        Check out a warm container for `key`
+
+        Returns an idle container when one is available (a hit). Otherwise a
+        new container is created if the pool is below `max_size` (a miss), or
+        the call waits up to `timeout` seconds for one to be released.
+        """
+        if key not in self._images:
+            raise ValueError(f"No container pool registered for {key}")
+
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                idle = self._idle[key]
+                if idle:
+                    pooled = idle.pop()
+                    self._stats[key]["hits"] += 1
+                    return pooled
+
+                if self._total[key] < self.max_size:
+                    # Reserve the slot before creating outside the lock
+                    self._total[key] += 1
+                    self._stats[key]["misses"] += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No warm container available for {key}")
+                self._cond.wait(remaining)
+
+        try:
+            return self._create(key)
+        except Exception:
+            with self._cond:
+                self._total[key] -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, pooled: PooledContainer, healthy: bool = True):
+        """Return a container to the pool, or discard it if spent or unhealthy"""
+        pooled.uses += 1
+        pooled.last_used = time.monotonic()
+
+        recycle = pooled.uses >= self.max_uses
+        with self._cond:
+            if healthy and not recycle and not self._stop.is_set():
+                self._idle[pooled.key].append(pooled)
+                self._cond.notify()
+                return
+
+            self._total[pooled.key] -= 1
+            if recycle:
+                self._stats[pooled.key]["recycled"] += 1
+            elif not healthy:
+                self._stats[pooled.key]["unhealthy"] += 1
+            self._cond.notify()
+
+        self._destroy(pooled)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-key hit/miss counters and current pool sizes"""
+        with self._cond:
+            result = {}
+            for key, counters in self._stats.items():
+                lookups = counters["hits"] + counters["misses"]
+                result[key] = dict(
+                    counters,
+                    idle=len(self._idle[key]),
+                    busy=self._total[key] - len(self._idle[key]),
+                    total=self._total[key],
+                    hit_ratio=counters["hits"] / lookups if lookups else 0.0,
+                )
+            return result
+
+    def shutdown(self):
+        """Stop maintenance and remove every idle container"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+        with self._cond:
+            drained = []
+            for key, idle in self._idle.items():
+                while idle:
+                    drained.append(idle.pop())
+                    self._total[key] -= 1
+
+        for pooled in drained:
+            self._destroy(pooled)
+
+    def maintain(self):
+        """
+        Evict idle containers, drop unhealthy ones and refill to `min_size`
+
+        Idle containers are health checked one at a time, each taken out of
+        the pool only for its own check, so checkouts meanwhile still find
+        the others. Containers used within the last `maintenance_interval`
+        seconds are not checked, since their last invocation just ran.
+        """
+        for key in list(self._images):
+            with self._cond:
+                candidates = [
+                    pooled for pooled in self._idle[key]
+                    if time.monotonic() - pooled.last_used >= self.maintenance_interval
+                ]
+
+            for pooled in candidates:
+                with self._cond:
+                    idle = self._idle[key]
+                    if pooled not in idle:
+                        # Checked out meanwhile
+                        continue
+                    idle.remove(pooled)
+
+                healthy = self._is_healthy(pooled)
+                with self._cond:
+                    if healthy and not self._stop.is_set():
+                        # Back at the cold end, behind recently used containers
+                        idle.appendleft(pooled)
+                        self._cond.notify()
+                        continue
+                    self._total[key] -= 1
+                    if not healthy:
+                        self._stats[key]["unhealthy"] += 1
+                    self._cond.notify_all()
+                self._destroy(pooled)
+
+            now = time.monotonic()
+            with self._cond:
+                idle = self._idle[key]
+                surplus = self._total[key] - self._min_sizes[key]
+                evicted = []
+                # Oldest-used first so the most recently used stay warm
+                for pooled in sorted(idle, key=lambda p: p.last_used):
+                    if surplus <= 0 or now - pooled.last_used < self.idle_timeout:
+                        break
+                    idle.remove(pooled)
+                    evicted.append(pooled)
+                    surplus -= 1
+                self._total[key] -= len(evicted)
+                self._stats[key]["evicted"] += len(evicted)
+
+            for pooled in evicted:
+                self._destroy(pooled)
+
+            self._fill(key)
+
+    def _maintenance_loop(self):
+        while not self._stop.wait(self.maintenance_interval):
+            try:
+                self.maintain()
+            except Exception as e:
+                logger.error(f"Container pool maintenance failed: {str(e)}")
+
+    def _fill(self, key: str):
+        """Create containers until the pool for `key` reaches `min_size`"""
+        while True:
+            with self._cond:
+                if self._stop.is_set() or self._total[key] >= self._min_sizes[key]:
+                    return
+                self._total[key] += 1
+
+            try:
+                pooled = self._create(key)
+            except Exception as e:
+                with self._cond:
+                    self._total[key] -= 1
+                logger.error(f"Failed to pre-create container for {key}: {str(e)}")
+                return
+
+            with self._cond:
+                self._idle[key].append(pooled)
+                self._cond.notify()
+
+    def _create(self, key: str) -> PooledContainer:
+        image = self._images[key]
+        # Keys may be image tags; container names only allow [a-zA-Z0-9_.-]
+        safe_key = re.sub(r"[^a-zA-Z0-9_.-]", "-", key)
+        container_name = f"function-{safe_key}-{str(uuid.uuid4())[:8]}"
+        container = self.client.containers.run(
+            image=image,
+            name=container_name,
+            detach=True,
+            labels=self._labels(key),
+            **dict(self.container_options, **self._options[key])
+        )
+        with self._cond:
+            self._owned.add(container.id)
+        pooled = PooledContainer(container, key)
+        try:
+            if self.connect is not None:
+                pooled.runner = self.connect(container)
+        except Exception:
+            self._destroy(pooled)
+            raise
+
+        with self._cond:
+            self._stats[key]["created"] += 1
+        logger.info(f"Created warm container {container_name} for {key}")
+        return pooled
+
+    def _labels(self, key: str) -> Dict[str, str]:
+        labels = {MANAGED_LABEL: "true", "serverless.pool": key}
+        if self.owner is not None:
+            labels[OWNER_LABEL] = self.owner
+        return labels
+
+    def _is_healthy(self, pooled: PooledContainer) -> bool:
+        try:
+            pooled.container.reload()
+            if pooled.container.status != "running":
+                return False
+            return pooled.runner is None or pooled.runner.ping()
+        except docker.errors.NotFound:
+            return False
+        except Exception as e:
+            logger.error(f"Health check failed for {pooled.name}: {str(e)}")
+            return False
+
+    def _destroy(self, pooled: PooledContainer):
+        if pooled.runner is not None:
+            pooled.runner.close()
+        try:
+            if self.reaper is not None:
+                self.reaper.submit(pooled.container)
+            else:
+                pooled.container.remove(force=True)
+                logger.info(f"Removed container {pooled.name}")
+        except Exception as e:
+            logger.error(f"Failed to remove container {pooled.name}: {str(e)}")
+        finally:
+            with self._cond:
+                self._owned.discard(pooled.container.id)
@@ -0,0 +1,217 @@
+import os
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Set
+import logging
+
+import docker
+
+from container_pool import MANAGED_LABEL, OWNER_LABEL
+from metrics import container_reap_lag
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the names of runner containers
+CONTAINER_PREFIX = "function-"
+
+
+def default_owner() -> str:
+    """Owner label unique to this process among those sharing a daemon"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def owner_exited(owner: str) -> bool:
+    """True if `owner` is the default_owner() of a process on this host that has exited"""
+    hostname, _, pid = owner.rpartition("-")
+    if hostname != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+class ContainerReaper:
+    """
+    Removes containers in the background, off the invocation path
+
+    Containers passed to `submit` are removed by a background thread in
+    batches of up to `batch_size`, with the removals of a batch running in
+    parallel on `workers` threads.
+
+    Every `sweep_interval` seconds (0 disables sweeps) the reaper also lists
+    the daemon's managed `function-*` containers and removes those
+    `is_owned` does not claim: containers leaked by a lost teardown or a
+    crashed process. Only containers labelled with `owner` (by default
+    unique to this process), with no owner, or with the default owner of an
+    exited process on this host are considered, so instances sharing a
+    daemon leave each other's containers alone. A container must go
+    unclaimed on two consecutive sweeps before it is removed, so one created
+    between the listing and its registration is never taken. The sweep run
+    by `start` removes containers labelled with `owner` at once, since
+    nothing is owned yet; the others still wait for a second sweep.
+    """
+
+    def __init__(
+        self,
+        client,
+        name: str,
+        owner: Optional[str] = None,
+        is_owned: Optional[Callable[[str], bool]] = None,
+        batch_size: int = 16,
+        workers: int = 4,
+        sweep_interval: float = 300
+    ):
+        self.client = client
+        self.name = name
+        self.owner = owner or default_owner()
+        self.is_owned = is_owned or (lambda container_id: False)
+        self.batch_size = batch_size
+        self.sweep_interval = sweep_interval
+
+        # (container, time.monotonic() when submitted), oldest first
+        self._queue: deque = deque()
+        # Ids submitted and not yet removed, so sweeps leave them alone
+        self._submitted: Set[str] = set()
+        # Unclaimed on the last sweep; removed if still unclaimed on the next
+        self._suspects: Set[str] = set()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"reaper-{name}")
+        self._stats = {"removed": 0, "failed": 0, "orphans": 0, "sweeps": 0}
+
+    def start(self):
+        """Remove containers left behind by an earlier run, then start the background thread"""
+        if self._thread is not None:
+            return
+        if self.sweep_interval > 0:
+            try:
+                self.sweep(immediate=True)
+            except Exception as e:
+                logger.error(f"Initial container sweep on {self.name} failed: {str(e)}")
+
+        self._thread = threading.Thread(target=self._run, name=f"reaper-{self.name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, container):
+        """Queue a container for removal; returns immediately"""
+        item = (container, time.monotonic())
+        with self._cond:
+            self._submitted.add(container.id)
+            if self._thread is not None:
+                self._queue.append(item)
+                self._cond.notify()
+                return
+        # Not started, or already shut down: remove inline instead
+        self._record([item], [self._remove(item)])
+
+    def sweep(self, immediate: bool = False) -> int:
+        """
+        Queue managed containers no one owns for removal
+
+        Returns the number of orphans found.
+        """
+        containers = self.client.containers.list(
+            all=True, filters={"label": [f"{MANAGED_LABEL}=true"]}
+        )
+        exited: Dict[str, bool] = {}
+        with self._cond:
+            # Labelled with this reaper's owner, or left by no live owner
+            mine, others = {}, {}
+            for container in containers:
+                if (not container.name.startswith(CONTAINER_PREFIX)
+                        or container.id in self._submitted
+                        or self.is_owned(container.id)):
+                    continue
+                owner = (container.labels or {}).get(OWNER_LABEL)
+                if owner == self.owner:
+                    mine[container.id] = container
+                elif owner is None:
+                    others[container.id] = container
+                else:
+                    if owner not in exited:
+                        exited[owner] = owner_exited(owner)
+                    if exited[owner]:
+                        others[container.id] = container
+
+            orphans = [
+                container for container_id, container in {**mine, **others}.items()
+                if container_id in self._suspects or (immediate and container_id in mine)
+            ]
+            self._suspects = (set(mine) | set(others)) - {container.id for container in orphans}
+            self._stats["sweeps"] += 1
+            self._stats["orphans"] += len(orphans)
+
+        for container in orphans:
+            logger.info(f"Removing orphaned container {container.name} on {self.name}")
+            self.submit(container)
+        return len(orphans)
+
+    def stats(self) -> Dict[str, Any]:
+        """Removal and orphan counters since start, and the containers waiting for removal"""
+        with self._cond:
+            return dict(self._stats, pending=len(self._submitted))
+
+    def shutdown(self, timeout: float = 30):
+        """Remove everything already submitted, then stop"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self._workers.shutdown(wait=False)
+
+    def _run(self):
+        next_sweep = time.monotonic() + self.sweep_interval
+        while True:
+            with self._cond:
+                if not self._queue and not self._stopping:
+                    wait = next_sweep - time.monotonic() if self.sweep_interval > 0 else None
+                    if wait is None or wait > 0:
+                        self._cond.wait(wait)
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+                stopping = self._stopping
+
+            if batch:
+                self._remove_batch(batch)
+            elif stopping:
+                return
+
+            if self.sweep_interval > 0 and not stopping and time.monotonic() >= next_sweep:
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Container sweep on {self.name} failed: {str(e)}")
+                next_sweep = time.monotonic() + self.sweep_interval
+
+    def _remove_batch(self, batch):
+        self._record(batch, list(self._workers.map(self._remove, batch)))
+
+    def _record(self, batch, outcomes):
+        with self._cond:
+            for container, _ in batch:
+                self._submitted.discard(container.id)
+            self._stats["removed"] += sum(outcomes)
+            self._stats["failed"] += len(outcomes) - sum(outcomes)
+
+    def _remove(self, item) -> bool:
+        container, submitted_at = item
+        try:
+            container.remove(force=True)
+            logger.info(f"Removed container {container.name}")
+        except docker.errors.NotFound:
+            pass
+        except Exception as e:
+            # Picked up again by a later sweep if it still exists
+            logger.error(f"Failed to remove container {container.name}: {str(e)}")
+            return False
+        container_reap_lag.observe(time.monotonic() - submitted_at, host=self.name)
+        return True
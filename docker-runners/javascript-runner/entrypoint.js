@@ -1,5 +1,34 @@
 const fs = require('fs');
 const path = require('path');
+const Module = require('module');
+const util = require('util');
+const { AsyncLocalStorage } = require('async_hooks');
+
+let msgpack = null;
+try {
+    msgpack = require('@msgpack/msgpack');
+} catch (err) {
+    // Payload files fall back to JSON
+}
+
+// Frames are a 4-byte big-endian length followed by a UTF-8 JSON body
+const FRAME_HEADER_SIZE = 4;
+// Encodings this runner can use for payload files, most preferred first
+const PAYLOAD_ENCODINGS = msgpack ? ['msgpack', 'json'] : ['json'];
+
+function encodePayload(value, encoding) {
+    if (encoding === 'msgpack') {
+        const encoded = msgpack.encode(value);
+        return Buffer.from(encoded.buffer, encoded.byteOffset, encoded.byteLength);
+    }
+    return Buffer.from(JSON.stringify(value), 'utf8');
+}
+
+// Decode a payload file the platform wrote to the shared payload mount
+function readPayload(file, encoding) {
+    const data = fs.readFileSync(file);
+    return encoding === 'msgpack' ? msgpack.decode(data) : JSON.parse(data.toString('utf8'));
+}
 
 async function main() {
     try {
@@ -49,4 +78,316 @@ async function main() {
     }
 }
 
-main();
\ No newline at end of file
+// LRU of loaded handlers keyed by code hash
+class ModuleCache {
+    constructor(maxSize) {
+        this.maxSize = maxSize;
+        this.handlers = new Map();
+    }
+
+    get(codeHash) {
+        const entry = this.handlers.get(codeHash);
+        if (entry === undefined) {
+            return undefined;
+        }
+        this.handlers.delete(codeHash);
+        this.handlers.set(codeHash, entry);
+        return entry.handler;
+    }
+
+    load(codeHash, code, codePath) {
+        let handler;
+        if (codePath) {
+            handler = require(codePath).handler;
+        } else {
+            const filename = '/function/function.js';
+            const functionModule = new Module(filename);
+            functionModule.filename = filename;
+            functionModule.paths = Module._nodeModulePaths(path.dirname(filename));
+            functionModule._compile(code, filename);
+            handler = functionModule.exports.handler;
+        }
+
+        this.handlers.set(codeHash, { handler, codePath });
+        while (this.handlers.size > this.maxSize) {
+            const [evictedHash, evicted] = this.handlers.entries().next().value;
+            this.handlers.delete(evictedHash);
+            if (evicted.codePath) {
+                delete require.cache[require.resolve(evicted.codePath)];
+            }
+        }
+        return handler;
+    }
+}
+
+// Output written by one request, capped at `limit` bytes. With `onOutput`,
+// complete lines are also passed on as they are written so they can be
+// streamed before the request finishes.
+class RequestLog {
+    constructor(limit, onOutput) {
+        this.limit = limit;
+        this.onOutput = onOutput;
+        this.chunks = [];
+        this.size = 0;
+        this.dropped = 0;
+        this.partial = '';
+    }
+
+    write(text) {
+        let data = Buffer.from(String(text), 'utf8');
+        const room = this.limit - this.size;
+        if (data.length > room) {
+            this.dropped += data.length - Math.max(room, 0);
+            if (room <= 0) {
+                return;
+            }
+            data = data.subarray(0, room);
+        }
+        text = data.toString('utf8');
+        this.chunks.push(text);
+        this.size += data.length;
+
+        if (this.onOutput) {
+            this.partial += text;
+            const newline = this.partial.lastIndexOf('\n');
+            if (newline !== -1) {
+                this.onOutput(this.partial.slice(0, newline + 1));
+                this.partial = this.partial.slice(newline + 1);
+            }
+        }
+    }
+
+    // Everything kept, flushing the last partial line and a truncation note
+    finish() {
+        const marker = this.dropped ? `\n[${this.dropped} bytes of output truncated]\n` : '';
+        this.chunks.push(marker);
+        if (this.onOutput && (this.partial || marker)) {
+            this.onOutput(this.partial + marker);
+        }
+        return this.chunks.join('');
+    }
+}
+
+// Serve a stream of framed requests on stdin, answering on stdout. Requests
+// carry either the code itself or the path of its artifact under the
+// read-only artifact mount. Loaded handlers are cached by code hash, so code
+// is only loaded again when it changes. A "batch" request carries an array of
+// events and is answered with one "item" frame per event as it completes,
+// followed by a "done" frame. With "stream" set, handler output is also sent
+// as "log" frames while it runs. Large payloads skip the frames: an
+// "event_file" (or "events_file") replaces the event with the path of a file
+// on the shared payload mount, and a result that encodes to at least
+// "result_file_threshold" bytes is written to "result_file" (suffixed with
+// ".<index>" for batch items) and answered with "result_file" instead of
+// "result". Ping responses list the encodings supported for those files.
+// Captured output is capped at
+// RUNNER_MAX_LOG_BYTES per request and results larger than
+// RUNNER_MAX_RESULT_BYTES are replaced by an error.
+function serve() {
+    const writeFrame = process.stdout.write.bind(process.stdout);
+    const writeStderr = process.stderr.write.bind(process.stderr);
+    const requestLogs = new AsyncLocalStorage();
+    const modules = new ModuleCache(parseInt(process.env.RUNNER_MODULE_CACHE || '8', 10));
+    const maxLogBytes = parseInt(process.env.RUNNER_MAX_LOG_BYTES || String(1024 * 1024), 10);
+    const maxResultBytes = parseInt(process.env.RUNNER_MAX_RESULT_BYTES || String(6 * 1024 * 1024), 10);
+
+    // Anything the handler prints must not corrupt the response stream
+    const capture = (text) => {
+        const logs = requestLogs.getStore();
+        if (logs) {
+            logs.write(text);
+        } else {
+            writeStderr(text);
+        }
+        return true;
+    };
+    process.stdout.write = capture;
+    process.stderr.write = capture;
+    for (const level of ['log', 'info', 'warn', 'error', 'debug']) {
+        console[level] = (...args) => capture(util.format(...args) + '\n');
+    }
+
+    const sendBody = (body) => {
+        const header = Buffer.alloc(FRAME_HEADER_SIZE);
+        header.writeUInt32BE(body.length, 0);
+        writeFrame(Buffer.concat([header, body]));
+    };
+
+    const send = (response) => sendBody(Buffer.from(JSON.stringify(response), 'utf8'));
+
+    const handle = async (request) => {
+        const response = { id: request.id };
+        if (request.type === 'ping') {
+            response.status = 'ok';
+            response.encodings = PAYLOAD_ENCODINGS;
+            return send(response);
+        }
+
+        let handler;
+        let eventData;
+        try {
+            handler = modules.get(request.code_hash);
+            if (handler === undefined) {
+                if (request.code == null && request.code_path == null) {
+                    response.status = 'code_required';
+                    return send(response);
+                }
+                handler = modules.load(request.code_hash, request.code, request.code_path);
+            }
+            if (request.type === 'batch') {
+                eventData = request.events_file
+                    ? readPayload(request.events_file, request.encoding || 'json')
+                    : request.events || [];
+            } else {
+                eventData = request.event_file
+                    ? readPayload(request.event_file, request.encoding || 'json')
+                    : request.event || {};
+            }
+        } catch (err) {
+            response.status = 'error';
+            response.message = `Error loading function: ${err.message}`;
+            response.logs = err.stack;
+            return send(response);
+        }
+
+        if (request.type === 'batch') {
+            const outcome = await runBatch(request.id, handler, eventData, request);
+            return send(Object.assign(response, outcome, { type: 'done', status: 'ok' }));
+        }
+
+        const onOutput = request.stream
+            ? (text) => send({ id: request.id, type: 'log', data: text })
+            : undefined;
+        const outcome = await runHandler(handler, eventData, request.context || {}, onOutput);
+        sendResult(Object.assign(response, outcome), resultFile(request));
+    };
+
+    // Where the platform wants a large result written, or null
+    const resultFile = (request, suffix = '') => {
+        if (!request.result_file) {
+            return null;
+        }
+        return {
+            path: request.result_file + suffix,
+            encoding: request.result_encoding || 'json',
+            threshold: parseInt(request.result_file_threshold || 0, 10)
+        };
+    };
+
+    // Send a response, turning unserializable or oversized results into
+    // errors; returns the status sent. With `offload` (from resultFile), a
+    // large result is written to the payload file instead of the frame.
+    const sendResult = (response, offload = null) => {
+        let message = null;
+        let body;
+        try {
+            if (offload && response.result !== undefined) {
+                const data = encodePayload(response.result, offload.encoding);
+                if (data.length > maxResultBytes) {
+                    message = `Function result is ${data.length} bytes, over the ${maxResultBytes} byte limit`;
+                } else if (offload.threshold > 0 && data.length >= offload.threshold) {
+                    fs.writeFileSync(offload.path, data);
+                    response = Object.assign({}, response, {
+                        result_file: offload.path,
+                        result_encoding: offload.encoding
+                    });
+                    delete response.result;
+                }
+            }
+            if (message === null) {
+                body = Buffer.from(JSON.stringify(response), 'utf8');
+                // Only measure the result on its own when the whole frame is large
+                if (body.length > maxResultBytes && response.result !== undefined) {
+                    const size = Buffer.byteLength(JSON.stringify(response.result), 'utf8');
+                    if (size > maxResultBytes) {
+                        message = `Function result is ${size} bytes, over the ${maxResultBytes} byte limit`;
+                    }
+                }
+            }
+        } catch (err) {
+            message = err.code
+                ? `Failed to write function result: ${err.message}`
+                : `Function did not return valid JSON: ${err.message}`;
+        }
+
+        if (message !== null) {
+            response = Object.assign({}, response, { status: 'error', message });
+            delete response.result;
+            body = Buffer.from(JSON.stringify(response), 'utf8');
+        }
+        sendBody(body);
+        return response.status;
+    };
+
+    // Call the handler once, capturing its output; resolves to the response fields
+    const runHandler = async (handler, eventData, requestContext, onOutput) => {
+        const context = {
+            functionName: requestContext.function_name || 'unknown',
+            requestId: requestContext.request_id || 'unknown',
+            startTime: Date.now()
+        };
+        const outcome = {};
+        const logs = new RequestLog(maxLogBytes, onOutput);
+        const started = process.hrtime.bigint();
+        await requestLogs.run(logs, async () => {
+            try {
+                // Handle sleep parameter for long timeout tests
+                if (eventData.sleep && typeof eventData.sleep === 'number') {
+                    await new Promise(resolve => setTimeout(resolve, eventData.sleep * 1000));
+                }
+
+                outcome.result = await handler(eventData, context);
+                outcome.status = 'ok';
+            } catch (err) {
+                outcome.status = 'error';
+                outcome.message = `Error executing function: ${err.message}`;
+                logs.write(`${err.stack}\n`);
+            }
+        });
+        outcome.logs = logs.finish();
+        outcome.duration_ms = Number(process.hrtime.bigint() - started) / 1e6;
+        return outcome;
+    };
+
+    // Run every event of a batch with bounded concurrency, sending one item
+    // frame per event as it completes
+    const runBatch = async (requestId, handler, events, request) => {
+        const requestContext = request.context || {};
+        const parallelism = Math.max(1, Math.min(parseInt(request.parallelism || 1, 10), events.length || 1));
+        let next = 0;
+        let errors = 0;
+
+        const worker = async () => {
+            while (next < events.length) {
+                const index = next++;
+                const outcome = await runHandler(handler, events[index], requestContext);
+                const item = Object.assign(outcome, { id: requestId, type: 'item', index });
+                if (sendResult(item, resultFile(request, `.${index}`)) !== 'ok') {
+                    errors++;
+                }
+            }
+        };
+        await Promise.all(Array.from({ length: parallelism }, worker));
+        return { count: events.length, errors };
+    };
+
+    let pending = Buffer.alloc(0);
+    process.stdin.on('data', (chunk) => {
+        pending = Buffer.concat([pending, chunk]);
+        while (pending.length >= FRAME_HEADER_SIZE) {
+            const length = pending.readUInt32BE(0);
+            if (pending.length < FRAME_HEADER_SIZE + length) {
+                break;
+            }
+            const body = pending.slice(FRAME_HEADER_SIZE, FRAME_HEADER_SIZE + length);
+            pending = pending.slice(FRAME_HEADER_SIZE + length);
+            handle(JSON.parse(body.toString('utf8')));
+        }
+    });
+}
+
+if (process.env.RUNNER_MODE === 'serve') {
+    serve();
+} else {
+    main();
+}
\ No newline at end of file
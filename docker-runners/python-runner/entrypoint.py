@@ -1,10 +1,33 @@
-
 import sys
+import gc
 import json
+import importlib
 import importlib.util
+import math
+import mmap
+import resource
+import signal
+import socket
+import struct
+import threading
 import time
 import os
 import traceback
+import types
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Frames are a 4-byte big-endian length followed by a UTF-8 JSON body
+FRAME_HEADER = struct.Struct(">I")
+# Encodings this runner can use for payload files, most preferred first
+PAYLOAD_ENCODINGS = ["msgpack", "json"] if msgpack is not None else ["json"]
+# Largest message on a zygote's control socket
+MAX_CONTROL_MESSAGE = 64 * 1024
 
 def load_function(code_path):
     # Load the function module
@@ -62,5 +85,668 @@ def main():
         sys.stderr.write(error_message)
         sys.exit(1)
 
+class RequestLog:
+    """
+    Output written by one request, capped at `limit` bytes
+
+    With `on_output`, complete lines are also passed on as they are written
+    so they can be streamed before the request finishes.
+    """
+
+    def __init__(self, limit, on_output=None):
+        self.limit = limit
+        self.on_output = on_output
+        self.chunks = []
+        self.size = 0
+        self.dropped = 0
+        self.partial = ""
+
+    def write(self, text):
+        data = text.encode("utf-8", errors="replace")
+        room = self.limit - self.size
+        if len(data) > room:
+            self.dropped += len(data) - max(room, 0)
+            if room <= 0:
+                return
+            text = data[:room].decode("utf-8", errors="ignore")
+            data = data[:room]
+        self.chunks.append(text)
+        self.size += len(data)
+
+        if self.on_output is not None:
+            self.partial += text
+            if "\n" in self.partial:
+                lines, _, self.partial = self.partial.rpartition("\n")
+                self.on_output(lines + "\n")
+
+    def finish(self):
+        """Return everything kept, flushing the last partial line and a truncation note"""
+        marker = f"\n[{self.dropped} bytes of output truncated]\n" if self.dropped else ""
+        self.chunks.append(marker)
+        if self.on_output is not None and (self.partial or marker):
+            self.on_output(self.partial + marker)
+        return "".join(self.chunks)
+
+
+class LogCapture:
+    """
+    Stand-in for sys.stdout/sys.stderr in serve mode
+
+    Writes made while a request is running on the current thread are
+    collected for that request; anything else goes to the real stderr.
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.local = threading.local()
+
+    def begin(self, limit, on_output=None):
+        self.local.log = RequestLog(limit, on_output)
+
+    def end(self):
+        log = getattr(self.local, "log", None)
+        self.local.log = None
+        return log.finish() if log is not None else ""
+
+    def write(self, text):
+        log = getattr(self.local, "log", None)
+        if log is not None:
+            log.write(text)
+        else:
+            self.fallback.write(text)
+        return len(text)
+
+    def flush(self):
+        self.fallback.flush()
+
+
+def load_handler(code=None, code_path=None):
+    if code_path is not None:
+        # Imports through the file loader so precompiled bytecode is used
+        return load_function(code_path)
+    module = types.ModuleType("function_module")
+    module.__file__ = "/function/function.py"
+    exec(compile(code, module.__file__, "exec"), module.__dict__)
+    return module.handler
+
+
+class HandlerSource:
+    """The code of a handler, kept instead of the handler when each call runs in a forked child"""
+
+    def __init__(self, code_hash, code=None, code_path=None):
+        self.code_hash = code_hash
+        self.code = code
+        self.code_path = code_path
+
+
+class ModuleCache:
+    """LRU of loaded handlers keyed by code hash; `loader(code_hash, code, code_path)` loads one"""
+
+    def __init__(self, max_size, loader=None):
+        self.max_size = max_size
+        self.loader = loader or (lambda code_hash, code, code_path: load_handler(code, code_path))
+        self.handlers = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, code_hash):
+        with self.lock:
+            handler = self.handlers.get(code_hash)
+            if handler is not None:
+                self.handlers.move_to_end(code_hash)
+            return handler
+
+    def load(self, code_hash, code=None, code_path=None):
+        handler = self.loader(code_hash, code, code_path)
+        with self.lock:
+            self.handlers[code_hash] = handler
+            self.handlers.move_to_end(code_hash)
+            while len(self.handlers) > self.max_size:
+                self.handlers.popitem(last=False)
+        return handler
+
+
+class ZygoteExited(Exception):
+    """The zygote is gone, so no invocation can run in this runner any more"""
+
+
+class Zygote:
+    """
+    Resident process that forks a fresh child for every invocation
+
+    It imports the `preload` modules and is forked off before serve() starts
+    any thread, so children start single-threaded with those modules already
+    imported and share their memory copy-on-write. `spawn` hands the zygote
+    one end of a new socket pair; the child forked for it runs `child_main`
+    with that socket and the zygote's handlers by code hash, and exits.
+
+    `load` has the zygote import a handler too, keeping the last
+    `cache_size` of them, so children forked afterwards inherit it instead
+    of importing it themselves. Handler code runs in the zygote then, and
+    may still kill it (os._exit, a crash in an extension); `spawn` and `load`
+    raise ZygoteExited from then on and `alive` turns False.
+    """
+
+    def __init__(self, preload, child_main, close_fds=(), cache_size=8):
+        self.cache_size = cache_size
+        self.handlers = OrderedDict()
+        self.preloaded = []
+        for name in preload:
+            try:
+                importlib.import_module(name)
+                self.preloaded.append(name)
+            except Exception as e:
+                sys.__stderr__.write(f"Could not preload {name}: {str(e)}\n")
+        # Nothing imported so far is freed, so keep the collector off those pages
+        gc.freeze()
+
+        self.exited = False
+        self.control, zygote_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.pid = os.fork()
+        if self.pid == 0:
+            self.control.close()
+            for fd in close_fds:
+                os.close(fd)
+            self._serve_forks(zygote_end, child_main)
+        zygote_end.close()
+
+    def load(self, code_hash, code=None, code_path=None):
+        """Have the zygote import a handler; returns its HandlerSource"""
+        source = HandlerSource(code_hash, code, code_path)
+        message = json.dumps({"code_hash": code_hash, "code": code, "code_path": code_path}).encode("utf-8")
+        # Code too large for one control message is imported by each child instead
+        if len(message) < MAX_CONTROL_MESSAGE:
+            try:
+                self.control.send(b"l" + message)
+            except OSError as e:
+                raise self._exited(e)
+        return source
+
+    def spawn(self):
+        """Fork a child; returns the socket connected to it"""
+        ours, theirs = socket.socketpair()
+        try:
+            socket.send_fds(self.control, [b"f"], [theirs.fileno()])
+        except OSError as e:
+            ours.close()
+            raise self._exited(e)
+        finally:
+            theirs.close()
+        return ours
+
+    def alive(self, wait=0):
+        """Whether the zygote process is still running, waiting up to `wait` seconds for it to exit"""
+        deadline = time.monotonic() + wait
+        while not self.exited:
+            try:
+                pid, _ = os.waitpid(self.pid, os.WNOHANG)
+            except ChildProcessError:
+                pid = self.pid
+            self.exited = pid != 0
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(0.01)
+        return not self.exited
+
+    def _exited(self, error):
+        self.exited = True
+        return ZygoteExited(f"Runner zygote exited: {str(error)}")
+
+    def _serve_forks(self, control, child_main):
+        # Exited children are reaped by the kernel
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        while True:
+            try:
+                data, fds, _, _ = socket.recv_fds(control, MAX_CONTROL_MESSAGE, 1)
+            except OSError:
+                data, fds = b"", []
+            if data.startswith(b"l"):
+                try:
+                    self._load(json.loads(data[1:]))
+                except BaseException:
+                    # Nothing a handler does at import may take the zygote down
+                    traceback.print_exc(file=sys.__stderr__)
+                continue
+            if not fds:
+                # serve() exited
+                os._exit(0)
+            if os.fork() == 0:
+                control.close()
+                # Handlers that start subprocesses must be able to wait for them
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                status = 0
+                try:
+                    child_main(socket.socket(fileno=fds[0]), self.handlers)
+                except BaseException:
+                    traceback.print_exc(file=sys.__stderr__)
+                    status = 1
+                finally:
+                    os._exit(status)
+            os.close(fds[0])
+
+    def _load(self, request):
+        try:
+            handler = load_handler(request.get("code"), request.get("code_path"))
+        except BaseException:
+            # Including SystemExit; the child reports the error when it loads the handler itself
+            return
+        self.handlers[request["code_hash"]] = handler
+        self.handlers.move_to_end(request["code_hash"])
+        while len(self.handlers) > self.cache_size:
+            self.handlers.popitem(last=False)
+        gc.freeze()
+
+
+class CpuLimitExceeded(Exception):
+    """Raised in a forked child when it reaches its CPU time limit"""
+
+
+class MemoryWatchdog:
+    """Kills forked children whose resident memory goes over their limit, `limit_mb` by default"""
+
+    def __init__(self, limit_mb, interval=0.05):
+        self.limit_kb = limit_mb * 1024
+        self.interval = interval
+        # pid -> limit in kB
+        self.children = {}
+        self.killed = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def watch(self, pid, limit_mb=None):
+        limit_kb = limit_mb * 1024 if limit_mb else self.limit_kb
+        if limit_kb > 0:
+            with self.lock:
+                self.children[pid] = limit_kb
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name="memory-watchdog", daemon=True)
+                    self.thread.start()
+
+    def forget(self, pid):
+        """Stop watching `pid`; True if it was killed for using too much memory"""
+        with self.lock:
+            self.children.pop(pid, None)
+            if pid in self.killed:
+                self.killed.discard(pid)
+                return True
+            return False
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                children = list(self.children.items())
+            for pid, limit_kb in children:
+                if resident_kb(pid) > limit_kb:
+                    with self.lock:
+                        if pid not in self.children:
+                            continue
+                        self.killed.add(pid)
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+
+
+def resident_kb(pid):
+    """Resident memory of a process in kB, 0 once it has exited"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def encode_payload(value, encoding):
+    if encoding == "msgpack":
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def read_payload(path, encoding):
+    """Decode a payload file the platform wrote to the shared payload mount"""
+    with open(path, "rb") as f:
+        if encoding == "msgpack":
+            # Unpacks straight from the mapped file instead of a copy of it
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return msgpack.unpackb(mapped, raw=False)
+        return json.loads(f.read())
+
+
+def read_frame(stream):
+    header = stream.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    body = stream.read(length)
+    if len(body) < length:
+        return None
+    return json.loads(body.decode("utf-8"))
+
+
+def serve():
+    """
+    Serve a stream of framed requests on stdin, answering on stdout
+
+    Each request carries an id, the event, per-request context and the hash
+    of the handler code, plus either the code itself or the path of its
+    artifact under the read-only artifact mount. Loaded handlers are cached
+    by hash, so code is only loaded again when it changes.
+
+    With "stream" set, output written by the handler is also sent as "log"
+    frames while it runs, ahead of the final response.
+
+    A "batch" request carries an array of events instead, runs them with the
+    requested parallelism and answers with one "item" frame per event as it
+    completes, followed by a "done" frame.
+
+    Large payloads skip the frames: an "event_file" (or "events_file")
+    replaces the event with the path of a file on the shared payload mount,
+    and a result that encodes to at least "result_file_threshold" bytes is
+    written to "result_file" (suffixed with ".<index>" for batch items) and
+    answered with "result_file" instead of "result". Ping responses list the
+    encodings this runner supports for those files.
+
+    Captured output is capped at RUNNER_MAX_LOG_BYTES per request and results
+    larger than RUNNER_MAX_RESULT_BYTES are replaced by an error.
+
+    With RUNNER_ZYGOTE set, every invocation (and batch item) runs in a
+    child forked from a Zygote that has imported the RUNNER_PRELOAD modules,
+    so calls cannot see each other's state. Responses then carry the fork
+    latency as "fork_ms", and children whose resident memory goes over
+    RUNNER_FORK_MAX_RSS_MB are killed. Requests can tighten that with
+    "limits": {"memory_mb": ..., "cpu_seconds": ...}; the CPU limit is an
+    RLIMIT_CPU on the child. Without a zygote, limits are ignored. Cached
+    handlers are imported in the zygote, so children start with them loaded.
+    Once the zygote has exited, pings and invocations answer with an error
+    marked "fatal" so the runner is retired.
+    """
+    requests_in = sys.stdin.buffer
+    frames_out = os.fdopen(os.dup(1), "wb")
+    write_lock = threading.Lock()
+
+    # Anything the handler prints must not corrupt the response stream
+    os.dup2(2, 1)
+    capture = LogCapture(sys.__stderr__)
+    sys.stdout = capture
+    sys.stderr = capture
+    sys.stdin = open(os.devnull)
+
+    use_zygote = os.environ.get("RUNNER_ZYGOTE", "0").lower() in ("1", "true", "yes")
+    cache_size = int(os.environ.get("RUNNER_MODULE_CACHE", "8"))
+    workers = ThreadPoolExecutor(max_workers=int(os.environ.get("RUNNER_WORKERS", "4")))
+    max_log_bytes = int(os.environ.get("RUNNER_MAX_LOG_BYTES", str(1024 * 1024)))
+    max_result_bytes = int(os.environ.get("RUNNER_MAX_RESULT_BYTES", str(6 * 1024 * 1024)))
+
+    def send_body(body):
+        with write_lock:
+            frames_out.write(FRAME_HEADER.pack(len(body)) + body)
+            frames_out.flush()
+
+    def send(response):
+        send_body(json.dumps(response).encode("utf-8"))
+
+    def result_file(request, suffix=""):
+        """Where the platform wants a large result written: (path, encoding, threshold) or None"""
+        if not request.get("result_file"):
+            return None
+        return (
+            request["result_file"] + suffix,
+            request.get("result_encoding", "json"),
+            int(request.get("result_file_threshold", 0)),
+        )
+
+    def send_result(response, offload=None):
+        """
+        Send a response, turning unserializable or oversized results into errors; returns the status sent
+
+        With `offload` (from result_file), a large result is written to the
+        payload file instead of the frame.
+        """
+        message = None
+        try:
+            if offload is not None and "result" in response:
+                path, encoding, threshold = offload
+                data = encode_payload(response["result"], encoding)
+                if len(data) > max_result_bytes:
+                    message = f"Function result is {len(data)} bytes, over the {max_result_bytes} byte limit"
+                elif threshold > 0 and len(data) >= threshold:
+                    with open(path, "wb") as f:
+                        f.write(data)
+                    response = dict(response, result_file=path, result_encoding=encoding)
+                    del response["result"]
+            if message is None:
+                body = json.dumps(response).encode("utf-8")
+                # Only measure the result on its own when the whole frame is large
+                if len(body) > max_result_bytes and "result" in response:
+                    size = len(json.dumps(response["result"]).encode("utf-8"))
+                    if size > max_result_bytes:
+                        message = f"Function result is {size} bytes, over the {max_result_bytes} byte limit"
+        except (TypeError, ValueError, OverflowError) as e:
+            message = f"Function did not return valid JSON: {str(e)}"
+        except OSError as e:
+            message = f"Failed to write function result: {str(e)}"
+
+        if message is not None:
+            response = dict(response, status="error", message=message)
+            response.pop("result", None)
+            body = json.dumps(response).encode("utf-8")
+        send_body(body)
+        return response["status"]
+
+    def run_handler(handler, event_data, request_context, on_output=None, limits=None):
+        """Call the handler once, capturing its output; returns response fields"""
+        context = dict(request_context)
+        context["start_time"] = time.time()
+        outcome = {}
+        started = time.perf_counter()
+
+        capture.begin(max_log_bytes, on_output)
+        try:
+            # Handle sleep parameter for long timeout tests
+            if 'sleep' in event_data and isinstance(event_data['sleep'], (int, float)):
+                time.sleep(float(event_data['sleep']))
+
+            outcome["result"] = handler(event_data, context)
+            outcome["status"] = "ok"
+        except Exception as e:
+            outcome["status"] = "error"
+            outcome["message"] = f"Error executing function: {str(e)}"
+            capture.write(traceback.format_exc())
+        finally:
+            outcome["logs"] = capture.end()
+            outcome["duration_ms"] = (time.perf_counter() - started) * 1000
+        return outcome
+
+    def run_child(conn, handlers):
+        """Body of a forked child: run the one invocation sent over `conn`"""
+        def send_message(message):
+            body = json.dumps(message).encode("utf-8")
+            conn.sendall(FRAME_HEADER.pack(len(body)) + body)
+
+        send_message({"type": "started", "pid": os.getpid(), "at": time.monotonic()})
+        request = read_frame(conn.makefile("rb"))
+        cpu_seconds = (request.get("limits") or {}).get("cpu_seconds")
+        if cpu_seconds:
+            # SIGXCPU at the soft limit fails the handler; the hard limit kills the child
+            def on_cpu_limit(signum, frame):
+                raise CpuLimitExceeded(f"Function used more than {cpu_seconds:g} seconds of CPU time")
+
+            signal.signal(signal.SIGXCPU, on_cpu_limit)
+            soft = max(1, math.ceil(cpu_seconds))
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 1))
+        try:
+            handler = handlers.get(request.get("code_hash"))
+            if handler is None:
+                handler = load_handler(request.get("code"), request.get("code_path"))
+        except Exception as e:
+            send_message({
+                "type": "outcome",
+                "status": "error",
+                "message": f"Error loading function: {str(e)}",
+                "logs": traceback.format_exc(),
+            })
+            return
+
+        on_output = None
+        if request.get("stream"):
+            def on_output(text):
+                send_message({"type": "log", "data": text})
+        outcome = run_handler(handler, request["event"], request["context"], on_output)
+        try:
+            send_message(dict(outcome, type="outcome"))
+        except (TypeError, ValueError) as e:
+            outcome.pop("result", None)
+            outcome.update(status="error", message=f"Function did not return valid JSON: {str(e)}")
+            send_message(dict(outcome, type="outcome"))
+
+    def run_forked(source, event_data, request_context, on_output=None, limits=None):
+        """Run a handler in a child forked from the zygote; returns response fields"""
+        limits = limits or {}
+        max_rss_mb = limits.get("memory_mb") or max_child_rss_mb
+        sent_at = time.monotonic()
+        conn = zygote.spawn()
+        pid = None
+        fork_ms = None
+        outcome = None
+        killed = False
+        try:
+            body = json.dumps({
+                "code_hash": source.code_hash,
+                "code": source.code,
+                "code_path": source.code_path,
+                "event": event_data,
+                "context": request_context,
+                "stream": on_output is not None,
+                "limits": limits,
+            }).encode("utf-8")
+            conn.sendall(FRAME_HEADER.pack(len(body)) + body)
+
+            messages = conn.makefile("rb")
+            while outcome is None:
+                message = read_frame(messages)
+                if message is None:
+                    break
+                kind = message.pop("type", None)
+                if kind == "started":
+                    pid = message["pid"]
+                    fork_ms = (message["at"] - sent_at) * 1000
+                    watchdog.watch(pid, max_rss_mb)
+                elif kind == "log" and on_output is not None:
+                    on_output(message["data"])
+                elif kind == "outcome":
+                    outcome = message
+        finally:
+            conn.close()
+            if pid is not None:
+                killed = watchdog.forget(pid)
+
+        if outcome is None:
+            if killed:
+                message = f"Function used more than {max_rss_mb} MB of memory and was killed"
+            else:
+                message = "Function process exited without a result"
+            outcome = {"status": "error", "message": message, "logs": ""}
+        outcome["fork_ms"] = fork_ms
+        return outcome
+
+    def run_batch(request_id, handler, request):
+        """Run every event of a batch, sending one item frame per event as it completes"""
+        if request.get("events_file"):
+            events = read_payload(request["events_file"], request.get("encoding", "json"))
+        else:
+            events = request.get("events", [])
+        request_context = request.get("context", {})
+        parallelism = max(1, min(int(request.get("parallelism", 1)), len(events) or 1))
+
+        def run_item(index):
+            outcome = execute(handler, events[index], request_context, limits=request.get("limits"))
+            response = dict(outcome, id=request_id, type="item", index=index)
+            return send_result(response, result_file(request, f".{index}")) == "ok"
+
+        with ThreadPoolExecutor(max_workers=parallelism) as batch_workers:
+            succeeded = sum(batch_workers.map(run_item, range(len(events))))
+        return {"count": len(events), "errors": len(events) - succeeded}
+
+    def handle(request):
+        response = {"id": request.get("id")}
+        try:
+            if request.get("type") == "ping":
+                response["status"] = "ok"
+                response["encodings"] = PAYLOAD_ENCODINGS
+                if zygote is not None:
+                    response["preloaded"] = zygote.preloaded
+                    if not zygote.alive():
+                        response["status"] = "error"
+                        response["message"] = "Runner zygote exited"
+                        response["fatal"] = True
+                return
+
+            code_hash = request["code_hash"]
+            handler = modules.get(code_hash)
+            if handler is None:
+                if request.get("code") is None and request.get("code_path") is None:
+                    response["status"] = "code_required"
+                    return
+                handler = modules.load(code_hash, request.get("code"), request.get("code_path"))
+
+            if request.get("type") == "batch":
+                response.update(run_batch(response["id"], handler, request))
+                response["type"] = "done"
+                response["status"] = "ok"
+            else:
+                on_output = None
+                if request.get("stream"):
+                    def on_output(text):
+                        send({"id": response["id"], "type": "log", "data": text})
+                if request.get("event_file"):
+                    event_data = read_payload(request["event_file"], request.get("encoding", "json"))
+                else:
+                    event_data = request.get("event", {})
+                response.update(execute(
+                    handler, event_data, request.get("context", {}), on_output, request.get("limits")
+                ))
+        except ZygoteExited as e:
+            response["status"] = "error"
+            response["message"] = str(e)
+            response["fatal"] = True
+        except Exception as e:
+            response["status"] = "error"
+            response["message"] = f"Error loading function: {str(e)}"
+            response["logs"] = traceback.format_exc()
+            # A connection dropped mid-call may mean the zygote is exiting
+            if zygote is not None and not zygote.alive(wait=0.2 if isinstance(e, OSError) else 0):
+                response["fatal"] = True
+        finally:
+            send_result(response, result_file(request))
+
+    zygote = None
+    execute = run_handler
+    max_child_rss_mb = int(os.environ.get("RUNNER_FORK_MAX_RSS_MB", "0"))
+    if use_zygote:
+        preload = [name.strip() for name in os.environ.get("RUNNER_PRELOAD", "").split(",") if name.strip()]
+        # Started before any thread exists; it must not hold the request or response streams
+        zygote = Zygote(
+            preload, run_child, close_fds=(requests_in.fileno(), frames_out.fileno()), cache_size=cache_size
+        )
+        watchdog = MemoryWatchdog(max_child_rss_mb)
+        execute = run_forked
+    # With a zygote, handlers run in the children; serve() only keeps their sources
+    modules = ModuleCache(cache_size, loader=zygote.load if zygote is not None else None)
+
+    while True:
+        request = read_frame(requests_in)
+        if request is None:
+            break
+        workers.submit(handle, request)
+
+    workers.shutdown(wait=True)
+
+
 if __name__ == "__main__":
-    main()
+    if os.environ.get("RUNNER_MODE") == "serve":
+        serve()
+    else:
+        main()
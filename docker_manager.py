@@ -1,203 +1,768 @@
 import docker
 import os
-import json
+import functools
+import hashlib
+import importlib
 import tempfile
+import threading
+import time
 import uuid
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Iterator, Callable
 import logging
 
+from artifact_store import ArtifactStore
+from container_pool import ContainerPool
+from container_reaper import ContainerReaper, default_owner
+from execution_backend import ExecutionBackend
+from execution_hosts import ExecutionHost, HostScheduler, NoHostAvailable
+from image_builder import ImageBuilder, ImageBuildError, RUNNER_DIGEST_LABEL
+from metrics import PhaseTimer
+from payload_exchange import PayloadExchange, default_payload_dir
+from resource_sampler import ResourceSampler
+from runner_client import RunnerClient, RunnerConnectionError
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class DockerManager:
-    def __init__(self):
-        """Initialize Docker client and ensure base images exist"""
-        self.client = docker.from_env()
-        self.containers = {}  # Track running containers
-        
-        # Ensure base images exist
-        self._ensure_base_images()
-    
-    def _ensure_base_images(self):
-        """Ensure necessary base images exist, build them if they don't"""
-        # Define supported languages and their base images
-        self.supported_languages = {
-            "python": "python-runner",
-            "javascript": "node-runner"
-        }
+# Docker API version clients use unless DOCKER_API_VERSION is set (Docker 20.10+)
+DEFAULT_DOCKER_API_VERSION = "1.41"
+
+def create_docker_client(base_url: Optional[str] = None):
+    """
+    Docker client used to run functions
+    
+    DOCKER_CLIENT_FACTORY ("module:callable") swaps in another client with
+    the same interface, e.g. the in-process fake used by the benchmarks.
+    
+    The API version is DOCKER_API_VERSION rather than detected, since
+    detecting it contacts the daemon: creating the client must not fail
+    for a host that is down, which the health checker retries instead.
+    "auto" restores detection.
+    
+    Args:
+        base_url: Daemon to connect to, default DOCKER_HOST; TLS settings
+            still come from the environment
+    """
+    factory = os.getenv("DOCKER_CLIENT_FACTORY")
+    if not factory:
+        version = os.getenv("DOCKER_API_VERSION", DEFAULT_DOCKER_API_VERSION)
+        if base_url is None:
+            return docker.from_env(version=version)
+        return docker.from_env(version=version, environment=dict(os.environ, DOCKER_HOST=base_url))
+    
+    module_name, _, attr = factory.partition(":")
+    logger.info(f"Using Docker client factory {factory}")
+    create = getattr(importlib.import_module(module_name), attr or "create_client")
+    return create() if base_url is None else create(base_url)
+
+def parse_docker_hosts(spec: str, default_capacity: int) -> List[tuple]:
+    """
+    Parse DOCKER_HOSTS: comma-separated daemon URLs, each optionally
+    followed by "=<capacity>", e.g. "tcp://10.0.0.1:2376=16,tcp://10.0.0.2:2376"
+    
+    Returns:
+        [(url, capacity), ...]
+    """
+    hosts = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        url, _, capacity = entry.partition("=")
+        hosts.append((url.strip(), int(capacity) if capacity else default_capacity))
+    return hosts
+
+class DockerManager(ExecutionBackend):
+    """Runs functions in warm runner containers on one or more Docker hosts"""
+    
+    name = "docker"
+    supports_dependencies = True
+    # Supported languages and their base images
+    supported_languages = {
+        "python": "python-runner",
+        "javascript": "node-runner"
+    }
+    # Build context of each language's base image, under docker-runners/
+    runner_directories = {
+        "python": "python-runner",
+        "javascript": "javascript-runner"
+    }
+    
+    def __init__(self, client=None):
+        """
+        Set up the execution hosts without contacting them
+        
+        Functions run on the daemons listed in DOCKER_HOSTS, or on the one
+        from the environment (or `client`) when it is not set. Every host
+        must mount the artifact directory at the same path, e.g. from a
+        shared volume, because runners load function code from it.
+        
+        Base images are built and pools filled by `start` (or `prepare`),
+        so constructing the manager never waits for Docker.
+        """
+        super().__init__(int(os.getenv("MAX_CONCURRENT_EXECUTIONS", "10")))
+        
+        # Function code is written once per content hash and mounted read-only
+        self.artifacts = ArtifactStore(
+            os.getenv("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "serverless-artifacts")),
+            python_cache_tag=os.getenv("RUNNER_PYTHON_CACHE_TAG", "cpython-310")
+        )
+        # Where the artifact store is mounted inside runner containers
+        self.artifact_mount = os.getenv("RUNNER_ARTIFACT_MOUNT", "/artifacts")
         
-        # Check if images exist, build if they don't
-        for lang, image_name in self.supported_languages.items():
+        # Events and results of at least PAYLOAD_FILE_THRESHOLD bytes go
+        # through files on this directory (tmpfs by default), mounted
+        # read-write into runners, instead of the attach socket; 0 disables.
+        # Remote hosts need the directory shared at the same path.
+        self.payloads = PayloadExchange(
+            os.getenv("PAYLOAD_DIR", default_payload_dir()),
+            mount=os.getenv("RUNNER_PAYLOAD_MOUNT", "/payloads"),
+            threshold=int(os.getenv("PAYLOAD_FILE_THRESHOLD", str(256 * 1024))),
+            encoding=os.getenv("PAYLOAD_ENCODING", "auto")
+        )
+        
+        # Caps on what one invocation may send back, enforced by the runners
+        self.max_log_bytes = int(os.getenv("MAX_LOG_BYTES", str(1024 * 1024)))
+        self.max_result_bytes = int(os.getenv("MAX_RESULT_BYTES", str(6 * 1024 * 1024)))
+        
+        # Python runners can fork every invocation from a zygote process that
+        # has PYTHON_PRELOAD_MODULES imported, isolating calls from each other;
+        # forked children over PYTHON_FORK_MAX_RSS_MB are killed (0: no cap)
+        self.python_zygote = os.getenv("PYTHON_RUNNER_ZYGOTE", "false").lower() in ("1", "true", "yes")
+        self.python_preload = os.getenv("PYTHON_PRELOAD_MODULES", "numpy,pandas,requests")
+        self.fork_max_rss_mb = int(os.getenv("PYTHON_FORK_MAX_RSS_MB", "0"))
+        
+        # Peak memory/CPU of each execution, read from container stats
+        self.sampler = ResourceSampler(
+            interval=float(os.getenv("RESOURCE_SAMPLE_INTERVAL", "0.5")),
+            workers=int(os.getenv("RESOURCE_SAMPLE_WORKERS", "4"))
+        )
+        self.sampler.start()
+        
+        # Seconds to wait for a new runner to answer its first ping
+        self.runner_start_timeout = float(os.getenv("RUNNER_START_TIMEOUT", "30"))
+        
+        # Spent containers are removed in the background in batches, and
+        # managed containers no pool owns are swept every
+        # REAPER_SWEEP_INTERVAL seconds. Containers are labelled with
+        # PLATFORM_INSTANCE, or an id unique to this process, so instances
+        # sharing a daemon only sweep their own. Set a stable
+        # PLATFORM_INSTANCE to have a restarted instance remove its
+        # predecessor's containers at startup.
+        self.instance = os.getenv("PLATFORM_INSTANCE") or default_owner()
+        self.reaper_batch_size = int(os.getenv("REAPER_BATCH_SIZE", "16"))
+        self.reaper_workers = int(os.getenv("REAPER_WORKERS", "4"))
+        self.reaper_sweep_interval = float(os.getenv("REAPER_SWEEP_INTERVAL", "300"))
+        
+        # Pools and image builders live on each host, with the same settings
+        self.host_capacity = int(os.getenv("DOCKER_HOST_CAPACITY", str(self.max_concurrency)))
+        if client is not None:
+            host_specs = [("local", client, self.host_capacity)]
+        else:
+            host_specs = [
+                (url, create_docker_client(url), capacity)
+                for url, capacity in parse_docker_hosts(os.getenv("DOCKER_HOSTS", ""), self.host_capacity)
+            ] or [("local", create_docker_client(), self.host_capacity)]
+        self.hosts = [self._create_host(*spec) for spec in host_specs]
+        
+        for host in self.hosts:
+            for lang in self.supported_languages:
+                host.set_runtime_state(lang, "pending")
+        
+        self.scheduler = HostScheduler(
+            self.hosts,
+            strategy=os.getenv("PLACEMENT_STRATEGY", "warm"),
+            health_interval=float(os.getenv("HOST_HEALTH_INTERVAL", "10")),
+            failure_threshold=int(os.getenv("HOST_FAILURE_THRESHOLD", "2"))
+        )
+        
+        # Digests of the runner build contexts, computed once per process
+        self._runner_digests: Dict[str, str] = {}
+        self._preparation: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Prepare the hosts in a background thread; returns immediately"""
+        if self._preparation is None:
+            self._preparation = threading.Thread(
+                target=self.prepare, name="runtime-prepare", daemon=True
+            )
+            self._preparation.start()
+    
+    def prepare(self):
+        """
+        Build missing base images and fill the pools on every host, in parallel
+        
+        Each language is routed to a host as soon as its runtime there is
+        ready. Hosts that cannot be reached are retried by the health
+        checker, which is started once every host has had a first attempt.
+        """
+        started = time.perf_counter()
+        
+        def prepare_host(host: ExecutionHost):
             try:
-                self.client.images.get(image_name)
-                logger.info(f"Base image for {lang} ({image_name}) already exists")
-            except docker.errors.ImageNotFound:
-                logger.info(f"Building base image for {lang} ({image_name})")
-                self._build_base_image(lang, image_name)
+                host.prepare()
+            except Exception as e:
+                host.last_error = str(e)
+                logger.error(f"Execution host {host.name} is not ready: {str(e)}")
+        
+        with ThreadPoolExecutor(max_workers=len(self.hosts), thread_name_prefix="host-prepare") as workers:
+            list(workers.map(prepare_host, self.hosts))
+        
+        ready = {lang for lang in self.supported_languages if self.is_ready(lang)}
+        logger.info(
+            f"Runtimes ready in {time.perf_counter() - started:.1f}s: "
+            f"{', '.join(sorted(ready)) or 'none'}"
+        )
+        self.scheduler.start()
     
-    def _build_base_image(self, language: str, image_name: str):
-        """Build a base Docker image for a specific language"""
-        # Use a persistent directory for Docker build context
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        runners_dir = os.path.join(base_dir, "docker-runners")
+    def is_ready(self, language: str) -> bool:
+        """True once some healthy host can run functions in `language`"""
+        return any(host.is_ready(language) for host in self.hosts)
+    
+    def readiness(self) -> Dict[str, Any]:
+        """Per-language readiness, with the runtime state on each host"""
+        languages = {
+            lang: {
+                "ready": self.is_ready(lang),
+                "hosts": {
+                    host.name: dict(host.runtimes.get(lang, {"state": "pending", "error": None}), healthy=host.healthy)
+                    for host in self.hosts
+                },
+            }
+            for lang in self.supported_languages
+        }
+        return {
+            "ready": all(language["ready"] for language in languages.values()),
+            "languages": languages,
+        }
+    
+    def _create_host(self, name: str, client, capacity: int) -> ExecutionHost:
+        """Pool of warm runner containers and image builder for one daemon"""
+        pool = ContainerPool(
+            client,
+            min_size=int(os.getenv("POOL_MIN_SIZE", "1")),
+            max_size=int(os.getenv("POOL_MAX_SIZE", "10")),
+            idle_timeout=float(os.getenv("POOL_IDLE_TIMEOUT", "300")),
+            max_uses=int(os.getenv("POOL_MAX_USES", "100")),
+            maintenance_interval=float(os.getenv("POOL_MAINTENANCE_INTERVAL", "30")),
+            container_options={
+                # Runners serve framed requests on stdin until it is closed
+                "environment": {
+                    "RUNNER_MODE": "serve",
+                    "RUNNER_MAX_LOG_BYTES": str(self.max_log_bytes),
+                    "RUNNER_MAX_RESULT_BYTES": str(self.max_result_bytes),
+                    # Only read by the Python runner
+                    "RUNNER_ZYGOTE": "1" if self.python_zygote else "0",
+                    "RUNNER_PRELOAD": self.python_preload,
+                    "RUNNER_FORK_MAX_RSS_MB": str(self.fork_max_rss_mb),
+                },
+                "stdin_open": True,
+                "volumes": {
+                    self.artifacts.root: {'bind': self.artifact_mount, 'mode': 'ro'},
+                    self.payloads.root: {'bind': self.payloads.mount, 'mode': 'rw'},
+                },
+                **self._resource_options(self.default_memory_mb, self.default_cpu),
+            },
+            connect=self._connect_runner,
+            owner=self.instance
+        )
+        pool.reaper = ContainerReaper(
+            client,
+            name,
+            owner=self.instance,
+            is_owned=pool.owns,
+            batch_size=self.reaper_batch_size,
+            workers=self.reaper_workers,
+            sweep_interval=self.reaper_sweep_interval
+        )
         
-        if language == "python":
-            # Build Python runner image
-            runner_dir = os.path.join(runners_dir, "python-runner")
-            self.client.images.build(path=runner_dir, tag=image_name)
-            logger.info(f"Built Python base image: {image_name}")
-            
-        elif language == "javascript":
-            # Build JavaScript runner image
-            runner_dir = os.path.join(runners_dir, "javascript-runner")
-            self.client.images.build(path=runner_dir, tag=image_name)
-            logger.info(f"Built JavaScript base image: {image_name}")
-    
-    async def execute_function(
-        self, 
-        function_id: str, 
-        function_name: str, 
-        language: str, 
-        code: str, 
-        event: Dict[str, Any], 
-        timeout: int = 30000  # Timeout in milliseconds
-    ) -> Dict[str, Any]:
+        # Per-function images for functions that declare dependencies
+        image_builder = ImageBuilder(
+            client,
+            self.supported_languages,
+            max_workers=int(os.getenv("IMAGE_BUILD_WORKERS", "2"))
+        )
+        return ExecutionHost(
+            name, client, pool, image_builder, capacity,
+            prepare=self._prepare_host, reaper=pool.reaper
+        )
+    
+    def _prepare_host(self, host: ExecutionHost):
         """
-        Execute a serverless function in a Docker container
+        Remove containers leaked by an earlier run, build missing base
+        images and fill the language pools on `host`
         
-        Args:
-            function_id: Unique identifier for the function
-            function_name: Name of the function
-            language: Programming language (python, javascript)
-            code: Function code as a string
-            event: Event data to pass to the function
-            timeout: Function timeout in milliseconds
+        Languages are prepared in parallel and each one is marked ready on
+        its own, so a slow image build does not hold up the others.
         
-        Returns:
-            Function execution result
+        Raises:
+            RuntimeError: Some language could not be prepared; the host is
+                prepared again by the health checker
         """
-        if language not in self.supported_languages:
-            raise ValueError(f"Unsupported language: {language}")
-        
-        # Create a unique container name
-        container_id = str(uuid.uuid4())
-        container_name = f"function-{function_id}-{container_id[:8]}"
-        
-        # Create a temporary directory for function code
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Write function code to file
-            if language == "python":
-                code_file = os.path.join(temp_dir, "function.py")
-            elif language == "javascript":
-                code_file = os.path.join(temp_dir, "function.js")
-            
-            with open(code_file, "w") as f:
-                f.write(code)
-            
-            # Convert timeout to seconds for Docker
-            timeout_seconds = timeout / 1000
-            
+        # Sweeps before the pool creates anything, so only leftovers are taken
+        host.reaper.start()
+        pending = [lang for lang in self.supported_languages if lang not in host.ready_languages]
+        with ThreadPoolExecutor(max_workers=len(pending) or 1, thread_name_prefix="runtime-prepare") as workers:
+            outcomes = list(workers.map(functools.partial(self._prepare_runtime, host), pending))
+        host.pool.start()
+        
+        failed = [lang for lang, ok in zip(pending, outcomes) if not ok]
+        if failed:
+            raise RuntimeError(f"Could not prepare {', '.join(failed)} on {host.name}")
+    
+    def _prepare_runtime(self, host: ExecutionHost, language: str) -> bool:
+        """Ensure `language`'s base image on `host` and warm its pool; False on failure"""
+        image_name = self.supported_languages[language]
+        try:
+            host.set_runtime_state(language, "building")
+            self._ensure_base_image(host.client, language, image_name)
+            host.image_builder.refresh_base_image(language)
+            if not host.pool.is_registered(language):
+                host.pool.register(language, image_name)
+            host.pool.fill(language)
+        except Exception as e:
+            host.set_runtime_state(language, "failed", str(e))
+            logger.error(f"Failed to prepare {language} on {host.name}: {str(e)}")
+            return False
+        host.set_runtime_state(language, "ready")
+        logger.info(f"{language} runtime ready on {host.name}")
+        return True
+    
+    def _resource_options(self, memory_mb: int, cpu: float) -> Dict[str, Any]:
+        """Container options enforcing a memory limit in MB and a CPU limit in cores"""
+        return {
+            "mem_limit": f"{memory_mb}m",
+            "memswap_limit": f"{memory_mb}m",  # No swap beyond the memory limit
+            "nano_cpus": int(cpu * 1e9),
+        }
+    
+    def _ensure_base_image(self, client, language: str, image_name: str):
+        """
+        Build a language's base image unless it exists and is up to date
+        
+        Base images are labelled with the digest of the runner sources they
+        were built from, so an image is only rebuilt when those change.
+        """
+        digest = self._runner_digest(language)
+        try:
+            image = client.images.get(image_name)
+            if (image.labels or {}).get(RUNNER_DIGEST_LABEL) == digest:
+                logger.info(f"Base image for {language} ({image_name}) is up to date")
+                return
+            logger.info(f"Rebuilding base image for {language} ({image_name}): runner sources changed")
+        except docker.errors.ImageNotFound:
+            logger.info(f"Building base image for {language} ({image_name})")
+        self._build_base_image(client, language, image_name, digest)
+    
+    def _runner_directory(self, language: str) -> str:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(base_dir, "docker-runners", self.runner_directories[language])
+    
+    def _runner_digest(self, language: str) -> str:
+        """sha256 over the paths and contents of a language's runner build context"""
+        digest = self._runner_digests.get(language)
+        if digest is None:
+            runner_dir = self._runner_directory(language)
+            sha = hashlib.sha256()
+            for root, dirs, files in os.walk(runner_dir):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    sha.update(os.path.relpath(path, runner_dir).encode("utf-8") + b"\0")
+                    with open(path, "rb") as f:
+                        sha.update(f.read())
+                    sha.update(b"\0")
+            digest = self._runner_digests[language] = sha.hexdigest()
+        return digest
+    
+    def _build_base_image(self, client, language: str, image_name: str, digest: str):
+        """Build a base Docker image for a specific language"""
+        started = time.perf_counter()
+        client.images.build(
+            path=self._runner_directory(language),
+            tag=image_name,
+            labels={RUNNER_DIGEST_LABEL: digest}
+        )
+        logger.info(f"Built {language} base image {image_name} in {time.perf_counter() - started:.1f}s")
+    
+    def _execute_sync(
+        self,
+        function_id: str,
+        function_name: str,
+        language: str,
+        code: str,
+        event: Dict[str, Any],
+        timeout: int,
+        dependencies: Optional[str] = None,
+        timer: Optional[PhaseTimer] = None,
+        submitted_at: Optional[float] = None,
+        on_output: Optional[Callable[[str], None]] = None,
+        memory_mb: Optional[int] = None,
+        cpu: Optional[float] = None,
+        execution: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Blocking body of execute_function: run the function in a warm container"""
+        execution = execution if execution is not None else {"cancelled": False, "pooled": None}
+        timer = timer if timer is not None else PhaseTimer()
+        if submitted_at is not None:
+            # Time spent waiting for a free execution thread
+            timer.add("dispatch", (time.perf_counter() - submitted_at) * 1000)
+        
+        request_id = str(uuid.uuid4())
+        
+        # Convert timeout to seconds for Docker
+        timeout_seconds = timeout / 1000
+        
+        try:
+            host, code_hash = self._place(
+                function_id, language, code, dependencies, timer, memory_mb, cpu
+            )
+        except (NoHostAvailable, ImageBuildError) as e:
+            logger.error(f"Cannot run {function_name}: {str(e)}")
+            return {
+                "error": True,
+                "message": str(e)
+            }
+        except Exception as e:
+            logger.error(f"Failed to place {function_name}: {str(e)}")
+            return {
+                "error": True,
+                "message": f"Failed to place function: {str(e)}"
+            }
+        
+        with self._hold(host):
             try:
-                # Run the container with the function
-                logger.info(f"Executing function {function_name} in container {container_name}")
-                
-                # Convert event data to JSON
-                event_json = json.dumps(event)
-                
-                # Run the container with appropriate environment variables
-                container = self.client.containers.run(
-                    image=self.supported_languages[language],
-                    name=container_name,
-                    detach=True,  # Run in background
-                    environment={
-                        "FUNCTION_NAME": function_name,
-                        "REQUEST_ID": container_id,
-                    },
-                    volumes={
-                        temp_dir: {'bind': '/function', 'mode': 'rw'}
-                    },
-                    stdin_open=True,
-                    mem_limit="512m",  # Limit memory usage
-                    cpu_count=4,  # Limit CPU usage
+                pool_key, code_path = self._resolve_runtime(
+                    host, function_id, language, code_hash, dependencies, timeout_seconds, timer,
+                    memory_mb, cpu
                 )
-                
-                # Keep track of the container
-                self.containers[container_id] = container
-                
-                # Send input data to container
-                socket = container.attach_socket(
-                    params={'stdin': 1, 'stream': 1}
-                )
-                os.write(socket.fileno(), event_json.encode('utf-8'))
-                socket.close()
-                
-                # Wait for container to finish with timeout
-                result = container.wait(timeout=timeout_seconds)
-                
-                # Get container logs (function output)
-                logs = container.logs(stdout=True, stderr=False).decode('utf-8')
-                stderr_logs = container.logs(stdout=False, stderr=True).decode('utf-8')
-                
-                # Check exit code
-                exit_code = result['StatusCode']
-                if exit_code != 0:
-                    logger.error(f"Function execution failed with exit code {exit_code}")
-                    logger.error(f"Error logs: {stderr_logs}")
-                    return {
-                        "error": True,
-                        "message": f"Function execution failed with exit code {exit_code}",
-                        "logs": stderr_logs
-                    }
-                
-                # Parse output
-                try:
-                    output = json.loads(logs)
-                    return {
-                        "error": False,
-                        "result": output
-                    }
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to parse function output as JSON: {logs}")
-                    return {
-                        "error": True,
-                        "message": "Function did not return valid JSON",
-                        "logs": logs
-                    }
-                
-            except docker.errors.ContainerError as e:
-                logger.error(f"Container error: {str(e)}")
+            except TimeoutError as e:
+                logger.error(f"Image for {function_name} not ready: {str(e)}")
                 return {
                     "error": True,
-                    "message": f"Container error: {str(e)}"
+                    "message": "Function image is still building, try again shortly"
                 }
             except Exception as e:
-                import traceback
-                error_trace = traceback.format_exc()
-                logger.error(f"Execution error: {str(e)}\n{error_trace}")
+                logger.error(f"Failed to prepare image for {function_name}: {str(e)}")
                 return {
                     "error": True,
-                    "message": f"Execution error: {str(e)}",
-                    "logs": error_trace
+                    "message": f"Image build failed: {str(e)}"
                 }
+            
+            try:
+                # Includes creating a container when the pool has no idle one
+                with timer.phase("checkout"):
+                    pooled = host.pool.checkout(pool_key, timeout=timeout_seconds)
+            except Exception as e:
+                logger.error(f"Failed to acquire container for {function_name} on {host.name}: {str(e)}")
+                self.scheduler.report_failure(host, str(e))
+                return {
+                    "error": True,
+                    "message": f"Failed to acquire container: {str(e)}"
+                }
+            self.scheduler.report_success(host)
+            
+            execution["pooled"] = pooled
+            if execution["cancelled"]:
+                # The caller gave up while the container was being acquired
+                host.pool.release(pooled)
+                return {
+                    "error": True,
+                    "timeout": True,
+                    "message": "Function execution timed out"
+                }
+            
+            healthy = True
+            usage = self.sampler.begin(pooled.container, function_id)
+            try:
+                result, healthy = self._invoke(
+                    pooled, function_name, request_id, code_hash, code_path, event,
+                    timeout_seconds, timer, on_output
+                )
+                return result
             finally:
-                # Clean up container
-                try:
-                    if container_id in self.containers:
-                        container = self.containers[container_id]
-                        container.remove(force=True)
-                        del self.containers[container_id]
-                        logger.info(f"Removed container {container_name}")
-                except Exception as e:
-                    logger.error(f"Failed to remove container: {str(e)}")
+                self.sampler.end(usage)
+                if execution["cancelled"]:
+                    healthy = False
+                # Hand the container back so the next invocation starts warm
+                with timer.phase("release"):
+                    host.pool.release(pooled, healthy=healthy)
     
-    def cleanup(self):
-        """Clean up all containers"""
-        for container_id, container in self.containers.items():
+    def _execute_batch_sync(
+        self,
+        function_id: str,
+        function_name: str,
+        language: str,
+        code: str,
+        events: List[Dict[str, Any]],
+        timeout: int,
+        dependencies: Optional[str],
+        parallelism: int,
+        memory_mb: Optional[int] = None,
+        cpu: Optional[float] = None,
+        execution: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Blocking body of execute_batch: run the batch in one warm container"""
+        execution = execution if execution is not None else {"cancelled": False, "pooled": None}
+        timeout_seconds = timeout / 1000
+        pending = set(range(len(events)))
+        
+        try:
+            host, code_hash = self._place(
+                function_id, language, code, dependencies, None, memory_mb, cpu
+            )
+        except (NoHostAvailable, ImageBuildError) as e:
+            logger.error(f"Cannot run batch for {function_name}: {str(e)}")
+            yield from self._fail_remaining(pending, str(e))
+            return
+        except Exception as e:
+            logger.error(f"Failed to place batch for {function_name}: {str(e)}")
+            yield from self._fail_remaining(pending, f"Failed to place function: {str(e)}")
+            return
+        
+        with self._hold(host):
             try:
-                container.remove(force=True)
-                logger.info(f"Removed container {container.name}")
+                pool_key, code_path = self._resolve_runtime(
+                    host, function_id, language, code_hash, dependencies, timeout_seconds,
+                    memory_mb=memory_mb, cpu=cpu
+                )
+                pooled = host.pool.checkout(pool_key, timeout=timeout_seconds)
             except Exception as e:
-                logger.error(f"Failed to remove container {container.name}: {str(e)}")
+                logger.error(f"Failed to start batch for {function_name}: {str(e)}")
+                yield from self._fail_remaining(pending, f"Failed to start batch: {str(e)}")
+                return
+            
+            execution["pooled"] = pooled
+            if execution["cancelled"]:
+                # The consumer went away while the container was being acquired
+                host.pool.release(pooled)
+                return
+            
+            state = {"healthy": True}
+            usage = self.sampler.begin(pooled.container, function_id)
+            try:
+                yield from self._invoke_batch(
+                    pooled, function_name, str(uuid.uuid4()), code_hash, code_path, events,
+                    timeout_seconds, parallelism, pending, state
+                )
+            finally:
+                self.sampler.end(usage)
+                if execution["cancelled"]:
+                    state["healthy"] = False
+                host.pool.release(pooled, healthy=state["healthy"])
+    
+    def _place(
+        self,
+        function_id: str,
+        language: str,
+        code: str,
+        dependencies: Optional[str],
+        timer: Optional[PhaseTimer] = None,
+        memory_mb: Optional[int] = None,
+        cpu: Optional[float] = None
+    ):
+        """
+        Store the function's code and pick the host to run it on
+        
+        The host is counted as busy until released with `_hold`.
+        
+        Raises:
+            NoHostAvailable: No execution host is healthy
+            ImageBuildError: The function's dependencies are malformed
         
-        self.containers = {}
\ No newline at end of file
+        Returns:
+            (host, code hash)
+        """
+        timer = timer if timer is not None else PhaseTimer()
+        with timer.phase("artifact"):
+            code_hash = self.artifacts.put(language, code)
+        
+        image = None
+        if dependencies and dependencies.strip():
+            # Tags are the same on every host built from the same runner sources
+            builder = next((host.image_builder for host in self.hosts if host.is_ready(language)), None)
+            if builder is None:
+                raise NoHostAvailable(f"No execution host is ready for {language} yet")
+            try:
+                image = builder.function_image(
+                    function_id, language, code_hash, dependencies
+                )
+            except ValueError as e:
+                raise ImageBuildError(f"Invalid dependencies: {str(e)}")
+        pool_key = self._pool_key(image or language, memory_mb, cpu)
+        with timer.phase("placement"):
+            host = self.scheduler.acquire(pool_key, image, language)
+        return host, code_hash
+    
+    @contextmanager
+    def _hold(self, host: ExecutionHost):
+        """Release `host`'s execution slot when the block exits"""
+        try:
+            yield host
+        finally:
+            self.scheduler.release(host)
+    
+    def _resolve_runtime(
+        self,
+        host: ExecutionHost,
+        function_id: str,
+        language: str,
+        code_hash: str,
+        dependencies: Optional[str],
+        timeout: float,
+        timer: Optional[PhaseTimer] = None,
+        memory_mb: Optional[int] = None,
+        cpu: Optional[float] = None
+    ):
+        """
+        Pick the pool on `host` and the code location for an invocation
+        
+        Functions without dependencies run on the shared language pool and
+        load their code from the artifact mount. Functions with dependencies
+        run on their own prebuilt image, which has the code baked in.
+        Functions with non-default resource limits get a separate pool per
+        limit combination, since limits are fixed when a container starts.
+        
+        Returns:
+            (pool key, code path inside the container)
+        """
+        timer = timer if timer is not None else PhaseTimer()
+        relative_path = self.artifacts.relative_path(language, code_hash)
+        
+        with timer.phase("image"):
+            image = host.image_builder.resolve(
+                function_id, language, os.path.join(self.artifacts.root, relative_path),
+                code_hash, dependencies, timeout
+            )
+        if image is None:
+            pool_key = self._pool_for(host, language, self.supported_languages[language], memory_mb, cpu)
+            return pool_key, f"{self.artifact_mount}/{relative_path}"
+        
+        pool_key = self._pool_for(host, image, image, memory_mb, cpu)
+        return pool_key, "/function/" + os.path.basename(relative_path)
+    
+    def _pool_key(self, base_key: str, memory_mb: Optional[int], cpu: Optional[float]) -> str:
+        """Pool key for `base_key` with the given resource limits"""
+        memory_mb = memory_mb or self.default_memory_mb
+        cpu = cpu or self.default_cpu
+        if memory_mb == self.default_memory_mb and cpu == self.default_cpu:
+            return base_key
+        return f"{base_key}@{memory_mb}m{cpu:g}c"
+    
+    def _pool_for(
+        self,
+        host: ExecutionHost,
+        base_key: str,
+        image: str,
+        memory_mb: Optional[int],
+        cpu: Optional[float]
+    ) -> str:
+        """Pool key for `image` with the given resource limits, registering it on first use"""
+        key = self._pool_key(base_key, memory_mb, cpu)
+        
+        # Language pools are registered at startup; the rest stay warm only while used
+        if not host.pool.is_registered(key):
+            memory_mb = memory_mb or self.default_memory_mb
+            cpu = cpu or self.default_cpu
+            host.pool.register(
+                key, image, min_size=0,
+                container_options=self._resource_options(memory_mb, cpu)
+            )
+        return key
+    
+    def _kill(self, pooled):
+        """Kill a container whose execution overran, stopping the handler immediately"""
+        try:
+            pooled.container.kill()
+            logger.info(f"Killed container {pooled.name}")
+        except Exception as e:
+            logger.error(f"Failed to kill container {pooled.name}: {str(e)}")
+    
+    def schedule_build(
+        self,
+        function_id: str,
+        language: str,
+        code: str,
+        dependencies: Optional[str]
+    ):
+        """
+        Start building a function's image in the background, if it needs one
+        
+        The image is built on every healthy host, so placement is never held
+        up by a build on a host the function has not run on yet.
+        """
+        if language not in self.supported_languages:
+            return
+        code_hash = self.artifacts.put(language, code)
+        code_file = os.path.join(self.artifacts.root, self.artifacts.relative_path(language, code_hash))
+        for host in self.hosts:
+            if host.is_ready(language):
+                try:
+                    host.image_builder.schedule(function_id, language, code_file, code_hash, dependencies)
+                except ValueError as e:
+                    logger.error(f"Not building image for function {function_id}: {str(e)}")
+                    return
+    
+    def build_status(self, function_id: str) -> Optional[Dict[str, Any]]:
+        """
+        State of the most recent image build for a function, if any
+        
+        The state is "failed" if the build failed on any host, "building"
+        while it is still running on one, and "ready" otherwise; per-host
+        states are under "hosts".
+        """
+        statuses = {
+            host.name: host.image_builder.status[function_id]
+            for host in self.hosts if function_id in host.image_builder.status
+        }
+        if not statuses:
+            return None
+        
+        states = {status["state"] for status in statuses.values()}
+        state = next(s for s in ("failed", "building", "ready") if s in states)
+        first = next(status for status in statuses.values() if status["state"] == state)
+        return dict(first, hosts=statuses)
+    
+    def _connect_runner(self, container) -> RunnerClient:
+        """Attach to a freshly started serve-mode runner and wait until it answers"""
+        runner = RunnerClient(container, exchange=self.payloads if self.payloads.enabled else None)
+        if not runner.ping(timeout=self.runner_start_timeout):
+            runner.close()
+            raise RunnerConnectionError(
+                f"Runner in {container.name} did not become ready: "
+                + "\n".join(runner.stderr_tail)
+            )
+        return runner
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Warm pool hit/miss counters and sizes per language, summed over hosts"""
+        totals: Dict[str, Dict[str, Any]] = {}
+        for host in self.hosts:
+            for key, stats in host.pool.stats().items():
+                merged = totals.setdefault(key, dict.fromkeys(stats, 0))
+                for name, value in stats.items():
+                    merged[name] += value
+        for stats in totals.values():
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return totals
+    
+    def host_stats(self) -> Dict[str, Any]:
+        """Health, load and placement counts per execution host"""
+        return {
+            "strategy": self.scheduler.strategy,
+            "hosts": self.scheduler.stats(),
+        }
+    
+    def cleanup(self):
+        """Clean up all containers"""
+        self.sampler.shutdown()
+        self.scheduler.shutdown()
+        for host in self.hosts:
+            host.pool.shutdown()
+            host.image_builder.shutdown()
+            host.reaper.shutdown()
+        super().cleanup()
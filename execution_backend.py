@@ -0,0 +1,546 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Iterator, AsyncIterator, Callable, Iterable, Tuple
+import logging
+
+from artifact_store import ArtifactStore
+from metrics import PhaseTimer
+from payload_exchange import PayloadExchange
+from runner_client import RunnerConnectionError
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionBackend:
+    """
+    A way of running functions; every backend returns the same results
+
+    execute_function resolves to {"error": False, "result": ..., "logs": ...}
+    or {"error": True, "message": ..., "logs": ...}, with "timeout": True when
+    the function ran out of time. execute_stream and execute_batch yield the
+    same results. Subclasses implement the blocking `_execute_sync` and
+    `_execute_batch_sync` bodies and `_kill`; this class runs them on a
+    bounded thread pool, kills an execution whose caller gave up, and maps
+    runner responses to results for backends built on the runner
+    entrypoints. A concurrency slot is held until the execution thread
+    returns, not just until the caller stops waiting for it.
+
+    Subclasses set `artifacts` and `payloads` to the stores their runners
+    load code from and exchange large payloads through.
+    """
+
+    name = "backend"
+    # Languages this backend can run
+    supported_languages: Dict[str, str] = {}
+    # Whether functions that declare dependencies can run here
+    supports_dependencies = False
+
+    artifacts: ArtifactStore
+    payloads: PayloadExchange
+
+    def __init__(self, max_concurrency: int):
+        # Runner calls block, so executions run on a dedicated bounded
+        # thread pool and a semaphore caps how many run at once
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix=f"{self.name}-exec"
+        )
+        self._concurrency = asyncio.Semaphore(max_concurrency)
+
+        # Resource limits for functions that do not set their own
+        self.default_memory_mb = int(os.getenv("FUNCTION_DEFAULT_MEMORY_MB", "512"))
+        self.default_cpu = float(os.getenv("FUNCTION_DEFAULT_CPU", "4"))
+
+    def start(self):
+        """Prepare the backend in the background; returns immediately"""
+
+    def is_ready(self, language: str) -> bool:
+        """True once functions in `language` can run"""
+        return language in self.supported_languages
+
+    def readiness(self) -> Dict[str, Any]:
+        """Per-language readiness"""
+        languages = {lang: {"ready": self.is_ready(lang)} for lang in self.supported_languages}
+        return {
+            "ready": all(language["ready"] for language in languages.values()),
+            "languages": languages,
+        }
+
+    def schedule_build(self, function_id: str, language: str, code: str, dependencies: Optional[str]):
+        """Start preparing what a function needs to run, if anything"""
+
+    def build_status(self, function_id: str) -> Optional[Dict[str, Any]]:
+        """State of the most recent preparation for a function, if any"""
+        return None
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Warm pool hit/miss counters and sizes per pool"""
+        return {}
+
+    def collect_artifacts(self, functions) -> int:
+        """Remove code artifacts not referenced by any of `functions`"""
+        live_keys = {
+            ArtifactStore.key(language, code) for language, code in functions
+        }
+        return self.artifacts.collect_garbage(
+            live_keys, min_age=float(os.getenv("ARTIFACT_GC_MIN_AGE", "3600"))
+        )
+
+    def collect_payloads(self) -> int:
+        """Remove payload files left behind by executions that never finished"""
+        return self.payloads.collect_garbage(min_age=float(os.getenv("PAYLOAD_GC_MIN_AGE", "3600")))
+
+    def cleanup(self):
+        self.executor.shutdown(wait=False)
+
+    async def execute_function(
+        self,
+        function_id: str,
+        function_name: str,
+        language: str,
+        code: str,
+        event: Dict[str, Any],
+        timeout: int = 30000,  # Timeout in milliseconds
+        dependencies: Optional[str] = None,
+        timer: Optional[PhaseTimer] = None,
+        on_output: Optional[Callable[[str], None]] = None,
+        memory_mb: Optional[int] = None,
+        cpu: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute a serverless function
+
+        If the caller is cancelled (e.g. by an outer timeout) while the
+        function runs, whatever runs it is killed rather than left running.
+
+        Args:
+            function_id: Unique identifier for the function
+            function_name: Name of the function
+            language: Programming language (python, javascript)
+            code: Function code as a string
+            event: Event data to pass to the function
+            timeout: Function timeout in milliseconds
+            dependencies: Declared dependencies (requirements / package.json)
+            timer: Collects the time spent in each phase of the invocation
+            on_output: Called from the execution thread with the function's
+                output as it is produced
+            memory_mb: Memory limit in MB, default FUNCTION_DEFAULT_MEMORY_MB
+            cpu: CPU limit in cores, default FUNCTION_DEFAULT_CPU
+
+        Returns:
+            Function execution result
+        """
+        if language not in self.supported_languages:
+            raise ValueError(f"Unsupported language: {language}")
+
+        timer = timer if timer is not None else PhaseTimer()
+        # Shared with the execution thread so a cancelled caller can reach the runner
+        execution = {"cancelled": False, "pooled": None}
+        loop = asyncio.get_running_loop()
+        with timer.phase("concurrency_wait"):
+            await self._concurrency.acquire()
+        try:
+            return await asyncio.wrap_future(self._submit(
+                loop,
+                functools.partial(
+                    self._execute_sync,
+                    function_id=function_id,
+                    function_name=function_name,
+                    language=language,
+                    code=code,
+                    event=event,
+                    timeout=timeout,
+                    dependencies=dependencies,
+                    timer=timer,
+                    submitted_at=time.perf_counter(),
+                    on_output=on_output,
+                    memory_mb=memory_mb,
+                    cpu=cpu,
+                    execution=execution
+                )
+            ))
+        except asyncio.CancelledError:
+            execution["cancelled"] = True
+            pooled = execution["pooled"]
+            if pooled is not None:
+                logger.error(f"Execution of {function_name} abandoned, killing {pooled.name}")
+                loop.run_in_executor(None, self._kill, pooled)
+            raise
+
+    async def execute_stream(
+        self,
+        function_id: str,
+        function_name: str,
+        language: str,
+        code: str,
+        event: Dict[str, Any],
+        timeout: int = 30000,  # Timeout in milliseconds
+        dependencies: Optional[str] = None,
+        timer: Optional[PhaseTimer] = None,
+        memory_mb: Optional[int] = None,
+        cpu: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute a serverless function, yielding its output as it is produced
+
+        Args:
+            function_id: Unique identifier for the function
+            function_name: Name of the function
+            language: Programming language (python, javascript)
+            code: Function code as a string
+            event: Event data to pass to the function
+            timeout: Function timeout in milliseconds
+            dependencies: Declared dependencies (requirements / package.json)
+            timer: Collects the time spent in each phase of the invocation
+            memory_mb: Memory limit in MB, default FUNCTION_DEFAULT_MEMORY_MB
+            cpu: CPU limit in cores, default FUNCTION_DEFAULT_CPU
+
+        Yields:
+            {"type": "log", "data": ...} chunks, then a final
+            {"type": "result", ...} carrying the execute_function result
+        """
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        def on_output(text: str):
+            loop.call_soon_threadsafe(chunks.put_nowait, text)
+
+        execution = asyncio.ensure_future(self.execute_function(
+            function_id, function_name, language, code, event,
+            timeout=timeout, dependencies=dependencies, timer=timer, on_output=on_output,
+            memory_mb=memory_mb, cpu=cpu
+        ))
+        try:
+            while not execution.done() or not chunks.empty():
+                getter = asyncio.ensure_future(chunks.get())
+                await asyncio.wait([getter, execution], return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield {"type": "log", "data": getter.result()}
+                else:
+                    getter.cancel()
+            yield dict(execution.result(), type="result")
+        finally:
+            execution.cancel()
+
+    async def execute_batch(
+        self,
+        function_id: str,
+        function_name: str,
+        language: str,
+        code: str,
+        events: List[Dict[str, Any]],
+        timeout: int = 30000,  # Per-item timeout in milliseconds
+        dependencies: Optional[str] = None,
+        parallelism: int = 1,
+        memory_mb: Optional[int] = None,
+        cpu: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute a batch of events in a single warm runner
+
+        Args:
+            function_id: Unique identifier for the function
+            function_name: Name of the function
+            language: Programming language (python, javascript)
+            code: Function code as a string
+            events: Events to pass to the function, one invocation each
+            timeout: Longest wait in milliseconds for the next item to finish
+            dependencies: Declared dependencies (requirements / package.json)
+            parallelism: How many events the runner handles at once
+            memory_mb: Memory limit in MB, default FUNCTION_DEFAULT_MEMORY_MB
+            cpu: CPU limit in cores, default FUNCTION_DEFAULT_CPU
+
+        Yields:
+            One result per event as it completes, with its index in `events`
+
+        If the consumer goes away (e.g. a streaming client disconnects)
+        before the batch completes, the runner is killed and the rest of the
+        batch is abandoned. Errors raised while producing results are
+        raised to the consumer.
+        """
+        if language not in self.supported_languages:
+            raise ValueError(f"Unsupported language: {language}")
+
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        stop = threading.Event()
+        execution = {"cancelled": False, "pooled": None}
+
+        def produce():
+            try:
+                for item in self._execute_batch_sync(
+                    function_id, function_name, language, code, events,
+                    timeout, dependencies, parallelism, memory_mb, cpu, execution
+                ):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+            except Exception as e:
+                logger.error(f"Batch for {function_name} failed: {str(e)}")
+                loop.call_soon_threadsafe(items.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(items.put_nowait, finished)
+
+        await self._concurrency.acquire()
+        producer = self._submit(loop, produce)
+        completed = False
+        try:
+            while True:
+                item = await items.get()
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    # The producer is done with the runner
+                    completed = True
+                    raise item
+                yield item
+            completed = True
+        finally:
+            if not completed and not producer.done():
+                stop.set()
+                execution["cancelled"] = True
+                pooled = execution["pooled"]
+                if pooled is not None:
+                    logger.error(f"Batch for {function_name} abandoned, killing {pooled.name}")
+                    loop.run_in_executor(None, self._kill, pooled)
+
+    def _submit(self, loop: asyncio.AbstractEventLoop, fn: Callable[[], Any]) -> Future:
+        """
+        Run `fn` on the execution pool under a concurrency slot the caller acquired
+
+        The slot is released when `fn` returns (or if it never starts), so
+        an execution its caller stopped waiting for still counts until its
+        thread is done with it.
+        """
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self._concurrency.release)
+            except RuntimeError:
+                # The loop is closed; nothing waits on the semaphore any more
+                pass
+
+        try:
+            future = self.executor.submit(fn)
+        except BaseException:
+            self._concurrency.release()
+            raise
+        future.add_done_callback(release)
+        return future
+
+    def _execute_sync(
+        self,
+        function_id: str,
+        function_name: str,
+        language: str,
+        code: str,
+        event: Dict[str, Any],
+        timeout: int,
+        dependencies: Optional[str] = None,
+        timer: Optional[PhaseTimer] = None,
+        submitted_at: Optional[float] = None,
+        on_output: Optional[Callable[[str], None]] = None,
+        memory_mb: Optional[int] = None,
+        cpu: Optional[float] = None,
+        execution: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Blocking body of execute_function, run on the execution thread pool
+
+        Implementations store what runs the function in execution["pooled"]
+        as soon as they have it, so `_kill` can reach it if the caller gives up.
+        """
+        raise NotImplementedError
+
+    def _execute_batch_sync(
+        self,
+        function_id: str,
+        function_name: str,
+        language: str,
+        code: str,
+        events: List[Dict[str, Any]],
+        timeout: int,
+        dependencies: Optional[str],
+        parallelism: int,
+        memory_mb: Optional[int] = None,
+        cpu: Optional[float] = None,
+        execution: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Blocking body of execute_batch, run on the execution thread pool
+
+        Like `_execute_sync`, implementations store the runner in
+        execution["pooled"] once they have it. The generator is closed
+        early when the consumer goes away.
+        """
+        raise NotImplementedError
+
+    def _kill(self, pooled):
+        """Stop a runner that is still running an abandoned or timed-out execution"""
+        raise NotImplementedError
+
+    def _invoke(
+        self,
+        pooled,
+        function_name: str,
+        request_id: str,
+        code_hash: str,
+        code_path: str,
+        event: Dict[str, Any],
+        timeout_seconds: float,
+        timer: PhaseTimer,
+        on_output: Optional[Callable[[str], None]] = None,
+        limits: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Run one invocation on the runner of a checked-out `pooled` entry
+
+        Returns:
+            (execute_function result, whether the runner can be reused)
+        """
+        try:
+            logger.info(f"Executing function {function_name} in {pooled.name}")
+
+            # The runner caches the loaded handler by the artifact key
+            with timer.phase("invoke"):
+                response = pooled.runner.invoke(
+                    code_hash=code_hash,
+                    code_path=code_path,
+                    event=event,
+                    context={
+                        "function_name": function_name,
+                        "request_id": request_id,
+                    },
+                    timeout=timeout_seconds,
+                    on_output=on_output,
+                    limits=limits
+                )
+            if response.get("duration_ms") is not None:
+                # Handler time as measured inside the runner
+                timer.add("handler", response["duration_ms"])
+            if response.get("fork_ms") is not None:
+                # Time to fork the handler's process from the runner's zygote
+                timer.add("fork", response["fork_ms"])
+
+            if response.get("status") != "ok":
+                logger.error(f"Function execution failed: {response.get('message')}")
+                logger.error(f"Error logs: {response.get('logs')}")
+                # "fatal": the runner itself broke (e.g. its zygote exited) and must be retired
+                return {
+                    "error": True,
+                    "message": response.get("message", "Function execution failed"),
+                    "logs": response.get("logs")
+                }, not response.get("fatal", False)
+
+            return {
+                "error": False,
+                "result": response.get("result"),
+                "logs": response.get("logs") or None
+            }, True
+
+        except TimeoutError as e:
+            # The handler is still running inside the runner; kill it now
+            # rather than letting it burn CPU until the runner is removed
+            logger.error(f"Function {function_name} timed out: {str(e)}")
+            self._kill(pooled)
+            return {
+                "error": True,
+                "timeout": True,
+                "message": "Function execution timed out",
+                "logs": "Function execution timed out"
+            }, False
+        except RunnerConnectionError as e:
+            logger.error(f"Runner error: {str(e)}")
+            return {
+                "error": True,
+                "message": f"Runner error: {str(e)}"
+            }, False
+        except Exception as e:
+            error_trace = traceback.format_exc()
+            logger.error(f"Execution error: {str(e)}\n{error_trace}")
+            return {
+                "error": True,
+                "message": f"Execution error: {str(e)}",
+                "logs": error_trace
+            }, False
+
+    def _invoke_batch(
+        self,
+        pooled,
+        function_name: str,
+        request_id: str,
+        code_hash: str,
+        code_path: str,
+        events: List[Dict[str, Any]],
+        timeout_seconds: float,
+        parallelism: int,
+        pending: set,
+        state: Dict[str, Any],
+        limits: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Run a batch on the runner of a checked-out `pooled` entry, yielding results
+
+        Indexes are removed from `pending` as their results arrive, and
+        state["healthy"] is cleared when the runner should not be reused.
+        """
+        try:
+            logger.info(
+                f"Executing batch of {len(events)} events for {function_name} in {pooled.name}"
+            )
+
+            for response in pooled.runner.invoke_batch(
+                code_hash=code_hash,
+                code_path=code_path,
+                events=events,
+                context={
+                    "function_name": function_name,
+                    "request_id": request_id,
+                },
+                timeout=timeout_seconds,
+                parallelism=parallelism,
+                limits=limits
+            ):
+                if response.get("type") == "item":
+                    pending.discard(response["index"])
+                    ok = response.get("status") == "ok"
+                    yield {
+                        "index": response["index"],
+                        "error": not ok,
+                        "result": response.get("result") if ok else None,
+                        "message": None if ok else response.get("message"),
+                        "logs": response.get("logs") or None,
+                        "duration_ms": response.get("duration_ms"),
+                    }
+                elif response.get("status") != "ok":
+                    if response.get("fatal"):
+                        state["healthy"] = False
+                    yield from self._fail_remaining(
+                        pending, response.get("message", "Batch execution failed"), response.get("logs")
+                    )
+
+        except GeneratorExit:
+            # Closed by a consumer that went away, with items possibly still running
+            state["healthy"] = False
+            raise
+        except TimeoutError:
+            # Items may still be running inside the runner, so retire it
+            state["healthy"] = False
+            logger.error(f"Batch for {function_name} timed out")
+            self._kill(pooled)
+            yield from self._fail_remaining(pending, "Function execution timed out")
+        except Exception as e:
+            state["healthy"] = False
+            logger.error(f"Batch execution error: {str(e)}")
+            yield from self._fail_remaining(pending, f"Execution error: {str(e)}")
+
+    @staticmethod
+    def _fail_remaining(pending: Iterable[int], message: str, logs: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Error results for every batch item that has not completed"""
+        for index in sorted(pending):
+            yield {"index": index, "error": True, "message": message, "logs": logs}
@@ -0,0 +1,418 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
+import asyncio
+import bisect
+import json
+import os
+from datetime import datetime, timedelta
+import logging
+
+from main import get_db, SessionLocal, Function, Execution, ExecutionRollup
+from metrics import registry, Gauge
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Upper bounds of the latency histogram kept per rollup bucket, in
+# milliseconds; one extra bucket counts everything slower
+LATENCY_BOUNDS_MS = (
+    1, 2, 5, 10, 20, 50, 100, 200, 500,
+    1000, 2000, 5000, 10000, 30000, 60000, 300000
+)
+
+# Upper bounds of the peak memory (MB) and peak CPU (cores) histograms
+MEMORY_BOUNDS_MB = (
+    16, 32, 48, 64, 96, 128, 160, 192, 256, 320, 384, 448, 512,
+    640, 768, 1024, 1536, 2048, 3072, 4096, 8192
+)
+CPU_BOUNDS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 4, 6, 8, 16)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def latency_bucket(duration_ms: float) -> int:
+    return bisect.bisect_left(LATENCY_BOUNDS_MS, duration_ms)
+
+
+def histogram_percentile(
+    counts: List[int],
+    fraction: float,
+    max_ms: float,
+    bounds: Tuple[float, ...] = LATENCY_BOUNDS_MS
+) -> float:
+    """Estimate a percentile from histogram counts, interpolating within the bucket"""
+    total = sum(counts)
+    if not total:
+        return 0.0
+
+    rank = fraction * total
+    cumulative = 0
+    for i, count in enumerate(counts):
+        if count and cumulative + count >= rank:
+            lower = bounds[i - 1] if i else 0.0
+            upper = bounds[i] if i < len(bounds) else max_ms
+            estimate = lower + (upper - lower) * (rank - cumulative) / count
+            return round(min(estimate, max_ms), 3)
+        cumulative += count
+    return max_ms
+
+
+def merge_histograms(histograms: List[Optional[str]], size: int) -> List[int]:
+    """Sum JSON-encoded histograms, skipping missing ones"""
+    merged = [0] * size
+    for histogram in histograms:
+        if histogram:
+            merged = [a + b for a, b in zip(merged, json.loads(histogram))]
+    return merged
+
+
+def bucket_start(moment: datetime, bucket_seconds: int) -> datetime:
+    """Start of the fixed-size bucket containing `moment`"""
+    seconds = int((moment - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % bucket_seconds)
+
+
+class ExecutionRecorder:
+    """
+    Buffers execution records in memory and writes them to the database in bulk
+
+    `record` only appends to an in-memory buffer, so the invoke path never
+    waits for the database. A background task flushes the buffer every
+    `flush_interval` seconds, or as soon as `batch_size` records are waiting,
+    with one bulk INSERT per batch. The same transaction folds the batch into
+    per-function rollups over `bucket_seconds` buckets, so stats are served
+    without scanning raw rows.
+
+    When the buffer holds `max_buffer` records, callers are held for up to
+    `backpressure_timeout` seconds while the writer catches up; records that
+    still do not fit are dropped and counted.
+
+    Resource usage samples (`record_usage`) share the buffer and are folded
+    into the same rollups, without a raw row of their own.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        max_buffer: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        bucket_seconds: int = 300,
+        backpressure_timeout: float = 0.1
+    ):
+        self.session_factory = session_factory
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.bucket_seconds = bucket_seconds
+        self.backpressure_timeout = backpressure_timeout
+
+        self._buffer: deque = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_needed: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+    async def record(self, entry: Dict[str, Any]) -> bool:
+        """Buffer one execution record; False if it had to be dropped"""
+        if len(self._buffer) >= self.max_buffer:
+            if self._flush_needed is None:
+                self.dropped += 1
+                return False
+
+            self._flush_needed.set()
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.backpressure_timeout
+            while len(self._buffer) >= self.max_buffer:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.dropped += 1
+                    return False
+                self._space.clear()
+                try:
+                    await asyncio.wait_for(self._space.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+        self._buffer.append(entry)
+        if len(self._buffer) >= self.batch_size and self._flush_needed is not None:
+            self._flush_needed.set()
+        return True
+
+    def record_usage(self, usage: Dict[str, Any]) -> bool:
+        """
+        Buffer the peak memory/CPU of one execution; safe to call from any thread
+
+        Never waits: usage samples are dropped as soon as the buffer is full.
+        """
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return False
+        self._buffer.append(dict(usage, usage=True, started_at=datetime.utcnow()))
+        return True
+
+    def start(self):
+        self._stopping = False
+        self._flush_needed = asyncio.Event()
+        self._space = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer and flush whatever is still buffered"""
+        if self._task is not None:
+            # Not cancelled: a batch it is writing would go uncounted
+            self._stopping = True
+            self._flush_needed.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        while self._buffer:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            if self._space is not None:
+                self._space.set()
+            try:
+                await asyncio.to_thread(self._write, batch)
+                self.written += len(batch)
+            except Exception as e:
+                self.failed_batches += 1
+                self.dropped += len(batch)
+                logger.error(f"Failed to write {len(batch)} execution records: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "max_buffer": self.max_buffer,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches,
+        }
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            await self.flush()
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        """Insert a batch of executions and fold it into the rollups, in one transaction"""
+        rollups: Dict[Tuple[int, datetime], Dict[str, Any]] = {}
+        executions = []
+        for entry in batch:
+            key = (int(entry["function_id"]), bucket_start(entry["started_at"], self.bucket_seconds))
+            rollup = rollups.setdefault(key, {
+                "count": 0, "errors": 0, "timeouts": 0, "cache_hits": 0,
+                "duration_sum_ms": 0.0, "duration_max_ms": 0.0, "output_bytes": 0,
+                "latency_histogram": [0] * (len(LATENCY_BOUNDS_MS) + 1),
+                "usage_samples": 0, "peak_memory_mb": 0.0, "peak_cpu": 0.0,
+                "memory_histogram": [0] * (len(MEMORY_BOUNDS_MB) + 1),
+                "cpu_histogram": [0] * (len(CPU_BOUNDS) + 1),
+            })
+            if entry.get("usage"):
+                rollup["usage_samples"] += 1
+                rollup["peak_memory_mb"] = max(rollup["peak_memory_mb"], entry["peak_memory_mb"])
+                rollup["peak_cpu"] = max(rollup["peak_cpu"], entry["peak_cpu"])
+                rollup["memory_histogram"][bisect.bisect_left(MEMORY_BOUNDS_MB, entry["peak_memory_mb"])] += 1
+                rollup["cpu_histogram"][bisect.bisect_left(CPU_BOUNDS, entry["peak_cpu"])] += 1
+                continue
+
+            executions.append(entry)
+            rollup["count"] += 1
+            rollup["errors"] += 1 if entry["error"] else 0
+            rollup["timeouts"] += 1 if entry["exit_code"] == 124 else 0
+            rollup["cache_hits"] += 1 if entry["cache_hit"] else 0
+            rollup["duration_sum_ms"] += entry["duration_ms"]
+            rollup["duration_max_ms"] = max(rollup["duration_max_ms"], entry["duration_ms"])
+            rollup["output_bytes"] += entry["output_bytes"]
+            rollup["latency_histogram"][latency_bucket(entry["duration_ms"])] += 1
+
+        # Another process may insert the same rollup row first; retry once
+        for attempt in range(2):
+            db = self.session_factory()
+            try:
+                if executions:
+                    db.execute(insert(Execution), executions)
+                self._merge_rollups(db, rollups)
+                db.commit()
+                return
+            except IntegrityError:
+                db.rollback()
+                if attempt:
+                    raise
+            finally:
+                db.close()
+
+    def _merge_rollups(self, db: Session, rollups: Dict[Tuple[int, datetime], Dict[str, Any]]):
+        existing = {
+            (row.function_id, row.bucket_start): row
+            for row in db.query(ExecutionRollup).filter(
+                ExecutionRollup.function_id.in_({key[0] for key in rollups}),
+                ExecutionRollup.bucket_start.in_({key[1] for key in rollups})
+            ).with_for_update()
+        }
+
+        for (function_id, start), rollup in rollups.items():
+            row = existing.get((function_id, start))
+            if row is None:
+                db.add(ExecutionRollup(
+                    function_id=function_id,
+                    bucket_start=start,
+                    **dict(rollup, **{
+                        name: json.dumps(rollup[name])
+                        for name in ("latency_histogram", "memory_histogram", "cpu_histogram")
+                    })
+                ))
+                continue
+
+            row.count += rollup["count"]
+            row.errors += rollup["errors"]
+            row.timeouts += rollup["timeouts"]
+            row.cache_hits += rollup["cache_hits"]
+            row.duration_sum_ms += rollup["duration_sum_ms"]
+            row.duration_max_ms = max(row.duration_max_ms, rollup["duration_max_ms"])
+            row.output_bytes += rollup["output_bytes"]
+            row.latency_histogram = json.dumps([
+                a + b for a, b in zip(json.loads(row.latency_histogram), rollup["latency_histogram"])
+            ])
+            if rollup["usage_samples"]:
+                row.usage_samples = (row.usage_samples or 0) + rollup["usage_samples"]
+                row.peak_memory_mb = max(row.peak_memory_mb or 0.0, rollup["peak_memory_mb"])
+                row.peak_cpu = max(row.peak_cpu or 0.0, rollup["peak_cpu"])
+                for name in ("memory_histogram", "cpu_histogram"):
+                    merged = merge_histograms([getattr(row, name)], len(rollup[name]))
+                    setattr(row, name, json.dumps([a + b for a, b in zip(merged, rollup[name])]))
+
+
+execution_recorder = ExecutionRecorder(
+    SessionLocal,
+    max_buffer=int(os.getenv("EXECUTION_HISTORY_BUFFER", "10000")),
+    batch_size=int(os.getenv("EXECUTION_HISTORY_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("EXECUTION_HISTORY_FLUSH_INTERVAL", "1")),
+    bucket_seconds=int(os.getenv("EXECUTION_ROLLUP_SECONDS", "300")),
+    backpressure_timeout=float(os.getenv("EXECUTION_HISTORY_BACKPRESSURE_TIMEOUT", "0.1"))
+)
+
+
+def collect_recorder_metrics():
+    """Execution history buffer size and write/drop counters, read at scrape time"""
+    recorder = Gauge("execution_history_records", "Execution history records by state", ["state"])
+    stats = execution_recorder.stats()
+    for state in ("buffered", "written", "dropped"):
+        recorder.set(stats[state], state=state)
+    return [recorder]
+
+
+registry.add_collector(collect_recorder_metrics)
+
+
+def summarize_bucket(start: Optional[datetime], rows: List[ExecutionRollup]) -> Dict[str, Any]:
+    """Merge rollup rows into one summary with latency percentiles"""
+    histogram = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+    count = errors = timeouts = cache_hits = output_bytes = 0
+    duration_sum = duration_max = 0.0
+    for row in rows:
+        count += row.count
+        errors += row.errors
+        timeouts += row.timeouts
+        cache_hits += row.cache_hits
+        output_bytes += row.output_bytes
+        duration_sum += row.duration_sum_ms
+        duration_max = max(duration_max, row.duration_max_ms)
+        histogram = [a + b for a, b in zip(histogram, json.loads(row.latency_histogram))]
+
+    summary = {
+        "count": count,
+        "errors": errors,
+        "timeouts": timeouts,
+        "cache_hits": cache_hits,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "mean_ms": round(duration_sum / count, 3) if count else 0.0,
+        "max_ms": round(duration_max, 3),
+        "p50_ms": histogram_percentile(histogram, 0.50, duration_max),
+        "p95_ms": histogram_percentile(histogram, 0.95, duration_max),
+        "p99_ms": histogram_percentile(histogram, 0.99, duration_max),
+        "output_bytes": output_bytes,
+    }
+    if start is not None:
+        summary = dict(start=start, **summary)
+    return summary
+
+
+def usage_summary(db: Session, function_id: int, since: datetime) -> Dict[str, Any]:
+    """Peak memory and CPU percentiles of a function's sampled executions since `since`"""
+    rows = db.query(ExecutionRollup).filter(
+        ExecutionRollup.function_id == function_id,
+        ExecutionRollup.bucket_start >= since,
+        ExecutionRollup.usage_samples > 0
+    ).all()
+
+    memory = merge_histograms([row.memory_histogram for row in rows], len(MEMORY_BOUNDS_MB) + 1)
+    cpu = merge_histograms([row.cpu_histogram for row in rows], len(CPU_BOUNDS) + 1)
+    memory_max = max((row.peak_memory_mb for row in rows), default=0.0)
+    cpu_max = max((row.peak_cpu for row in rows), default=0.0)
+    return {
+        "samples": sum(row.usage_samples for row in rows),
+        "memory_mb": {
+            "p50": histogram_percentile(memory, 0.50, memory_max, MEMORY_BOUNDS_MB),
+            "p95": histogram_percentile(memory, 0.95, memory_max, MEMORY_BOUNDS_MB),
+            "p99": histogram_percentile(memory, 0.99, memory_max, MEMORY_BOUNDS_MB),
+            "max": round(memory_max, 2),
+        },
+        "cpu": {
+            "p50": histogram_percentile(cpu, 0.50, cpu_max, CPU_BOUNDS),
+            "p95": histogram_percentile(cpu, 0.95, cpu_max, CPU_BOUNDS),
+            "p99": histogram_percentile(cpu, 0.99, cpu_max, CPU_BOUNDS),
+            "max": round(cpu_max, 3),
+        },
+    }
+
+
+@router.get("/api/functions/{function_id}/stats")
+def get_function_stats(
+    function_id: int,
+    hours: float = Query(24, gt=0, le=24 * 90),
+    bucket_seconds: Optional[int] = Query(None, gt=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Execution counts, error rate and latency percentiles for a function
+
+    Served from the precomputed rollups, over the last `hours` hours, in
+    buckets of `bucket_seconds` (rounded to a multiple of the rollup size).
+    Executions from the last flush interval may not be included yet.
+    """
+    if db.query(Function.id).filter(Function.id == function_id).first() is None:
+        raise HTTPException(status_code=404, detail="Function not found")
+
+    resolution = execution_recorder.bucket_seconds
+    bucket = max(resolution, (bucket_seconds or resolution) // resolution * resolution)
+    since = bucket_start(datetime.utcnow() - timedelta(hours=hours), resolution)
+
+    rows = db.query(ExecutionRollup).filter(
+        ExecutionRollup.function_id == function_id,
+        ExecutionRollup.bucket_start >= since
+    ).order_by(ExecutionRollup.bucket_start).all()
+
+    buckets: Dict[datetime, List[ExecutionRollup]] = {}
+    for row in rows:
+        buckets.setdefault(bucket_start(row.bucket_start, bucket), []).append(row)
+
+    return {
+        "function_id": function_id,
+        "since": since,
+        "bucket_seconds": bucket,
+        "totals": summarize_bucket(None, rows),
+        "buckets": [summarize_bucket(start, grouped) for start, grouped in buckets.items()],
+    }
@@ -0,0 +1,231 @@
+import threading
+from typing import Dict, Any, Optional, List, Callable, Iterable, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NoHostAvailable(Exception):
+    """Every execution host is unhealthy"""
+
+
+class ExecutionHost:
+    """
+    One Docker daemon functions run on
+
+    Each host has its own client, warm container pool and image builder,
+    since containers and images are local to a daemon, and a reaper removing
+    the daemon's spent and orphaned containers. `prepare` builds the
+    base images and fills the pool; it is retried by the health checker for
+    hosts that were unreachable when the platform started.
+
+    The host is put in rotation as soon as its daemon answers, but only
+    runs functions of languages in `ready_languages`; the prepare callback
+    records each language's progress with `set_runtime_state`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        client,
+        pool,
+        image_builder,
+        capacity: int,
+        prepare: Optional[Callable[["ExecutionHost"], None]] = None,
+        reaper=None
+    ):
+        self.name = name
+        self.client = client
+        self.pool = pool
+        self.image_builder = image_builder
+        self.capacity = capacity
+        self._prepare = prepare
+        self.reaper = reaper
+
+        self.prepared = False
+        self.healthy = False
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.inflight = 0
+        self.placed = 0
+        self.runtimes: Dict[str, Dict[str, Any]] = {}
+        self._preparing = threading.Lock()
+
+    def prepare(self):
+        """Ping the daemon and run the prepare callback; a no-op while another thread prepares the host"""
+        if not self._preparing.acquire(blocking=False):
+            return
+        try:
+            self.client.ping()
+            self.healthy = True
+            self.failures = 0
+            if self._prepare is not None:
+                self._prepare(self)
+            self.prepared = True
+        finally:
+            self._preparing.release()
+
+    def set_runtime_state(self, language: str, state: str, error: Optional[str] = None):
+        """Record the state of a language runtime: pending, building, ready or failed"""
+        self.runtimes[language] = {"state": state, "error": error}
+
+    @property
+    def ready_languages(self) -> Set[str]:
+        return {language for language, runtime in self.runtimes.items() if runtime["state"] == "ready"}
+
+    def is_ready(self, language: str) -> bool:
+        return self.healthy and self.runtimes.get(language, {}).get("state") == "ready"
+
+    @property
+    def load(self) -> float:
+        return self.inflight / self.capacity if self.capacity else 1.0
+
+    def has_warm(self, pool_key: str) -> bool:
+        return self.pool.idle_count(pool_key) > 0
+
+    def has_image(self, image: Optional[str]) -> bool:
+        return image is not None and self.image_builder.is_ready(image)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "inflight": self.inflight,
+            "capacity": self.capacity,
+            "placed": self.placed,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "runtimes": dict(self.runtimes),
+            "reaper": self.reaper.stats() if self.reaper is not None else None,
+        }
+
+
+class HostScheduler:
+    """
+    Places executions on execution hosts and tracks their load and health
+
+    `acquire` picks a healthy host below its capacity and counts the
+    execution against it until `release`. With the "warm" strategy hosts
+    that have an idle container for the execution's pool come first, then
+    hosts that already have its image built, then the least loaded; with
+    "least-loaded" only the load counts. When every healthy host is at
+    capacity the least loaded one is used anyway and the execution waits
+    in its pool.
+
+    A background thread pings every host each `health_interval` seconds.
+    A host is taken out of rotation after `failure_threshold` consecutive
+    failed pings or infrastructure errors, and put back on the next
+    successful ping.
+    """
+
+    STRATEGIES = ("warm", "least-loaded")
+
+    def __init__(
+        self,
+        hosts: Iterable[ExecutionHost],
+        strategy: str = "warm",
+        health_interval: float = 10,
+        failure_threshold: int = 2
+    ):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown placement strategy: {strategy}")
+        self.hosts: List[ExecutionHost] = list(hosts)
+        self.strategy = strategy
+        self.health_interval = health_interval
+        self.failure_threshold = failure_threshold
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None and self.health_interval > 0:
+            self._thread = threading.Thread(target=self._health_loop, name="host-health", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def acquire(
+        self,
+        pool_key: str,
+        image: Optional[str] = None,
+        language: Optional[str] = None
+    ) -> ExecutionHost:
+        """
+        Pick a host for an execution on `pool_key` and count it as running there
+
+        With `language`, only hosts whose runtime for it is ready are used.
+
+        Raises:
+            NoHostAvailable: No host is healthy (and ready for `language`)
+        """
+        with self._lock:
+            healthy = [host for host in self.hosts if host.healthy]
+            if not healthy:
+                raise NoHostAvailable("No healthy execution host")
+            if language is not None:
+                healthy = [host for host in healthy if language in host.ready_languages]
+                if not healthy:
+                    raise NoHostAvailable(f"No execution host is ready for {language} yet")
+
+            candidates = [host for host in healthy if host.inflight < host.capacity] or healthy
+            if self.strategy == "warm":
+                host = min(candidates, key=lambda h: (
+                    not h.has_warm(pool_key), not h.has_image(image), h.load, h.inflight
+                ))
+            else:
+                host = min(candidates, key=lambda h: (h.load, h.inflight))
+
+            host.inflight += 1
+            host.placed += 1
+            return host
+
+    def release(self, host: ExecutionHost):
+        with self._lock:
+            host.inflight -= 1
+
+    def report_failure(self, host: ExecutionHost, error: str):
+        """Count an infrastructure error (not a function error) against `host`"""
+        with self._lock:
+            host.failures += 1
+            host.last_error = error
+            if host.healthy and host.failures >= self.failure_threshold:
+                host.healthy = False
+                logger.error(f"Execution host {host.name} marked unhealthy: {error}")
+
+    def report_success(self, host: ExecutionHost):
+        if host.failures:
+            with self._lock:
+                host.failures = 0
+
+    def check_health(self):
+        """Ping every host, preparing hosts that were unreachable at startup"""
+        for host in self.hosts:
+            try:
+                host.client.ping()
+                if not host.prepared:
+                    host.prepare()
+                    logger.info(f"Execution host {host.name} is ready")
+            except Exception as e:
+                self.report_failure(host, str(e))
+                continue
+
+            with self._lock:
+                host.failures = 0
+                if not host.healthy:
+                    host.healthy = True
+                    logger.info(f"Execution host {host.name} is healthy again")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {host.name: host.stats() for host in self.hosts}
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.error(f"Execution host health check failed: {str(e)}")
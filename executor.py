@@ -1,22 +1,91 @@
-from fastapi import APIRouter, HTTPException, Depends, Body, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Body, BackgroundTasks, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
+import os
 import time
 import json
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
 import asyncio
+import math
+from contextlib import asynccontextmanager
 
 # Import dependencies
-from main import get_db, Function
+from sqlalchemy import select
+from main import get_db, async_session, Function, function_cache
+from artifact_store import ArtifactStore
 from docker_manager import DockerManager
+from execution_backend import ExecutionBackend
+from local_backend import LocalProcessBackend
+from result_cache import create_result_cache
+from execution_history import execution_recorder, usage_summary
+from admission import admission, AdmissionRejected
+from metrics import (
+    PhaseTimer, registry, Gauge, phase_duration, invocation_duration,
+    invocations_total, errors_total, timeouts_total, inflight, throttled_total
+)
 
 router = APIRouter()
-docker_manager = DockerManager()
+
+# Execution backends by the name functions select them with
+BACKEND_TYPES = {
+    "docker": DockerManager,
+    "local": LocalProcessBackend,
+}
+
+def create_backends(spec: str) -> Dict[str, ExecutionBackend]:
+    """
+    Instantiate the backends named in EXECUTION_BACKENDS, e.g. "docker,local"
+    
+    The first one runs functions that do not choose a backend.
+    """
+    names = [name.strip() for name in spec.split(",") if name.strip()]
+    unknown = [name for name in names if name not in BACKEND_TYPES]
+    if unknown or not names:
+        raise ValueError(
+            f"EXECUTION_BACKENDS must list some of {', '.join(BACKEND_TYPES)}, got {spec!r}"
+        )
+    return {name: BACKEND_TYPES[name]() for name in dict.fromkeys(names)}
+
+backends = create_backends(os.getenv("EXECUTION_BACKENDS", "docker"))
+default_backend = next(iter(backends.values()))
+# Container-specific endpoints (hosts, image builds) use this when enabled
+docker_manager: Optional[DockerManager] = backends.get("docker")
+if docker_manager is not None:
+    # Peak memory/CPU of executions feed the rollups behind /recommendation
+    docker_manager.sampler.on_usage = execution_recorder.record_usage
+result_cache = create_result_cache(
+    os.getenv("RESULT_CACHE_BACKEND", "memory"),
+    os.getenv("RESULT_CACHE_PATH", "result-cache.sqlite3"),
+    int(os.getenv("RESULT_CACHE_SIZE", "10000"))
+)
+
+# Headroom added on top of observed usage when recommending limits
+RECOMMENDATION_HEADROOM = float(os.getenv("RECOMMENDATION_HEADROOM", "1.25"))
+# Memory of the runner process itself, added to a function's measured use
+RECOMMENDATION_RUNNER_MEMORY_MB = float(os.getenv("RECOMMENDATION_RUNNER_MEMORY_MB", "64"))
+# Fewer sampled executions than this are flagged as not enough to go on
+RECOMMENDATION_MIN_SAMPLES = int(os.getenv("RECOMMENDATION_MIN_SAMPLES", "20"))
+
+# Batch invocation limits
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+DEFAULT_BATCH_PARALLELISM = int(os.getenv("BATCH_PARALLELISM", "4"))
+MAX_BATCH_PARALLELISM = int(os.getenv("MAX_BATCH_PARALLELISM", "32"))
+
+# Seconds clients are told to wait when a language runtime is still being prepared
+RUNTIME_RETRY_AFTER = int(os.getenv("RUNTIME_RETRY_AFTER", "5"))
 
 class FunctionExecutionRequest(BaseModel):
     event: Dict[str, Any]
 
+class BatchExecutionRequest(BaseModel):
+    events: List[Dict[str, Any]]
+    parallelism: Optional[int] = None
+
 class FunctionExecutionResponse(BaseModel):
     function_id: int
     execution_id: str
@@ -26,48 +95,316 @@ class FunctionExecutionResponse(BaseModel):
     result: Dict[str, Any]
     error: bool
     logs: Optional[str] = None
+    cache_hit: bool = False
+    # Time spent waiting for an execution slot, included in duration_ms
+    queue_wait_ms: float = 0
+    timings: Dict[str, float] = {}
 
 async def execute_with_timeout(func_coro, timeout: int):
     """Helper function to enforce execution timeout using asyncio"""
     try:
         return await asyncio.wait_for(func_coro, timeout=timeout / 1000)
     except asyncio.TimeoutError:
-        return {"error": True, "logs": "Function execution timed out"}
+        return {"error": True, "timeout": True, "logs": "Function execution timed out"}
 
-@router.post("/api/functions/{route_path:path}/execute", response_model=FunctionExecutionResponse)
-async def execute_function(
-    route_path: str, 
-    execution_request: FunctionExecutionRequest = Body(...),
-    db: Session = Depends(get_db)
+def backend_for(function) -> Optional[ExecutionBackend]:
+    """The backend a function runs on, or None if it chose one this deployment does not run"""
+    return backends.get(function.backend or default_backend.name)
+
+def new_execution_id() -> str:
+    """Unique id for one execution, also used to look up async invocations"""
+    return f"exec-{uuid.uuid4().hex}"
+
+async def run_function(
+    function,
+    event: Dict[str, Any],
+    timer: Optional[PhaseTimer] = None,
+    execution_id: Optional[str] = None
 ):
+    """
+    Execute a resolved function once, serving cacheable functions from the result cache
+    
+    Phase timings are collected into `timer`, and the execution is recorded in
+    the metrics registry and the execution history. Executions (but not cache
+    hits) go through admission control first.
+    
+    Raises:
+        AdmissionRejected: No execution slot became free in time
+    
+    Returns:
+        (result, cache_hit)
+    """
+    timer = timer if timer is not None else PhaseTimer()
+    execution_id = execution_id or new_execution_id()
+    started_at = datetime.utcnow()
+    
+    backend = backend_for(function)
+    
+    # Run function with timeout handling
+    async def run():
+        if backend is None:
+            return {"error": True, "message": f"Execution backend {function.backend} is not enabled"}
+        async with admit(function, timer):
+            return await execute_with_timeout(
+                backend.execute_function(
+                    function_id=str(function.id),
+                    function_name=function.name,
+                    language=function.language,
+                    code=function.code,
+                    event=event,
+                    timeout=function.timeout,
+                    dependencies=function.dependencies,
+                    timer=timer,
+                    memory_mb=function.memory_mb,
+                    cpu=function.cpu
+                ),
+                timeout=function.timeout
+            )
+    
+    started = time.perf_counter()
+    with inflight.track_inprogress(function=function.name):
+        if not function.cacheable:
+            result, cache_hit = await run(), False
+        else:
+            cache_key = result_cache.key(
+                function.id,
+                ArtifactStore.key(function.language, function.code),
+                event,
+                function.dependencies
+            )
+            result, cache_hit = await result_cache.get_or_execute(
+                cache_key, 300 if function.cache_ttl is None else function.cache_ttl, run
+            )
+    
+    await record_invocation(
+        function, execution_id, started_at, result, cache_hit,
+        time.perf_counter() - started, timer
+    )
+    return result, cache_hit
+
+@asynccontextmanager
+async def admit(function, timer: PhaseTimer):
+    """Hold an execution slot for `function`, timing the wait as the queue_wait phase"""
+    try:
+        async with admission.admit(function) as waited_ms:
+            timer.add("queue_wait", waited_ms)
+            yield
+    except AdmissionRejected:
+        throttled_total.inc(function=function.name)
+        raise
+
+def too_many_requests(rejection: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=str(rejection),
+        headers={"Retry-After": str(rejection.retry_after)}
+    )
+
+async def admit_stream(function, timer: PhaseTimer):
+    """
+    Take an execution slot for a streamed response
+    
+    Returns an idempotent release callable; call it when the stream ends
+    and also pass it as the response background task, which runs even if
+    the client disconnects before the stream starts.
+    """
+    try:
+        timer.add("queue_wait", await admission.acquire(function))
+    except AdmissionRejected as e:
+        throttled_total.inc(function=function.name)
+        raise too_many_requests(e)
+    
+    released = False
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            admission.release(function.id)
+    return release
+
+async def record_invocation(
+    function,
+    execution_id: str,
+    started_at: datetime,
+    result: Dict[str, Any],
+    cache_hit: bool,
+    seconds: float,
+    timer: PhaseTimer
+):
+    """Record the outcome, latency and per-phase timings of one invocation"""
+    function_name = function.name
+    if cache_hit:
+        outcome = "cache_hit"
+    elif result.get("timeout"):
+        outcome = "timeout"
+    elif result.get("error", False):
+        outcome = "error"
+    else:
+        outcome = "success"
+    
+    invocations_total.inc(function=function_name, outcome=outcome)
+    if outcome in ("error", "timeout"):
+        errors_total.inc(function=function_name)
+    if outcome == "timeout":
+        timeouts_total.inc(function=function_name)
+    
+    invocation_duration.observe(seconds, function=function_name)
+    for phase, milliseconds in timer.phases.items():
+        phase_duration.observe(milliseconds / 1000, function=function_name, phase=phase)
+    
+    output_bytes = len((result.get("logs") or "").encode('utf-8'))
+    if "result" in result:
+        output_bytes += len(json.dumps(result["result"]).encode('utf-8'))
+    
+    await execution_recorder.record({
+        "execution_id": execution_id,
+        "function_id": function.id,
+        "started_at": started_at,
+        "duration_ms": round(seconds * 1000, 3),
+        "exit_code": 124 if outcome == "timeout" else 1 if outcome == "error" else 0,
+        "error": outcome in ("error", "timeout"),
+        "cache_hit": cache_hit,
+        "output_bytes": output_bytes,
+        "queue_wait_ms": round(timer.phases.get("queue_wait", 0.0), 3),
+        "timings": json.dumps(timer.as_dict()),
+    })
+
+def collect_pool_metrics():
+    """Warm pool sizes and counters, read at scrape time"""
+    sizes = Gauge("container_pool_containers", "Pooled containers by state", ["pool", "state"])
+    events = Gauge("container_pool_events", "Pool checkouts and container lifecycle events since start", ["pool", "event"])
+    for pool, stats in pool_stats().items():
+        for state in ("idle", "busy", "total"):
+            sizes.set(stats[state], pool=pool, state=state)
+        for event in ("hits", "misses", "created", "recycled", "evicted", "unhealthy"):
+            events.set(stats[event], pool=pool, event=event)
+    return [sizes, events]
+
+registry.add_collector(collect_pool_metrics)
+
+def collect_host_metrics():
+    """Load and health of each execution host, read at scrape time"""
+    executions = Gauge("execution_host_executions", "Executions running on each host, and its capacity", ["host", "state"])
+    healthy = Gauge("execution_host_healthy", "1 while a host is in rotation", ["host"])
+    ready = Gauge("runtime_ready", "1 once a backend can run functions in a language", ["backend", "language"])
+    if docker_manager is not None:
+        for host, stats in docker_manager.host_stats()["hosts"].items():
+            executions.set(stats["inflight"], host=host, state="inflight")
+            executions.set(stats["capacity"], host=host, state="capacity")
+            healthy.set(1 if stats["healthy"] else 0, host=host)
+    for name, backend in backends.items():
+        for language in backend.supported_languages:
+            ready.set(1 if backend.is_ready(language) else 0, backend=name, language=language)
+    return [executions, healthy, ready]
+
+registry.add_collector(collect_host_metrics)
+
+def collect_reaper_metrics():
+    """Background container removal and orphan sweeps on each execution host"""
+    pending = Gauge("container_reaper_pending", "Containers released and waiting for removal", ["host"])
+    events = Gauge("container_reaper_events", "Containers removed, failed removals, leaked containers found and sweeps since start", ["host", "event"])
+    if docker_manager is not None:
+        for host, stats in docker_manager.host_stats()["hosts"].items():
+            reaper = stats["reaper"]
+            pending.set(reaper["pending"], host=host)
+            for event in ("removed", "failed", "orphans", "sweeps"):
+                events.set(reaper[event], host=host, event=event)
+    return [pending, events]
+
+registry.add_collector(collect_reaper_metrics)
+
+def collect_payload_metrics():
+    """Payloads exchanged through shared files instead of runner frames"""
+    files = Gauge("payload_files", "Payload files written for runners and read back from them", ["direction"])
+    size = Gauge("payload_file_bytes", "Bytes exchanged through payload files", ["direction"])
+    stats = [backend.payloads.stats() for backend in backends.values()]
+    files.set(sum(s["files_written"] for s in stats), direction="in")
+    files.set(sum(s["files_read"] for s in stats), direction="out")
+    size.set(sum(s["bytes_written"] for s in stats), direction="in")
+    size.set(sum(s["bytes_read"] for s in stats), direction="out")
+    return [files, size]
+
+registry.add_collector(collect_payload_metrics)
+
+def normalize_route(route_path: str) -> str:
     # Ensure route_path starts with "/"
     if not route_path.startswith('/'):
         route_path = '/' + route_path
-    
-    # Find function in the database
-    function = db.query(Function).filter(Function.route == route_path).first()
+    return route_path
+
+def check_resolved(function):
     if function is None:
         raise HTTPException(status_code=404, detail="Function not found")
-    
     if not function.active:
         raise HTTPException(status_code=400, detail="Function is not active")
+    return function
+
+def check_runtime_ready(function):
+    """Executions are only routed once a runner for the function's language is ready"""
+    backend = backend_for(function)
+    if backend is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Execution backend {function.backend} is not enabled"
+        )
+    if not backend.is_ready(function.language):
+        raise HTTPException(
+            status_code=503,
+            detail=f"The {function.language} runtime is not ready yet",
+            headers={"Retry-After": str(RUNTIME_RETRY_AFTER)}
+        )
+
+def resolve_function(route_path: str, db: Session):
+    """Find an active function by route, from the route cache when possible"""
+    route_path = normalize_route(route_path)
     
-    start_time = datetime.utcnow()
-    execution_id = f"exec-{int(time.time())}"
+    # Resolve the function from the route cache, falling back to the database
+    function = function_cache.get(route_path)
+    if function is None:
+        generation = function_cache.generation
+        db_function = db.query(Function).filter(Function.route == route_path).first()
+        if db_function is not None:
+            function = function_cache.put(route_path, db_function, generation)
     
-    # Run function with timeout handling
-    result = await execute_with_timeout(
-        docker_manager.execute_function(
-            function_id=str(function.id),
-            function_name=function.name,
-            language=function.language,
-            code=function.code,
-            event=execution_request.event,
-            timeout=function.timeout
-        ),
-        timeout=function.timeout
-    )
+    return check_resolved(function)
+
+async def resolve_function_async(route_path: str):
+    """
+    resolve_function for async endpoints
+    
+    A database connection is only checked out on a cache miss, over the
+    async engine, so the event loop never blocks on the database.
+    """
+    route_path = normalize_route(route_path)
+    
+    function = await function_cache.aget(route_path)
+    if function is None:
+        generation = function_cache.generation
+        async with async_session() as db:
+            db_function = await db.scalar(select(Function).where(Function.route == route_path))
+            if db_function is not None:
+                function = function_cache.put(route_path, db_function, generation)
+    
+    return check_resolved(function)
 
+@router.post("/api/functions/{route_path:path}/execute", response_model=FunctionExecutionResponse)
+async def execute_function(
+    route_path: str, 
+    execution_request: FunctionExecutionRequest = Body(...)
+):
+    timer = PhaseTimer()
+    with timer.phase("lookup"):
+        function = await resolve_function_async(route_path)
+    check_runtime_ready(function)
+    
+    start_time = datetime.utcnow()
+    execution_id = new_execution_id()
+    
+    try:
+        result, cache_hit = await run_function(function, execution_request.event, timer, execution_id)
+    except AdmissionRejected as e:
+        raise too_many_requests(e)
+    
     end_time = datetime.utcnow()
     duration_ms = int((end_time - start_time).total_seconds() * 1000)
     
@@ -79,5 +416,265 @@ async def execute_function(
         duration_ms=duration_ms,
         result=result.get("result", {}),
         error=result.get("error", False),
-        logs=result.get("logs", None)
+        logs=result.get("logs", None),
+        cache_hit=cache_hit,
+        queue_wait_ms=round(timer.phases.get("queue_wait", 0.0), 3),
+        timings=timer.as_dict()
+    )
+
+@router.post("/api/functions/{route_path:path}/execute/stream")
+async def execute_function_stream(
+    route_path: str,
+    execution_request: FunctionExecutionRequest = Body(...)
+):
+    """
+    Execute a function, streaming its output as server-sent events
+    
+    Each chunk the function prints is sent as a "log" event while it runs,
+    followed by one "result" event with the same fields as the execute
+    response (without the logs already streamed). Results are never served
+    from the result cache here.
+    """
+    timer = PhaseTimer()
+    with timer.phase("lookup"):
+        function = await resolve_function_async(route_path)
+    check_runtime_ready(function)
+    
+    start_time = datetime.utcnow()
+    execution_id = new_execution_id()
+    release = await admit_stream(function, timer)
+    
+    def sse(event: str, data: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+    
+    async def stream():
+        try:
+            async for chunk in run_stream():
+                yield chunk
+        finally:
+            release()
+    
+    async def run_stream():
+        started = time.perf_counter()
+        with inflight.track_inprogress(function=function.name):
+            async for chunk in backend_for(function).execute_stream(
+                function_id=str(function.id),
+                function_name=function.name,
+                language=function.language,
+                code=function.code,
+                event=execution_request.event,
+                timeout=function.timeout,
+                dependencies=function.dependencies,
+                timer=timer,
+                memory_mb=function.memory_mb,
+                cpu=function.cpu
+            ):
+                if chunk["type"] == "log":
+                    yield sse("log", {"data": chunk["data"]})
+                    continue
+                
+                result = chunk
+                end_time = datetime.utcnow()
+                await record_invocation(
+                    function, execution_id, start_time, result, False,
+                    time.perf_counter() - started, timer
+                )
+                yield sse("result", {
+                    "function_id": function.id,
+                    "execution_id": execution_id,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "duration_ms": int((end_time - start_time).total_seconds() * 1000),
+                    "result": result.get("result", {}),
+                    "error": result.get("error", False),
+                    "message": result.get("message"),
+                    "cache_hit": False,
+                    "queue_wait_ms": round(timer.phases.get("queue_wait", 0.0), 3),
+                    "timings": timer.as_dict(),
+                })
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
     )
+
+@router.post("/api/functions/{route_path:path}/execute/batch")
+async def execute_batch(
+    route_path: str,
+    batch_request: BatchExecutionRequest = Body(...)
+):
+    """
+    Run many events through one runner container
+    
+    The response is newline-delimited JSON streamed as items complete: one
+    line per event (with its index, result or error, logs and duration),
+    then a summary line with "done": true. Each item is recorded as an
+    invocation of its own, with execution id "<execution_id>-<index>".
+    """
+    function = await resolve_function_async(route_path)
+    check_runtime_ready(function)
+    
+    events = batch_request.events
+    if len(events) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413, detail=f"Batches are limited to {MAX_BATCH_SIZE} events"
+        )
+    parallelism = max(1, min(
+        batch_request.parallelism or DEFAULT_BATCH_PARALLELISM, MAX_BATCH_PARALLELISM
+    ))
+    
+    execution_id = new_execution_id()
+    # The whole batch runs in one container, so it takes one execution slot
+    timer = PhaseTimer()
+    release = await admit_stream(function, timer)
+    
+    async def stream():
+        try:
+            async for line in run_batch():
+                yield line
+        finally:
+            release()
+    
+    async def run_batch():
+        started = time.perf_counter()
+        errors = 0
+        async for item in backend_for(function).execute_batch(
+            function_id=str(function.id),
+            function_name=function.name,
+            language=function.language,
+            code=function.code,
+            events=events,
+            timeout=function.timeout,
+            dependencies=function.dependencies,
+            parallelism=parallelism,
+            memory_mb=function.memory_mb,
+            cpu=function.cpu
+        ):
+            errors += 1 if item["error"] else 0
+            seconds = (item.get("duration_ms") or 0) / 1000
+            await record_invocation(
+                function, f"{execution_id}-{item['index']}",
+                datetime.utcnow() - timedelta(seconds=seconds), item, False, seconds, PhaseTimer()
+            )
+            yield json.dumps(item) + "\n"
+        
+        yield json.dumps({
+            "done": True,
+            "function_id": function.id,
+            "execution_id": execution_id,
+            "count": len(events),
+            "errors": errors,
+            "duration_ms": int((time.perf_counter() - started) * 1000),
+            "queue_wait_ms": round(timer.phases.get("queue_wait", 0.0), 3),
+        }) + "\n"
+    
+    return StreamingResponse(
+        stream(), media_type="application/x-ndjson", background=BackgroundTask(release)
+    )
+
+@router.get("/api/functions/{function_id}/build")
+def get_build_status(function_id: int):
+    """State of the function's prebuilt image, for functions with dependencies"""
+    status = docker_manager.build_status(str(function_id)) if docker_manager is not None else None
+    if status is None:
+        raise HTTPException(status_code=404, detail="No image build for this function")
+    return status
+
+@router.get("/api/functions/{function_id}/recommendation")
+def get_resource_recommendation(
+    function_id: int,
+    days: float = Query(7, gt=0, le=90),
+    db: Session = Depends(get_db)
+):
+    """
+    Suggested memory and CPU limits from the function's observed peak usage
+    
+    Memory is sized to the p99 peak (p95 for CPU) over the last `days` days
+    plus RECOMMENDATION_HEADROOM, rounded up to 64 MB / a quarter core.
+    Memory peaks are measured above the warm container's usage when each
+    execution started, leaving out other functions' cached handlers, so
+    RECOMMENDATION_RUNNER_MEMORY_MB is added for the runner itself. CPU is
+    measured per container and may include the runner's own work.
+    """
+    function = db.query(Function).filter(Function.id == function_id).first()
+    if function is None:
+        raise HTTPException(status_code=404, detail="Function not found")
+    
+    usage = usage_summary(db, function_id, datetime.utcnow() - timedelta(days=days))
+    current = {
+        "memory_mb": function.memory_mb or default_backend.default_memory_mb,
+        "cpu": function.cpu or default_backend.default_cpu,
+    }
+    recommended = None
+    if usage["samples"]:
+        memory = (
+            max(usage["memory_mb"]["p99"], usage["memory_mb"]["p95"]) + RECOMMENDATION_RUNNER_MEMORY_MB
+        ) * RECOMMENDATION_HEADROOM
+        cpu = usage["cpu"]["p95"] * RECOMMENDATION_HEADROOM
+        recommended = {
+            "memory_mb": max(64, int(math.ceil(memory / 64)) * 64),
+            "cpu": max(0.25, math.ceil(cpu * 4) / 4),
+        }
+    
+    return {
+        "function_id": function_id,
+        "days": days,
+        "current": current,
+        "usage": usage,
+        "recommended": recommended,
+        "sufficient_data": usage["samples"] >= RECOMMENDATION_MIN_SAMPLES,
+    }
+
+@router.get("/api/cache/stats")
+def get_cache_stats():
+    """Route -> function cache and result cache sizes and hit/miss counts"""
+    return {
+        "functions": function_cache.stats(),
+        "results": result_cache.stats(),
+    }
+
+@router.get("/api/admission/stats")
+def get_admission_stats():
+    """Execution slots in use, reservations and admission queue counters"""
+    return admission.stats()
+
+def pool_stats() -> Dict[str, Any]:
+    """Warm pool stats of every backend; pools outside Docker are prefixed with their backend"""
+    pools = {}
+    for name, backend in backends.items():
+        for pool, stats in backend.pool_stats().items():
+            pools[pool if name == "docker" else f"{name}:{pool}"] = stats
+    return pools
+
+@router.get("/api/pool/stats")
+def get_pool_stats():
+    """Warm container pool hit/miss counts and sizes, per language"""
+    return pool_stats()
+
+@router.get("/api/hosts/stats")
+def get_host_stats():
+    """Placement strategy and the health, load and placements of each execution host"""
+    if docker_manager is None:
+        raise HTTPException(status_code=404, detail="The docker backend is not enabled")
+    return docker_manager.host_stats()
+
+@router.get("/ready")
+def get_readiness():
+    """
+    Readiness probe: 200 once every language runtime is ready on every backend, else 503
+    
+    The function CRUD API is served from startup; executions of a language
+    are rejected with 503 until its runtime is ready.
+    """
+    readiness = {name: backend.readiness() for name, backend in backends.items()}
+    ready = all(state["ready"] for state in readiness.values())
+    return JSONResponse(
+        {"ready": ready, "backends": readiness}, status_code=200 if ready else 503
+    )
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Invocation counters, latency histograms and pool gauges in Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
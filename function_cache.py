@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_function(function) -> SimpleNamespace:
+    """Detached copy of every column of a `Function` row"""
+    return SimpleNamespace(**{
+        column.name: getattr(function, column.name)
+        for column in function.__table__.columns
+    })
+
+
+class FunctionCache:
+    """
+    In-process cache of resolved functions keyed by route
+
+    Entries are detached snapshots of the `Function` row, so they can be used
+    after the session that loaded them is closed. The cache is bounded (LRU
+    eviction) and every entry expires after `ttl` seconds. CRUD writes call
+    `invalidate`; when a `version_loader` is given, the shared version counter
+    it returns is polled at most every `version_check_interval` seconds and
+    any change clears the cache, which covers writes made by other workers.
+    `aget` does the same from the event loop with `async_version_loader`,
+    so a version poll never blocks it.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 60,
+        version_loader: Optional[Callable[[], int]] = None,
+        version_check_interval: float = 1.0,
+        async_version_loader: Optional[Callable[[], Awaitable[int]]] = None
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version_loader = version_loader
+        self.async_version_loader = async_version_loader
+        self.version_check_interval = version_check_interval
+
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        """Changes on every invalidation; pass it back to `put`"""
+        return self._generation
+
+    def get(self, route: str) -> Optional[SimpleNamespace]:
+        """Return the cached function for `route`, or None on a miss"""
+        self._check_version()
+        return self._lookup(route)
+
+    async def aget(self, route: str) -> Optional[SimpleNamespace]:
+        """`get` for the event loop, polling the version with the async loader"""
+        if self.async_version_loader is None:
+            self._check_version()
+        elif self._version_check_due():
+            try:
+                self._apply_version(await self.async_version_loader())
+            except Exception as e:
+                logger.error(f"Failed to read function cache version: {str(e)}")
+        return self._lookup(route)
+
+    def _lookup(self, route: str) -> Optional[SimpleNamespace]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(route)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[route]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(route)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, route: str, function, generation: Optional[int] = None) -> SimpleNamespace:
+        """
+        Cache a snapshot of `function` under `route` and return the snapshot
+
+        If `generation` is given and an invalidation happened since it was
+        read, the snapshot is returned but not stored, so a lookup that raced
+        with a write cannot reinstate stale data.
+        """
+        snapshot = snapshot_function(function)
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return snapshot
+
+            self._entries[route] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(route)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, *routes: str):
+        """Drop the given routes, or everything when called without routes"""
+        with self._lock:
+            self._generation += 1
+            if not routes:
+                self._entries.clear()
+            for route in routes:
+                self._entries.pop(route, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "version": self._version,
+            }
+
+    def _version_check_due(self) -> bool:
+        """True at most once per `version_check_interval`"""
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_interval:
+            return False
+        self._version_checked_at = now
+        return True
+
+    def _check_version(self):
+        if self.version_loader is None or not self._version_check_due():
+            return
+
+        try:
+            version = self.version_loader()
+        except Exception as e:
+            logger.error(f"Failed to read function cache version: {str(e)}")
+            return
+        self._apply_version(version)
+
+    def _apply_version(self, version: int):
+        if self._version is not None and version != self._version:
+            logger.info(f"Function cache version changed to {version}, clearing cache")
+            self.invalidate()
+        self._version = version
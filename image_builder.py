@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Optional
+import logging
+
+import docker
+
+logger = logging.getLogger(__name__)
+
+# A PEP 508 requirement: a project name, optional extras, then version
+# specifiers, a direct URL or environment markers. Lines starting with "-"
+# (pip options such as --index-url or -r) are not accepted.
+REQUIREMENT = re.compile(
+    r"^[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?\s*"
+    r"(?:\[[A-Za-z0-9._,\s-]*\])?\s*"
+    r"(?:[<>=!~;@(].*)?$"
+)
+
+# Base images are labelled with the digest of the runner sources they were
+# built from; dependent image tags include it so a runner change rebuilds them
+RUNNER_DIGEST_LABEL = "serverless.runner-digest"
+
+
+class ImageBuildError(Exception):
+    """A dependency or function image failed to build"""
+
+
+class ImageBuilder:
+    """
+    Builds and caches per-function runner images
+
+    A function that declares dependencies gets two images: a dependency image
+    on top of the language base image, tagged by a hash of the base image and
+    the normalized dependency set and therefore shared by every function with
+    the same dependencies, and a thin function image on top of it with the
+    code baked in. Builds run on a small background thread pool so they can be started
+    when a function is created or updated, well before its first invocation.
+    """
+
+    def __init__(self, client, base_images: Dict[str, str], max_workers: int = 2):
+        self.client = client
+        self.base_images = base_images
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-build")
+        self._builds: Dict[str, Future] = {}
+        self._ready = set()
+        self._lock = threading.Lock()
+        self._base_ids: Dict[str, str] = {}
+        self.status: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def normalize_dependencies(language: str, dependencies: str) -> str:
+        """
+        Canonical form of a dependency declaration, used for hashing and building
+
+        Raises:
+            ValueError: The declaration is malformed: a line that is not a
+                requirement for Python, or anything but a JSON object of
+                package names to version strings for JavaScript
+        """
+        if language == "python":
+            lines = []
+            for line in dependencies.splitlines():
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                if not REQUIREMENT.match(line):
+                    raise ValueError(f"Invalid requirement: {line!r}")
+                lines.append(line)
+            return "\n".join(sorted(set(lines))) + "\n"
+
+        # JavaScript accepts a full package.json or just a dependency map
+        try:
+            declared = json.loads(dependencies)
+        except ValueError as e:
+            raise ValueError(f"dependencies must be a JSON object: {str(e)}")
+        if not isinstance(declared, dict):
+            raise ValueError("dependencies must be a JSON object")
+        if "dependencies" in declared and isinstance(declared["dependencies"], dict):
+            declared = declared["dependencies"]
+        for name, version in declared.items():
+            if not isinstance(version, str):
+                raise ValueError(f"Version of {name} must be a string")
+        package = {"name": "function", "private": True, "dependencies": declared}
+        return json.dumps(package, sort_keys=True, indent=2)
+
+    def base_image_id(self, language: str) -> str:
+        """
+        Identity of `language`'s base image: its runner digest label, or its
+        image id if it was built without one
+
+        The label is the same on every host built from the same runner
+        sources, so the tags derived from it are too. The value is cached
+        until refresh_base_image() is called.
+        """
+        base_id = self._base_ids.get(language)
+        if base_id is None:
+            image = self.client.images.get(self.base_images[language])
+            base_id = (image.labels or {}).get(RUNNER_DIGEST_LABEL) or image.id
+            self._base_ids[language] = base_id
+        return base_id
+
+    def refresh_base_image(self, language: str):
+        """Forget the cached identity of `language`'s base image after it was (re)built"""
+        self._base_ids.pop(language, None)
+
+    def dependency_image(self, language: str, dependencies: str) -> str:
+        normalized = self.normalize_dependencies(language, dependencies)
+        base_id = self.base_image_id(language)
+        digest = hashlib.sha256(f"{language}\0{base_id}\0{normalized}".encode('utf-8')).hexdigest()
+        return f"serverless-deps:{language}-{digest[:16]}"
+
+    def function_image(self, function_id: str, language: str, code_key: str, dependencies: str) -> str:
+        deps_tag = self.dependency_image(language, dependencies).split(":", 1)[1]
+        return f"serverless-fn-{function_id}:{code_key[:12]}-{deps_tag[-8:]}"
+
+    def is_ready(self, tag: str) -> bool:
+        """True once `tag` was built (or found) by this builder"""
+        return tag in self._ready
+
+    def schedule(
+        self,
+        function_id: str,
+        language: str,
+        code_file: str,
+        code_key: str,
+        dependencies: Optional[str]
+    ) -> Optional[Future]:
+        """
+        Start building the image for a function in the background
+
+        Returns the build future, or None when the function has no
+        dependencies and runs on the shared base image.
+        """
+        if not dependencies or not dependencies.strip():
+            return None
+
+        tag = self.function_image(function_id, language, code_key, dependencies)
+        with self._lock:
+            if tag in self._ready:
+                return None
+            future = self._builds.get(tag)
+            if future is not None:
+                return future
+
+            self.status[function_id] = {"image": tag, "state": "building", "error": None}
+            future = self._executor.submit(
+                self._build_function_image, tag, function_id, language, code_file, dependencies
+            )
+            self._builds[tag] = future
+        return future
+
+    def resolve(
+        self,
+        function_id: str,
+        language: str,
+        code_file: str,
+        code_key: str,
+        dependencies: Optional[str],
+        timeout: float
+    ) -> Optional[str]:
+        """
+        Image a function should run on, or None for the shared base image
+
+        Waits up to `timeout` seconds for a build that has not finished yet.
+        """
+        if not dependencies or not dependencies.strip():
+            return None
+
+        tag = self.function_image(function_id, language, code_key, dependencies)
+        if tag in self._ready:
+            return tag
+
+        future = self.schedule(function_id, language, code_file, code_key, dependencies)
+        if future is None:
+            return tag
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"Image {tag} is still building")
+        return tag
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def _build_function_image(self, tag: str, function_id: str, language: str, code_file: str, dependencies: str):
+        try:
+            if not self._image_exists(tag):
+                deps_tag = self._ensure_dependency_image(language, dependencies)
+                filename = os.path.basename(code_file)
+                dockerfile = [
+                    f"FROM {deps_tag}",
+                    f"COPY {filename} /function/{filename}",
+                ]
+                if language == "python":
+                    dockerfile.append("RUN python -m compileall -q /function")
+
+                self._build(tag, dockerfile, {filename: code_file})
+
+            with self._lock:
+                self._ready.add(tag)
+                self._builds.pop(tag, None)
+                self.status[function_id] = {"image": tag, "state": "ready", "error": None}
+            return tag
+        except Exception as e:
+            logger.error(f"Failed to build image {tag}: {str(e)}")
+            with self._lock:
+                self._builds.pop(tag, None)
+                self.status[function_id] = {"image": tag, "state": "failed", "error": str(e)}
+            raise ImageBuildError(str(e))
+
+    def _ensure_dependency_image(self, language: str, dependencies: str) -> str:
+        tag = self.dependency_image(language, dependencies)
+        with self._lock:
+            future = self._builds.get(tag)
+            if future is None and tag not in self._ready:
+                future = Future()
+                self._builds[tag] = future
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            # Another function with the same dependencies is building it
+            if future is not None:
+                future.result()
+            return tag
+
+        try:
+            if not self._image_exists(tag):
+                normalized = self.normalize_dependencies(language, dependencies)
+                if language == "python":
+                    files = {"requirements.txt": normalized}
+                    dockerfile = [
+                        f"FROM {self.base_images[language]}",
+                        "COPY requirements.txt /deps/requirements.txt",
+                        "RUN pip install --no-cache-dir -r /deps/requirements.txt",
+                    ]
+                else:
+                    files = {"package.json": normalized}
+                    dockerfile = [
+                        f"FROM {self.base_images[language]}",
+                        "WORKDIR /function",
+                        "COPY package.json /function/package.json",
+                        "RUN npm install --production",
+                    ]
+                self._build(tag, dockerfile, files, inline=True)
+                logger.info(f"Built dependency image {tag}")
+
+            with self._lock:
+                self._ready.add(tag)
+                self._builds.pop(tag, None)
+            future.set_result(tag)
+            return tag
+        except Exception as e:
+            with self._lock:
+                self._builds.pop(tag, None)
+            future.set_exception(e)
+            raise
+
+    def _image_exists(self, tag: str) -> bool:
+        try:
+            self.client.images.get(tag)
+            return True
+        except docker.errors.ImageNotFound:
+            return False
+
+    def _build(self, tag: str, dockerfile, files: Dict[str, str], inline: bool = False):
+        """Build `tag` from a generated Dockerfile and a scratch context"""
+        context = tempfile.mkdtemp(prefix="serverless-build-")
+        try:
+            with open(os.path.join(context, "Dockerfile"), "w") as f:
+                f.write("\n".join(dockerfile) + "\n")
+            for name, source in files.items():
+                target = os.path.join(context, name)
+                if inline:
+                    with open(target, "w") as f:
+                        f.write(source)
+                else:
+                    shutil.copyfile(source, target)
+
+            self.client.images.build(path=context, tag=tag, rm=True)
+            logger.info(f"Built image {tag}")
+        finally:
+            shutil.rmtree(context, ignore_errors=True)
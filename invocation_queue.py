@@ -0,0 +1,396 @@
+from fastapi import APIRouter, HTTPException, Depends, Body
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from typing import Dict, Any, Optional, Callable, Awaitable
+import asyncio
+import json
+import os
+import random
+import socket
+from datetime import datetime, timedelta
+import logging
+
+from main import get_db, async_session, SessionLocal, Function, Invocation
+from function_cache import snapshot_function
+from admission import AdmissionRejected
+from executor import (
+    FunctionExecutionRequest, new_execution_id, resolve_function, run_function
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class InvocationQueue:
+    """
+    Durable queue of asynchronous invocations backed by the `invocations` table
+
+    Requests are inserted as `queued` rows and return immediately. A pool of
+    worker tasks claims rows with a conditional UPDATE (so several API
+    processes can drain the same table), runs them and records the result.
+    Failed attempts are requeued with exponential backoff until
+    `max_attempts` is reached, after which the row is moved to `dead`.
+    Attempts rejected by admission control do not count: the row goes back
+    to the queue after a jittered `retry_backoff` delay until a slot frees
+    up, so bursts above a function's concurrency limit wait instead of
+    being dead-lettered.
+
+    Each attempt runs under the invocation's execution id, so the execution
+    history matches the id returned to the caller; retries get an
+    "-<attempt>" suffix since history ids are unique.
+    Rows left `running` by a crashed process are requeued once they have
+    run `stale_after` seconds longer than their function's timeout, checked
+    every `requeue_interval` seconds; the crashed attempt counts towards
+    `max_attempts`, so an invocation that keeps killing its worker is
+    eventually moved to `dead`.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        execute: Callable[[int, Dict[str, Any], str], Awaitable[Dict[str, Any]]],
+        workers: int = 4,
+        poll_interval: float = 1.0,
+        max_attempts: int = 3,
+        retry_backoff: float = 2.0,
+        stale_after: float = 900,
+        requeue_interval: float = 60
+    ):
+        self.session_factory = session_factory
+        self.execute = execute
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.stale_after = stale_after
+        self.requeue_interval = requeue_interval
+
+        self._tasks = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self.completed = 0
+        self.retried = 0
+        self.throttled = 0
+        self.dead_lettered = 0
+
+    def enqueue(self, db: Session, function_id: int, event: Dict[str, Any]) -> Invocation:
+        """Insert a queued invocation and wake a worker"""
+        invocation = Invocation(
+            execution_id=new_execution_id(),
+            function_id=function_id,
+            status="queued",
+            event=json.dumps(event),
+            max_attempts=self.max_attempts,
+            available_at=datetime.utcnow(),
+        )
+        db.add(invocation)
+        db.commit()
+        db.refresh(invocation)
+
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return invocation
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        await asyncio.to_thread(self._requeue_stale)
+        for n in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(f"{self._worker_prefix}-{n}")))
+        self._tasks.append(asyncio.create_task(self._requeue_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth by status, age of the oldest queued item and worker counters"""
+        db = self.session_factory()
+        try:
+            counts = dict(
+                db.query(Invocation.status, func.count(Invocation.id))
+                .group_by(Invocation.status).all()
+            )
+            oldest = db.query(func.min(Invocation.created_at)).filter(
+                Invocation.status == "queued"
+            ).scalar()
+        finally:
+            db.close()
+
+        return {
+            "depth": counts.get("queued", 0),
+            "by_status": counts,
+            "oldest_queued_age_seconds": (
+                (datetime.utcnow() - oldest).total_seconds() if oldest else 0
+            ),
+            "workers": self.workers,
+            "completed": self.completed,
+            "retried": self.retried,
+            "throttled": self.throttled,
+            "dead_lettered": self.dead_lettered,
+        }
+
+    async def _worker(self, name: str):
+        while True:
+            try:
+                claimed = await asyncio.to_thread(self._claim, name)
+            except Exception as e:
+                logger.error(f"Invocation worker {name} failed to claim work: {str(e)}")
+                claimed = None
+
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            invocation_id, function_id, event, execution_id = claimed
+            try:
+                result = await self.execute(function_id, event, execution_id)
+            except Exception as e:
+                logger.error(f"Async invocation {invocation_id} raised: {str(e)}")
+                result = {"error": True, "message": f"Execution error: {str(e)}"}
+
+            try:
+                await asyncio.to_thread(self._finish, invocation_id, result)
+            except Exception as e:
+                logger.error(f"Failed to record result of invocation {invocation_id}: {str(e)}")
+
+    async def _requeue_loop(self):
+        while True:
+            await asyncio.sleep(self.requeue_interval)
+            try:
+                await asyncio.to_thread(self._requeue_stale)
+            except Exception as e:
+                logger.error(f"Failed to requeue stale invocations: {str(e)}")
+
+    def _claim(self, worker: str):
+        """Atomically move the oldest runnable row to `running`"""
+        db = self.session_factory()
+        try:
+            while True:
+                now = datetime.utcnow()
+                candidate = db.query(Invocation.id).filter(
+                    Invocation.status == "queued",
+                    Invocation.available_at <= now
+                ).order_by(Invocation.id).limit(1).scalar()
+                if candidate is None:
+                    return None
+
+                claimed = db.query(Invocation).filter(
+                    Invocation.id == candidate,
+                    Invocation.status == "queued"
+                ).update({
+                    Invocation.status: "running",
+                    Invocation.attempts: Invocation.attempts + 1,
+                    Invocation.started_at: now,
+                    Invocation.worker: worker,
+                }, synchronize_session=False)
+                db.commit()
+
+                # Another worker won the race for this row; try the next one
+                if claimed:
+                    invocation = db.query(Invocation).filter(Invocation.id == candidate).first()
+                    return (
+                        invocation.id, invocation.function_id, json.loads(invocation.event),
+                        attempt_execution_id(invocation.execution_id, invocation.attempts)
+                    )
+        finally:
+            db.close()
+
+    def _finish(self, invocation_id: int, result: Dict[str, Any]):
+        db = self.session_factory()
+        try:
+            invocation = db.query(Invocation).filter(Invocation.id == invocation_id).first()
+            now = datetime.utcnow()
+            invocation.logs = result.get("logs")
+
+            if not result.get("error", False):
+                invocation.status = "succeeded"
+                invocation.result = json.dumps(result.get("result"))
+                invocation.error_message = None
+                invocation.finished_at = now
+                self.completed += 1
+            elif result.get("throttled"):
+                # Never ran, so the claim's attempt is given back
+                invocation.status = "queued"
+                invocation.attempts -= 1
+                invocation.error_message = result.get("message")
+                invocation.available_at = now + timedelta(
+                    seconds=self.retry_backoff * (1 + random.random())
+                )
+                self.throttled += 1
+            elif invocation.attempts < invocation.max_attempts and not result.get("permanent"):
+                # Back off exponentially before the next attempt
+                delay = self.retry_backoff ** invocation.attempts
+                invocation.status = "queued"
+                invocation.error_message = result.get("message") or result.get("logs")
+                invocation.available_at = now + timedelta(seconds=delay)
+                self.retried += 1
+            else:
+                invocation.status = "dead"
+                invocation.error_message = result.get("message") or result.get("logs")
+                invocation.finished_at = now
+                self.dead_lettered += 1
+            db.commit()
+        finally:
+            db.close()
+
+    def _requeue_stale(self):
+        """
+        Requeue rows a crashed process left `running`
+
+        A row is stale once it has been running `stale_after` seconds longer
+        than its function's timeout, so long-running functions are not
+        started a second time while the first attempt is still going. The
+        claim already counted the lost attempt, so rows that have used up
+        their attempts are dead-lettered instead.
+        """
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            # No row can be stale before this, whatever its function's timeout
+            running = (
+                Invocation.status == "running",
+                Invocation.started_at < now - timedelta(seconds=self.stale_after)
+            )
+            candidates = db.query(
+                Invocation.id, Invocation.started_at, Invocation.attempts,
+                Invocation.max_attempts, Function.timeout
+            ).outerjoin(Function, Function.id == Invocation.function_id).filter(*running).all()
+
+            exhausted, retryable = [], []
+            for invocation_id, started_at, attempts, max_attempts, timeout in candidates:
+                allowed = self.stale_after + (timeout or 0) / 1000
+                if started_at < now - timedelta(seconds=allowed):
+                    (exhausted if attempts >= max_attempts else retryable).append(invocation_id)
+
+            dead = requeued = 0
+            if exhausted:
+                dead = db.query(Invocation).filter(*running, Invocation.id.in_(exhausted)).update({
+                    Invocation.status: "dead",
+                    Invocation.error_message: "Worker stopped while running the invocation",
+                    Invocation.finished_at: now,
+                }, synchronize_session=False)
+            if retryable:
+                requeued = db.query(Invocation).filter(*running, Invocation.id.in_(retryable)).update({
+                    Invocation.status: "queued",
+                    Invocation.error_message: "Worker stopped while running the invocation",
+                    Invocation.available_at: now,
+                }, synchronize_session=False)
+            db.commit()
+            self.dead_lettered += dead
+            if dead:
+                logger.info(f"Dead-lettered {dead} stale invocations")
+            if requeued:
+                logger.info(f"Requeued {requeued} stale invocations")
+        finally:
+            db.close()
+
+
+def attempt_execution_id(execution_id: str, attempt: int) -> str:
+    """Execution history id of one attempt of an asynchronous invocation"""
+    return execution_id if attempt <= 1 else f"{execution_id}-{attempt}"
+
+
+async def execute_invocation(function_id: int, event: Dict[str, Any], execution_id: str) -> Dict[str, Any]:
+    """Run one queued invocation against the current version of its function"""
+    async with async_session() as db:
+        db_function = await db.get(Function, function_id)
+        function = snapshot_function(db_function) if db_function else None
+    if function is None:
+        return {"error": True, "permanent": True, "message": "Function not found"}
+    if not function.active:
+        return {"error": True, "permanent": True, "message": "Function is not active"}
+
+    try:
+        result, _ = await run_function(function, event, execution_id=execution_id)
+    except AdmissionRejected as e:
+        # Requeued without using up an attempt
+        return {"error": True, "throttled": True, "message": f"Throttled: {str(e)}"}
+    return result
+
+
+invocation_queue = InvocationQueue(
+    SessionLocal,
+    execute_invocation,
+    workers=int(os.getenv("ASYNC_WORKERS", "4")),
+    poll_interval=float(os.getenv("ASYNC_POLL_INTERVAL", "1")),
+    max_attempts=int(os.getenv("ASYNC_MAX_ATTEMPTS", "3")),
+    retry_backoff=float(os.getenv("ASYNC_RETRY_BACKOFF", "2")),
+    stale_after=float(os.getenv("ASYNC_STALE_AFTER", "900")),
+    requeue_interval=float(os.getenv("ASYNC_REQUEUE_INTERVAL", "60"))
+)
+
+
+class AsyncInvocationResponse(BaseModel):
+    execution_id: str
+    function_id: int
+    status: str
+
+
+class InvocationStatusResponse(BaseModel):
+    execution_id: str
+    function_id: int
+    status: str
+    attempts: int
+    max_attempts: int
+    result: Optional[Any] = None
+    error_message: Optional[str] = None
+    logs: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+@router.post(
+    "/api/functions/{route_path:path}/execute/async",
+    response_model=AsyncInvocationResponse,
+    status_code=202
+)
+def execute_function_async(
+    route_path: str,
+    execution_request: FunctionExecutionRequest = Body(...),
+    db: Session = Depends(get_db)
+):
+    """Queue an invocation and return its execution id without waiting for it"""
+    function = resolve_function(route_path, db)
+    invocation = invocation_queue.enqueue(db, function.id, execution_request.event)
+    return AsyncInvocationResponse(
+        execution_id=invocation.execution_id,
+        function_id=invocation.function_id,
+        status=invocation.status
+    )
+
+
+@router.get("/api/executions/{execution_id}", response_model=InvocationStatusResponse)
+def get_execution(execution_id: str, db: Session = Depends(get_db)):
+    """Status of an asynchronous invocation, with its result once finished"""
+    invocation = db.query(Invocation).filter(Invocation.execution_id == execution_id).first()
+    if invocation is None:
+        raise HTTPException(status_code=404, detail="Execution not found")
+
+    return InvocationStatusResponse(
+        execution_id=invocation.execution_id,
+        function_id=invocation.function_id,
+        status=invocation.status,
+        attempts=invocation.attempts,
+        max_attempts=invocation.max_attempts,
+        result=json.loads(invocation.result) if invocation.result else None,
+        error_message=invocation.error_message,
+        logs=invocation.logs,
+        created_at=invocation.created_at,
+        started_at=invocation.started_at,
+        finished_at=invocation.finished_at
+    )
+
+
+@router.get("/api/queue/stats")
+def get_queue_stats():
+    """Async invocation queue depth and worker counters"""
+    return invocation_queue.stats()
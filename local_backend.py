@@ -0,0 +1,483 @@
+import math
+import os
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional, List, Iterator, Callable, Tuple
+import logging
+
+from artifact_store import ArtifactStore
+from container_pool import ContainerPool
+from container_reaper import ContainerReaper
+from execution_backend import ExecutionBackend
+from metrics import PhaseTimer
+from payload_exchange import PayloadExchange, default_payload_dir
+from runner_client import RunnerClient, RunnerConnectionError, STDOUT
+
+logger = logging.getLogger(__name__)
+
+RUNNERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "docker-runners")
+
+# Host environment variables runner processes inherit; everything else
+# (database URLs, credentials) stays out of reach of functions
+INHERITED_ENVIRONMENT = ("PATH", "LANG", "LC_ALL", "TMPDIR", "NODE_PATH")
+
+
+class LocalProcess:
+    """A runner entrypoint running as a child process, in place of a container"""
+
+    def __init__(self, name: str, command: List[str], environment: Dict[str, str]):
+        self.name = name
+        self.id = name
+        self.status = "running"
+        # Its own process group, so a kill also reaches the forked children
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=environment,
+            cwd=tempfile.gettempdir(),
+            start_new_session=True
+        )
+        # No core dumps when a runner or a forked call overruns its CPU limit.
+        # Set with prlimit rather than preexec_fn, which is unsafe in a
+        # threaded parent
+        self._set_limit(resource.RLIMIT_CORE, (0, 0))
+
+    def limit_cpu(self, seconds: Optional[float]):
+        """
+        Allow the process `seconds` more CPU time from now, or any amount with None
+
+        RLIMIT_CPU counts over a process's lifetime, so a runner serving
+        many calls gets its soft limit moved past what it has used so far.
+        The kernel sends SIGXCPU at the soft limit, which ends the process.
+        """
+        if seconds is None:
+            soft = resource.RLIM_INFINITY
+        else:
+            try:
+                soft = math.ceil(self.cpu_time() + seconds)
+            except FileNotFoundError:
+                return  # Already gone; the call fails on its own
+        self._set_limit(resource.RLIMIT_CPU, (soft, resource.RLIM_INFINITY))
+
+    def cpu_time(self) -> float:
+        """User and system CPU seconds the process has used"""
+        with open(f"/proc/{self.process.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime and stime, fields 14 and 15 of proc(5)
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def exceeded_cpu(self, timeout: float = 0.5) -> bool:
+        """True if the process was ended by its CPU time limit"""
+        try:
+            return self.process.wait(timeout) == -signal.SIGXCPU
+        except subprocess.TimeoutExpired:
+            return False
+
+    def _set_limit(self, limit: int, values: Tuple[int, int]):
+        try:
+            resource.prlimit(self.process.pid, limit, values)
+        except (ProcessLookupError, FileNotFoundError):
+            pass
+
+    def reload(self):
+        if self.status == "running" and self.process.poll() is not None:
+            self.status = "exited"
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+        self.status = "exited"
+
+    def remove(self, force: bool = False):
+        self.kill()
+        for pipe in (self.process.stdin, self.process.stdout, self.process.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+        self.status = "removed"
+
+
+class LocalProcesses:
+    """Starts runner processes for the pool, standing in for `client.containers`"""
+
+    def __init__(self, commands: Dict[str, Tuple[str, str]], environment: Dict[str, str]):
+        self.commands = commands
+        self.environment = environment
+
+    def run(
+        self,
+        image: str,
+        name: str,
+        detach: bool = True,
+        labels: Optional[Dict[str, str]] = None,
+        environment: Optional[Dict[str, str]] = None,
+        interpreter_args: Tuple[str, ...] = (),
+        **options
+    ) -> LocalProcess:
+        """Start the runner for language `image`; `interpreter_args` go before the entrypoint"""
+        interpreter, entrypoint = self.commands[image]
+        return LocalProcess(
+            name,
+            [interpreter, *interpreter_args, entrypoint],
+            dict(self.environment, **(environment or {}))
+        )
+
+
+class LocalProcessClient:
+    """The part of the Docker client ContainerPool needs"""
+
+    def __init__(self, commands: Dict[str, Tuple[str, str]], environment: Dict[str, str]):
+        self.containers = LocalProcesses(commands, environment)
+
+
+class ProcessRunnerClient(RunnerClient):
+    """RunnerClient for a LocalProcess: frames over its stdin and stdout pipes"""
+
+    def _connect(self):
+        self._fd = self.container.process.stdin.fileno()
+
+    def _disconnect(self):
+        self.container.process.stdin.close()
+
+    def _write(self, data: bytes):
+        with self._write_lock:
+            view = memoryview(data)
+            while view:
+                written = os.write(self._fd, view)
+                view = view[written:]
+
+    def _read_streams(self) -> Iterator[Tuple[int, bytes]]:
+        threading.Thread(
+            target=self._read_stderr, name=f"runner-{self.name}-stderr", daemon=True
+        ).start()
+        stdout = self.container.process.stdout.fileno()
+        while True:
+            data = os.read(stdout, 65536)
+            if not data:
+                return
+            yield STDOUT, data
+
+    def _read_stderr(self):
+        stderr = self.container.process.stderr.fileno()
+        try:
+            while True:
+                data = os.read(stderr, 65536)
+                if not data:
+                    return
+                self.stderr_tail.extend(data.decode('utf-8', errors='replace').splitlines())
+        except OSError:
+            pass
+
+
+class LocalProcessBackend(ExecutionBackend):
+    """
+    Runs functions in runner processes on the platform host, without containers
+
+    Uses the same runner entrypoints as the Docker backend, kept warm in a
+    pool. Python runners fork every invocation from a zygote with the
+    preloaded modules imported, so a call starts in a few milliseconds and
+    cannot see another call's state; the fork is confined by the function's
+    memory limit and an RLIMIT_CPU of timeout x cpu seconds. Node runners
+    get the memory limit as their heap size, and the same CPU time budget
+    as an RLIMIT_CPU on the runner process, moved before every call.
+    Runners share the host's filesystem and network, so this backend is for
+    trusted functions only, and functions with dependencies are not
+    supported since there is no image to install them into.
+    """
+
+    name = "local"
+    supported_languages = {
+        "python": "python",
+        "javascript": "javascript"
+    }
+
+    def __init__(self):
+        super().__init__(int(os.getenv("MAX_CONCURRENT_EXECUTIONS", "10")))
+
+        # Bytecode is compiled for the interpreter the runners use here
+        self.artifacts = ArtifactStore(
+            os.getenv("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "serverless-artifacts")),
+            python_cache_tag=sys.implementation.cache_tag
+        )
+        # Runners see the payload directory at its host path
+        payload_dir = os.getenv("PAYLOAD_DIR", default_payload_dir())
+        self.payloads = PayloadExchange(
+            payload_dir,
+            mount=payload_dir,
+            threshold=int(os.getenv("PAYLOAD_FILE_THRESHOLD", str(256 * 1024))),
+            encoding=os.getenv("PAYLOAD_ENCODING", "auto")
+        )
+
+        self.runner_start_timeout = float(os.getenv("RUNNER_START_TIMEOUT", "30"))
+
+        environment = {
+            name: os.environ[name] for name in INHERITED_ENVIRONMENT if name in os.environ
+        }
+        environment.update({
+            "RUNNER_MODE": "serve",
+            "RUNNER_MAX_LOG_BYTES": os.getenv("MAX_LOG_BYTES", str(1024 * 1024)),
+            "RUNNER_MAX_RESULT_BYTES": os.getenv("MAX_RESULT_BYTES", str(6 * 1024 * 1024)),
+            "RUNNER_ZYGOTE": "1",
+            "RUNNER_PRELOAD": os.getenv("PYTHON_PRELOAD_MODULES", "numpy,pandas,requests"),
+            "RUNNER_FORK_MAX_RSS_MB": str(self.default_memory_mb),
+        })
+        commands = {
+            "python": (
+                os.getenv("LOCAL_PYTHON", sys.executable),
+                os.path.join(RUNNERS_DIR, "python-runner", "entrypoint.py")
+            ),
+            "javascript": (
+                os.getenv("LOCAL_NODE", "node"),
+                os.path.join(RUNNERS_DIR, "javascript-runner", "entrypoint.js")
+            ),
+        }
+        client = LocalProcessClient(commands, environment)
+        self.pool = ContainerPool(
+            client,
+            min_size=int(os.getenv("LOCAL_POOL_MIN_SIZE", "1")),
+            max_size=int(os.getenv("LOCAL_POOL_MAX_SIZE", str(self.max_concurrency))),
+            idle_timeout=float(os.getenv("POOL_IDLE_TIMEOUT", "300")),
+            max_uses=int(os.getenv("LOCAL_POOL_MAX_USES", "1000")),
+            maintenance_interval=float(os.getenv("POOL_MAINTENANCE_INTERVAL", "30")),
+            connect=self._connect_runner,
+            # Runners exit when their pipes close, so nothing outlives the
+            # platform and there is nothing to sweep for
+            reaper=ContainerReaper(client, self.name, sweep_interval=0)
+        )
+        self._ready = set()
+        self._preparation: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the warm runner processes in a background thread; returns immediately"""
+        self.pool.reaper.start()
+        if self._preparation is None:
+            self._preparation = threading.Thread(
+                target=self.prepare, name="local-prepare", daemon=True
+            )
+            self._preparation.start()
+
+    def prepare(self):
+        """Register the language pools and start their first runners"""
+        for lang in self.supported_languages:
+            try:
+                if not self.pool.is_registered(lang):
+                    self.pool.register(lang, lang)
+                self.pool.fill(lang)
+            except Exception as e:
+                logger.error(f"Failed to prepare local {lang} runners: {str(e)}")
+                continue
+            self._ready.add(lang)
+        self.pool.start()
+        logger.info(f"Local runtimes ready: {', '.join(sorted(self._ready)) or 'none'}")
+
+    def is_ready(self, language: str) -> bool:
+        return language in self._ready
+
+    def _execute_sync(
+        self,
+        function_id: str,
+        function_name: str,
+        language: str,
+        code: str,
+        event: Dict[str, Any],
+        timeout: int,
+        dependencies: Optional[str] = None,
+        timer: Optional[PhaseTimer] = None,
+        submitted_at: Optional[float] = None,
+        on_output: Optional[Callable[[str], None]] = None,
+        memory_mb: Optional[int] = None,
+        cpu: Optional[float] = None,
+        execution: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Blocking body of execute_function: run the function in a warm runner process"""
+        execution = execution if execution is not None else {"cancelled": False, "pooled": None}
+        timer = timer if timer is not None else PhaseTimer()
+        if submitted_at is not None:
+            # Time spent waiting for a free execution thread
+            timer.add("dispatch", (time.perf_counter() - submitted_at) * 1000)
+
+        if dependencies and dependencies.strip():
+            return {
+                "error": True,
+                "message": "Functions with dependencies cannot run on the local backend"
+            }
+
+        timeout_seconds = timeout / 1000
+        with timer.phase("artifact"):
+            code_hash = self.artifacts.put(language, code)
+        try:
+            with timer.phase("checkout"):
+                pooled = self.pool.checkout(self._pool_for(language, memory_mb), timeout=timeout_seconds)
+        except Exception as e:
+            logger.error(f"Failed to start a local runner for {function_name}: {str(e)}")
+            return {
+                "error": True,
+                "message": f"Failed to acquire runner: {str(e)}"
+            }
+
+        execution["pooled"] = pooled
+        if execution["cancelled"]:
+            # The caller gave up while the runner was being acquired
+            self.pool.release(pooled)
+            return {
+                "error": True,
+                "timeout": True,
+                "message": "Function execution timed out"
+            }
+
+        limits = self._limits(timeout_seconds, memory_mb, cpu)
+        healthy = True
+        try:
+            self._limit_runner_cpu(pooled, language, limits["cpu_seconds"])
+            result, healthy = self._invoke(
+                pooled, function_name, str(uuid.uuid4()), code_hash,
+                self._code_path(language, code_hash), event, timeout_seconds, timer, on_output,
+                limits
+            )
+            if not healthy and language == "javascript" and pooled.container.exceeded_cpu():
+                result = {
+                    "error": True,
+                    "message": f"Function used more than {limits['cpu_seconds']:g} seconds of CPU time",
+                    "logs": result.get("logs")
+                }
+            return result
+        finally:
+            if execution["cancelled"]:
+                healthy = False
+            if healthy:
+                self._limit_runner_cpu(pooled, language, None)
+            with timer.phase("release"):
+                self.pool.release(pooled, healthy=healthy)
+
+    def _execute_batch_sync(
+        self,
+        function_id: str,
+        function_name: str,
+        language: str,
+        code: str,
+        events: List[Dict[str, Any]],
+        timeout: int,
+        dependencies: Optional[str],
+        parallelism: int,
+        memory_mb: Optional[int] = None,
+        cpu: Optional[float] = None,
+        execution: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Blocking body of execute_batch: run the batch in one warm runner process"""
+        execution = execution if execution is not None else {"cancelled": False, "pooled": None}
+        timeout_seconds = timeout / 1000
+        pending = set(range(len(events)))
+        if dependencies and dependencies.strip():
+            yield from self._fail_remaining(
+                pending, "Functions with dependencies cannot run on the local backend"
+            )
+            return
+
+        try:
+            code_hash = self.artifacts.put(language, code)
+            pooled = self.pool.checkout(self._pool_for(language, memory_mb), timeout=timeout_seconds)
+        except Exception as e:
+            logger.error(f"Failed to start batch for {function_name}: {str(e)}")
+            yield from self._fail_remaining(pending, f"Failed to start batch: {str(e)}")
+            return
+
+        execution["pooled"] = pooled
+        if execution["cancelled"]:
+            # The consumer went away while the runner was being acquired
+            self.pool.release(pooled)
+            return
+
+        limits = self._limits(timeout_seconds, memory_mb, cpu)
+        state = {"healthy": True}
+        try:
+            # One budget for the whole batch, since its calls share the runner
+            self._limit_runner_cpu(pooled, language, limits["cpu_seconds"] * len(events))
+            yield from self._invoke_batch(
+                pooled, function_name, str(uuid.uuid4()), code_hash,
+                self._code_path(language, code_hash), events, timeout_seconds, parallelism,
+                pending, state, limits
+            )
+        finally:
+            if execution["cancelled"]:
+                state["healthy"] = False
+            if state["healthy"]:
+                self._limit_runner_cpu(pooled, language, None)
+            self.pool.release(pooled, healthy=state["healthy"])
+
+    def _pool_for(self, language: str, memory_mb: Optional[int]) -> str:
+        """
+        Pool key for a language and memory limit, registering it on first use
+
+        Python limits are applied per fork, so one pool serves every limit.
+        Node's heap size is fixed when the process starts, so Node runners
+        with a non-default memory limit get a pool of their own.
+        """
+        memory_mb = memory_mb or self.default_memory_mb
+        if language != "javascript" or memory_mb == self.default_memory_mb:
+            return language
+
+        key = f"{language}@{memory_mb}m"
+        if not self.pool.is_registered(key):
+            self.pool.register(key, language, min_size=0, container_options={
+                "interpreter_args": (f"--max-old-space-size={memory_mb}",)
+            })
+        return key
+
+    def _limits(self, timeout_seconds: float, memory_mb: Optional[int], cpu: Optional[float]) -> Dict[str, Any]:
+        """Per-invocation limits enforced by runners that fork every call"""
+        return {
+            "memory_mb": memory_mb or self.default_memory_mb,
+            "cpu_seconds": timeout_seconds * (cpu or self.default_cpu),
+        }
+
+    def _limit_runner_cpu(self, pooled, language: str, seconds: Optional[float]):
+        """
+        Set the CPU time budget of a Node runner for its next call, or lift it with None
+
+        Python calls run in a fresh fork that applies the limit itself.
+        """
+        if language == "javascript":
+            pooled.container.limit_cpu(seconds)
+
+    def _code_path(self, language: str, code_hash: str) -> str:
+        return os.path.join(self.artifacts.root, self.artifacts.relative_path(language, code_hash))
+
+    def _kill(self, pooled):
+        """Kill a runner process whose execution overran, with its forked children"""
+        try:
+            pooled.container.kill()
+            logger.info(f"Killed runner {pooled.name}")
+        except Exception as e:
+            logger.error(f"Failed to kill runner {pooled.name}: {str(e)}")
+
+    def _connect_runner(self, process: LocalProcess) -> ProcessRunnerClient:
+        """Connect to a freshly started runner process and wait until it answers"""
+        runner = ProcessRunnerClient(process, exchange=self.payloads if self.payloads.enabled else None)
+        if not runner.ping(timeout=self.runner_start_timeout):
+            runner.close()
+            raise RunnerConnectionError(
+                f"Runner {process.name} did not become ready: " + "\n".join(runner.stderr_tail)
+            )
+        return runner
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Warm runner hit/miss counters and sizes per language"""
+        return self.pool.stats()
+
+    def cleanup(self):
+        """Stop every runner process"""
+        self.pool.shutdown()
+        self.pool.reaper.shutdown()
+        super().cleanup()
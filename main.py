@@ -1,23 +1,72 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine, Column, String, Integer, Boolean, DateTime, Text
+from sqlalchemy import create_engine, func, select, inspect, literal, text, Column, String, Integer, Boolean, DateTime, Text, Float, UniqueConstraint
+from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from pydantic import BaseModel
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, AsyncIterator
+from contextlib import asynccontextmanager
 import os
+import asyncio
+import hashlib
+import logging
+import time
 from datetime import datetime
 import uvicorn
 from dotenv import load_dotenv
 
+from function_cache import FunctionCache, snapshot_function
+from admission import admission
+from image_builder import ImageBuilder
+from metrics import registry, Gauge, db_checkout_wait
+
 # Load environment variables from .env file
 load_dotenv()
 # Database Configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
-print(DATABASE_URL)
+
+# Async drivers for the sync URLs we accept, used unless ASYNC_DATABASE_URL is set
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> str:
+    """The async-driver equivalent of a sync database URL"""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+def engine_options(url: str) -> Dict:
+    """Connection pool settings from the environment"""
+    options = {
+        # Drop connections before the server's wait_timeout closes them
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        # Test connections on checkout so a restarted server is not an error
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+    if not make_url(url).drivername.startswith("sqlite"):
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        )
+    return options
+
 # SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for request paths that must not block the event loop
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # Function Model
@@ -30,12 +79,187 @@ class Function(Base):
     language = Column(String(50), nullable=False)
     code = Column(Text, nullable=False)
     timeout = Column(Integer, default=30000)  # 30 seconds in milliseconds
+    # requirements.txt (python) or package.json / dependency map (javascript)
+    dependencies = Column(Text, nullable=True)
+    # Opt-in memoization for deterministic functions
+    cacheable = Column(Boolean, default=False)
+    cache_ttl = Column(Integer, default=300)  # seconds
+    # Execution slots held for this function alone, and its concurrency cap
+    reserved_concurrency = Column(Integer, nullable=True)
+    max_concurrency = Column(Integer, nullable=True)
+    # Container memory limit (MB) and CPU limit (cores); null uses the platform default
+    memory_mb = Column(Integer, nullable=True)
+    cpu = Column(Float, nullable=True)
+    # Execution backend (EXECUTION_BACKENDS), default: the deployment's first
+    backend = Column(String(20), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     active = Column(Boolean, default=True)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Version counters shared by all workers, bumped on every write
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+    
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# Asynchronous invocation, doubling as the durable work queue
+class Invocation(Base):
+    __tablename__ = "invocations"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    execution_id = Column(String(64), unique=True, index=True, nullable=False)
+    function_id = Column(Integer, index=True, nullable=False)
+    # queued (including waiting to retry), running, succeeded or dead (retries exhausted)
+    status = Column(String(20), index=True, nullable=False, default="queued")
+    event = Column(Text().with_variant(LONGTEXT(), "mysql"), nullable=False)
+    result = Column(Text().with_variant(LONGTEXT(), "mysql"), nullable=True)
+    error_message = Column(Text, nullable=True)
+    logs = Column(Text().with_variant(LONGTEXT(), "mysql"), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, index=True, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    worker = Column(String(100), nullable=True)
+
+# One row per execution, written in batches off the request path
+class Execution(Base):
+    __tablename__ = "executions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    execution_id = Column(String(64), unique=True, index=True, nullable=False)
+    function_id = Column(Integer, index=True, nullable=False)
+    started_at = Column(DateTime, index=True, nullable=False)
+    duration_ms = Column(Float, nullable=False)
+    # Time spent waiting for admission, included in duration_ms
+    queue_wait_ms = Column(Float, nullable=False, default=0)
+    # 0 on success, 1 on error, 124 on timeout (as with timeout(1))
+    exit_code = Column(Integer, nullable=False, default=0)
+    error = Column(Boolean, nullable=False, default=False)
+    cache_hit = Column(Boolean, nullable=False, default=False)
+    output_bytes = Column(Integer, nullable=False, default=0)
+    # Per-phase timings in milliseconds, as JSON
+    timings = Column(Text, nullable=True)
+
+# Per-function aggregates of executions over fixed time buckets
+class ExecutionRollup(Base):
+    __tablename__ = "execution_rollups"
+    __table_args__ = (UniqueConstraint("function_id", "bucket_start"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    function_id = Column(Integer, index=True, nullable=False)
+    bucket_start = Column(DateTime, index=True, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    timeouts = Column(Integer, nullable=False, default=0)
+    cache_hits = Column(Integer, nullable=False, default=0)
+    duration_sum_ms = Column(Float, nullable=False, default=0)
+    duration_max_ms = Column(Float, nullable=False, default=0)
+    output_bytes = Column(Integer, nullable=False, default=0)
+    # Counts per latency bucket (see execution_history.LATENCY_BOUNDS_MS), as JSON
+    latency_histogram = Column(Text, nullable=False)
+    # Peak container memory/CPU of sampled executions, with histograms as JSON
+    # (see execution_history.MEMORY_BOUNDS_MB and CPU_BOUNDS)
+    usage_samples = Column(Integer, nullable=False, default=0)
+    peak_memory_mb = Column(Float, nullable=False, default=0)
+    peak_cpu = Column(Float, nullable=False, default=0)
+    memory_histogram = Column(Text, nullable=True)
+    cpu_histogram = Column(Text, nullable=True)
+
+def bump_functions_version(db: Session):
+    """Bump the shared functions version so other workers drop cached routes"""
+    updated = db.query(CacheVersion).filter(CacheVersion.name == "functions").update(
+        {CacheVersion.version: CacheVersion.version + 1}
+    )
+    if not updated:
+        db.add(CacheVersion(name="functions", version=1))
+
+def schedule_image_build(function):
+    """Prebuild the function's image so its first invocation is not a cold build"""
+    from executor import backend_for
+    backend = backend_for(function)
+    if backend is not None:
+        backend.schedule_build(str(function.id), function.language, function.code, function.dependencies)
+
+def validate_concurrency(
+    db: Session,
+    function_id: Optional[int],
+    reserved: Optional[int],
+    maximum: Optional[int]
+):
+    """Reject concurrency settings that cannot be honoured within the host budget"""
+    if (reserved is not None and reserved < 0) or (maximum is not None and maximum < 1):
+        raise HTTPException(status_code=400, detail="Concurrency settings must be positive")
+    if reserved and maximum and reserved > maximum:
+        raise HTTPException(
+            status_code=400, detail="reserved_concurrency cannot exceed max_concurrency"
+        )
+    if reserved:
+        others = db.query(func.coalesce(func.sum(Function.reserved_concurrency), 0)).filter(
+            Function.id != (function_id or 0)
+        ).scalar()
+        if others + reserved > admission.budget:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Only {admission.budget - others} of the {admission.budget} execution slots are unreserved"
+            )
+
+def validate_resources(memory_mb: Optional[int], cpu: Optional[float]):
+    """Reject resource limits a container cannot start with"""
+    if memory_mb is not None and memory_mb < 16:
+        raise HTTPException(status_code=400, detail="memory_mb must be at least 16")
+    if cpu is not None and cpu <= 0:
+        raise HTTPException(status_code=400, detail="cpu must be positive")
+
+def validate_backend(backend: Optional[str], dependencies: Optional[str]):
+    """Reject execution backends this deployment does not run, or that cannot run the function"""
+    from executor import backends, default_backend
+    if backend is not None and backend not in backends:
+        raise HTTPException(
+            status_code=400,
+            detail=f"backend must be one of: {', '.join(backends)}"
+        )
+    chosen = backends[backend] if backend is not None else default_backend
+    if dependencies and dependencies.strip() and not chosen.supports_dependencies:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Functions with dependencies cannot run on the {chosen.name} backend"
+        )
+
+def validate_dependencies(language: str, dependencies: Optional[str]):
+    """Reject dependency declarations the image builder could not install"""
+    if not dependencies or not dependencies.strip() or language not in ("python", "javascript"):
+        return
+    try:
+        ImageBuilder.normalize_dependencies(language, dependencies)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid dependencies: {str(e)}")
+
+def read_functions_version() -> int:
+    db = SessionLocal()
+    try:
+        row = db.query(CacheVersion).filter(CacheVersion.name == "functions").first()
+        return row.version if row else 0
+    finally:
+        db.close()
+
+async def read_functions_version_async() -> int:
+    async with async_session() as db:
+        version = await db.scalar(
+            select(CacheVersion.version).where(CacheVersion.name == "functions")
+        )
+        return version or 0
+
+# Route -> function cache used by the invoke path
+function_cache = FunctionCache(
+    max_size=int(os.getenv("FUNCTION_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("FUNCTION_CACHE_TTL", "60")),
+    version_loader=read_functions_version,
+    version_check_interval=float(os.getenv("FUNCTION_CACHE_VERSION_INTERVAL", "1")),
+    async_version_loader=read_functions_version_async
+)
 
 # Pydantic models for API
 class FunctionBase(BaseModel):
@@ -45,6 +269,14 @@ class FunctionBase(BaseModel):
     code: str
     timeout: Optional[int] = 30000
     active: Optional[bool] = True
+    dependencies: Optional[str] = None
+    cacheable: Optional[bool] = False
+    cache_ttl: Optional[int] = 300
+    reserved_concurrency: Optional[int] = None
+    max_concurrency: Optional[int] = None
+    memory_mb: Optional[int] = None
+    cpu: Optional[float] = None
+    backend: Optional[str] = None
 
 class FunctionCreate(FunctionBase):
     pass
@@ -56,6 +288,39 @@ class FunctionUpdate(BaseModel):
     code: Optional[str] = None
     timeout: Optional[int] = None
     active: Optional[bool] = None
+    dependencies: Optional[str] = None
+    cacheable: Optional[bool] = None
+    cache_ttl: Optional[int] = None
+    reserved_concurrency: Optional[int] = None
+    max_concurrency: Optional[int] = None
+    memory_mb: Optional[int] = None
+    cpu: Optional[float] = None
+    backend: Optional[str] = None
+
+# Listing entry without the code and dependencies columns
+class FunctionSummary(BaseModel):
+    id: int
+    name: str
+    route: str
+    language: str
+    timeout: Optional[int] = None
+    active: Optional[bool] = None
+    cacheable: Optional[bool] = None
+    reserved_concurrency: Optional[int] = None
+    max_concurrency: Optional[int] = None
+    memory_mb: Optional[int] = None
+    cpu: Optional[float] = None
+    backend: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        orm_mode = True
+
+class FunctionPage(BaseModel):
+    items: List[FunctionSummary]
+    # Pass as `after` to fetch the next page; null on the last page
+    next_cursor: Optional[int] = None
 
 class FunctionInDB(FunctionBase):
     id: int
@@ -65,6 +330,32 @@ class FunctionInDB(FunctionBase):
     class Config:
         orm_mode = True
 
+@asynccontextmanager
+async def async_session() -> AsyncIterator[AsyncSession]:
+    """Async session with its connection checked out up front, timing the pool wait"""
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        await db.connection()
+        db_checkout_wait.observe(time.perf_counter() - started, engine="async")
+        yield db
+
+async def get_async_db():
+    async with async_session() as db:
+        yield db
+
+def collect_db_pool_metrics():
+    """Connections in use and idle per engine, read at scrape time"""
+    connections = Gauge("db_pool_connections", "Database pool connections by state", ["engine", "state"])
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        # Only queue pools keep counts; sqlite may use a pool without them
+        if hasattr(pool, "checkedout"):
+            connections.set(pool.checkedout(), engine=name, state="checked_out")
+            connections.set(pool.checkedin(), engine=name, state="idle")
+            connections.set(pool.overflow(), engine=name, state="overflow")
+    return [connections]
+
+registry.add_collector(collect_db_pool_metrics)
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -96,6 +387,48 @@ def get_all_functions(skip: int = 0, limit: int = 100, db: Session = Depends(get
     functions = db.query(Function).offset(skip).limit(limit).all()
     return functions
 
+@app.get("/api/functions/summary", response_model=FunctionPage)
+def list_function_summaries(
+    response: Response,
+    after: Optional[int] = Query(None, ge=0, description="Return functions with a larger id"),
+    limit: int = Query(100, ge=1, le=1000),
+    language: Optional[str] = None,
+    active: Optional[bool] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Page through functions without their code, ordered by id
+    
+    Pages are addressed by the last id seen (`after`), so deep pages cost the
+    same as the first. The ETag is derived from the functions version, which
+    every create, update and delete bumps, so an unchanged poll with
+    If-None-Match gets a 304 after a single primary-key lookup.
+    """
+    version = db.query(CacheVersion.version).filter(CacheVersion.name == "functions").scalar() or 0
+    etag = '"' + hashlib.sha1(
+        f"{version}:{after}:{limit}:{language}:{active}".encode("utf-8")
+    ).hexdigest()[:20] + '"'
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    columns = [getattr(Function, name) for name in FunctionSummary.__fields__]
+    query = db.query(*columns)
+    if after is not None:
+        query = query.filter(Function.id > after)
+    if language is not None:
+        query = query.filter(Function.language == language)
+    if active is not None:
+        query = query.filter(Function.active == active)
+    # One extra row tells whether another page follows
+    rows = query.order_by(Function.id).limit(limit + 1).all()
+    
+    response.headers["ETag"] = etag
+    return {
+        "items": rows[:limit],
+        "next_cursor": rows[limit - 1].id if len(rows) > limit else None,
+    }
+
 @app.get("/api/functions/{function_id}", response_model=FunctionInDB)
 def get_function_by_id(function_id: int, db: Session = Depends(get_db)):
     function = db.query(Function).filter(Function.id == function_id).first()
@@ -115,7 +448,7 @@ def get_function_by_route(route: str, db: Session = Depends(get_db)):
     return function
 
 @app.post("/api/functions/", response_model=FunctionInDB, status_code=201)
-def create_function(function: FunctionCreate, db: Session = Depends(get_db)):
+def create_function(function: FunctionCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     # Check if function with same name or route already exists
     existing_function = db.query(Function).filter(
         (Function.name == function.name) | (Function.route == function.route)
@@ -131,14 +464,31 @@ def create_function(function: FunctionCreate, db: Session = Depends(get_db)):
     if not function.route.startswith('/'):
         function.route = '/' + function.route
     
+    validate_concurrency(db, None, function.reserved_concurrency, function.max_concurrency)
+    validate_resources(function.memory_mb, function.cpu)
+    validate_backend(function.backend, function.dependencies)
+    validate_dependencies(function.language, function.dependencies)
+    
     db_function = Function(**function.dict())
     db.add(db_function)
+    bump_functions_version(db)
     db.commit()
     db.refresh(db_function)
+    function_cache.invalidate(db_function.route)
+    admission.configure(
+        db_function.id, db_function.reserved_concurrency, db_function.max_concurrency
+    )
+    if db_function.dependencies:
+        background_tasks.add_task(schedule_image_build, snapshot_function(db_function))
     return db_function
 
 @app.put("/api/functions/{function_id}", response_model=FunctionInDB)
-def update_function(function_id: int, function: FunctionUpdate, db: Session = Depends(get_db)):
+def update_function(
+    function_id: int,
+    function: FunctionUpdate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     db_function = db.query(Function).filter(Function.id == function_id).first()
     if db_function is None:
         raise HTTPException(status_code=404, detail="Function not found")
@@ -163,14 +513,37 @@ def update_function(function_id: int, function: FunctionUpdate, db: Session = De
                 detail="The new name or route conflicts with an existing function"
             )
     
-    # Update function fields
     function_data = function.dict(exclude_unset=True)
+    validate_concurrency(
+        db, function_id,
+        function_data.get("reserved_concurrency", db_function.reserved_concurrency),
+        function_data.get("max_concurrency", db_function.max_concurrency)
+    )
+    validate_resources(function_data.get("memory_mb"), function_data.get("cpu"))
+    validate_backend(
+        function_data.get("backend", db_function.backend),
+        function_data.get("dependencies", db_function.dependencies)
+    )
+    validate_dependencies(
+        function_data.get("language", db_function.language),
+        function_data.get("dependencies", db_function.dependencies)
+    )
+    
+    # Update function fields
+    old_route = db_function.route
     for key, value in function_data.items():
         setattr(db_function, key, value)
     
     db_function.updated_at = datetime.utcnow()
+    bump_functions_version(db)
     db.commit()
     db.refresh(db_function)
+    function_cache.invalidate(old_route, db_function.route)
+    admission.configure(
+        db_function.id, db_function.reserved_concurrency, db_function.max_concurrency
+    )
+    if db_function.dependencies:
+        background_tasks.add_task(schedule_image_build, snapshot_function(db_function))
     return db_function
 
 @app.delete("/api/functions/{function_id}", status_code=204)
@@ -179,21 +552,129 @@ def delete_function(function_id: int, db: Session = Depends(get_db)):
     if db_function is None:
         raise HTTPException(status_code=404, detail="Function not found")
     
+    route = db_function.route
     db.delete(db_function)
+    bump_functions_version(db)
     db.commit()
+    function_cache.invalidate(route)
+    admission.forget(function_id)
     return None
 
 # Import the executor router
 from executor import router as executor_router
+from invocation_queue import router as invocation_router, invocation_queue
+from execution_history import router as history_router, execution_recorder
 
 # Include the executor router
 app.include_router(executor_router)
+app.include_router(invocation_router)
+app.include_router(history_router)
+
+logger = logging.getLogger(__name__)
+
+def migrate_schema(bind) -> List[str]:
+    """
+    Add the columns the models declare that existing tables lack
+    
+    `create_all` only creates missing tables, so a database created before
+    a column was added to a model fails every query selecting it. Missing
+    columns are added nullable, with the model's scalar default (if any) as
+    their server default so existing rows take it too.
+    
+    Returns:
+        The columns added, as "table.column"
+    """
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    preparer = bind.dialect.identifier_preparer
+    added = []
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            missing = [column for column in table.columns if column.name not in present]
+            for column in missing:
+                ddl = (
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=bind.dialect)}"
+                )
+                if column.default is not None and column.default.is_scalar:
+                    default = literal(column.default.arg, column.type).compile(
+                        dialect=bind.dialect, compile_kwargs={"literal_binds": True}
+                    )
+                    ddl += f" DEFAULT {default}"
+                conn.execute(text(ddl))
+                added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                if any(column in missing for column in index.columns):
+                    index.create(conn)
+    for column in added:
+        logger.info(f"Added column {column} to the existing schema")
+    return added
+
+def collect_unreferenced_artifacts() -> int:
+    """Drop code artifacts that no Function row references any more"""
+    from executor import backends
+    db = SessionLocal()
+    try:
+        functions = db.query(Function.language, Function.code).all()
+    finally:
+        db.close()
+    return sum(backend.collect_artifacts(functions) for backend in backends.values())
+
+async def artifact_gc_loop():
+    interval = float(os.getenv("ARTIFACT_GC_INTERVAL", "3600"))
+    while True:
+        try:
+            await asyncio.to_thread(collect_unreferenced_artifacts)
+        except Exception as e:
+            logger.error(f"Artifact garbage collection failed: {str(e)}")
+        try:
+            from executor import backends
+            for backend in backends.values():
+                await asyncio.to_thread(backend.collect_payloads)
+        except Exception as e:
+            logger.error(f"Payload file garbage collection failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+def load_concurrency_settings():
+    """Seed admission control with every function's reservation and cap"""
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            Function.id, Function.reserved_concurrency, Function.max_concurrency
+        ).filter(
+            Function.reserved_concurrency.isnot(None) | Function.max_concurrency.isnot(None)
+        ).all()
+    finally:
+        db.close()
+    for function_id, reserved, maximum in rows:
+        admission.configure(function_id, reserved, maximum)
+
+@app.on_event("startup")
+async def startup_event():
+    from executor import backends
+    # Runner images are built and pools filled in the background; /ready
+    # reports when each language can take executions
+    for backend in backends.values():
+        backend.start()
+    await asyncio.to_thread(Base.metadata.create_all, bind=engine)
+    await asyncio.to_thread(migrate_schema, engine)
+    await asyncio.to_thread(load_concurrency_settings)
+    app.state.artifact_gc = asyncio.create_task(artifact_gc_loop())
+    await invocation_queue.start()
+    execution_recorder.start()
 
 # Shutdown event to clean up resources
 @app.on_event("shutdown")
-def shutdown_event():
-    from executor import docker_manager
-    docker_manager.cleanup()
+async def shutdown_event():
+    from executor import backends
+    await invocation_queue.stop()
+    await execution_recorder.stop()
+    for backend in backends.values():
+        backend.cleanup()
+    await async_engine.dispose()
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
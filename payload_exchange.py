@@ -0,0 +1,150 @@
+import glob
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+
+try:
+    import msgpack
+except ImportError:  # Optional: without it large payloads are exchanged as JSON
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+def default_payload_dir() -> str:
+    """A directory on tmpfs when the host has one, so payload files never hit disk"""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "serverless-payloads")
+
+
+def supported_encodings() -> List[str]:
+    """Payload encodings this process can read and write, most preferred first"""
+    return ["msgpack", "json"] if msgpack is not None else ["json"]
+
+
+def encode(value: Any, encoding: str) -> bytes:
+    if encoding == "msgpack":
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def decode(data, encoding: str) -> Any:
+    if encoding == "msgpack":
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+
+class PayloadExchange:
+    """
+    Files shared with runner containers for events and results too large to frame
+
+    The directory is mounted read-write into every runner at `mount`. An
+    event whose encoding is at least `threshold` bytes is written to a file
+    and the request only carries its path; requests also name a file the
+    runner writes the result to when it is that large. Both sides map the
+    files instead of copying them through the attach socket, the Docker
+    daemon and the frame parser.
+
+    Payload files use the best encoding both sides support (msgpack when it
+    is installed on both, else JSON), negotiated per runner on its first
+    ping; `encoding` pins one. Files are removed once the response has been
+    read; `collect_garbage` removes any left behind by a crash.
+    """
+
+    def __init__(self, root: str, mount: str, threshold: int = 256 * 1024, encoding: str = "auto"):
+        self.root = root
+        self.mount = mount.rstrip("/")
+        self.threshold = threshold
+        self.encoding = encoding
+        os.makedirs(self.root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.files_written = 0
+        self.bytes_written = 0
+        self.files_read = 0
+        self.bytes_read = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def choose_encoding(self, runner_encodings: Optional[Sequence[str]]) -> str:
+        """The encoding to use with a runner that supports `runner_encodings`"""
+        offered = runner_encodings or ["json"]
+        if self.encoding != "auto":
+            return self.encoding if self.encoding in offered and self.encoding in supported_encodings() else "json"
+        return next((name for name in supported_encodings() if name in offered), "json")
+
+    def new_name(self) -> str:
+        return uuid.uuid4().hex
+
+    def container_path(self, filename: str) -> str:
+        return f"{self.mount}/{filename}"
+
+    def write(self, filename: str, data: bytes) -> str:
+        """Write a payload file; returns its path inside the container"""
+        path = os.path.join(self.root, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            self.files_written += 1
+            self.bytes_written += len(data)
+        return self.container_path(filename)
+
+    def read(self, filename: str, encoding: str) -> Any:
+        """Decode and remove a payload file the runner wrote"""
+        path = os.path.join(self.root, filename)
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if encoding == "msgpack" and size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        value = decode(mapped, encoding)
+                else:
+                    value = decode(f.read(), encoding)
+        finally:
+            self.discard([filename])
+        with self._lock:
+            self.files_read += 1
+            self.bytes_read += size
+        return value
+
+    def discard(self, filenames: Sequence[str]):
+        """Remove payload files (or glob patterns of them), ignoring missing ones"""
+        for filename in filenames:
+            for path in glob.glob(os.path.join(self.root, filename)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.error(f"Failed to remove payload file {path}: {str(e)}")
+
+    def collect_garbage(self, min_age: float = 3600) -> int:
+        """Remove payload files older than `min_age` seconds"""
+        cutoff = time.time() - min_age
+        removed = 0
+        for entry in os.scandir(self.root):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "files_written": self.files_written,
+                "bytes_written": self.bytes_written,
+                "files_read": self.files_read,
+                "bytes_read": self.bytes_read,
+            }
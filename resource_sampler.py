@@ -0,0 +1,176 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceSampler:
+    """
+    Samples memory and CPU usage of containers while they run an execution
+
+    `begin` and `end` only enqueue work, so the execution path never waits
+    for the Docker API. A background thread reads container stats when an
+    execution starts and ends, and every `interval` seconds while it runs,
+    with up to `workers` containers read at once, and reports the peak
+    memory (MB) and peak CPU (cores, averaged between consecutive samples)
+    of each execution to `on_usage`.
+
+    Pooled containers stay resident between executions and hold the runner
+    and other functions' cached handlers, so the memory reported is the peak
+    above the container's usage at the start of the execution, not the
+    container's total. Executions shorter than a stats round-trip only get
+    their start and end samples.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        on_usage: Optional[Callable[[Dict[str, Any]], None]] = None,
+        workers: int = 4
+    ):
+        self.interval = interval
+        self.on_usage = on_usage
+        self._workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="resource-sampler")
+        self._active: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._jobs: queue.Queue = queue.Queue()
+        self._tokens = itertools.count(1)
+        self._one_shot = True
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.samples = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        self._jobs.put(None)
+        self._workers.shutdown(wait=False)
+
+    def begin(self, container, function_id: str) -> Optional[int]:
+        """Start tracking an execution in `container`; returns a token for `end`"""
+        if not self.enabled:
+            return None
+        token = next(self._tokens)
+        state = {
+            "container": container,
+            "function_id": function_id,
+            "baseline_memory": None,
+            "peak_memory": 0,
+            "peak_cpu": 0.0,
+            "last_cpu": None,
+            "samples": 0,
+        }
+        with self._lock:
+            self._active[token] = state
+        self._jobs.put(("sample", state))
+        return token
+
+    def end(self, token: Optional[int]):
+        """Stop tracking; the final sample and report happen in the background"""
+        if token is None:
+            return
+        with self._lock:
+            state = self._active.pop(token, None)
+        if state is not None:
+            self._jobs.put(("finish", state))
+
+    def _run(self):
+        next_sweep = time.monotonic() + self.interval
+        while not self._stop.is_set():
+            try:
+                job = self._jobs.get(timeout=max(0.0, next_sweep - time.monotonic()))
+            except queue.Empty:
+                job = None
+
+            # Take every job already waiting, so their reads run in parallel
+            jobs = []
+            while job is not None:
+                jobs.append(job)
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    job = None
+            states = {id(state): state for _, state in jobs}
+            finished = {id(state) for action, state in jobs if action == "finish"}
+            self._sample_all(states.values())
+            for key in finished:
+                self._report(states[key])
+
+            if time.monotonic() >= next_sweep:
+                with self._lock:
+                    active = [state for state in self._active.values() if id(state) not in states]
+                self._sample_all(active)
+                next_sweep = time.monotonic() + self.interval
+
+    def _sample_all(self, states):
+        states = list(states)
+        if len(states) == 1:
+            self._sample(states[0])
+        elif states:
+            list(self._workers.map(self._sample, states))
+
+    def _read_stats(self, container) -> Dict[str, Any]:
+        if self._one_shot:
+            try:
+                return container.stats(stream=False, one_shot=True)
+            except TypeError:
+                # Older SDKs and daemons only support the two-sample read
+                self._one_shot = False
+        return container.stats(stream=False)
+
+    def _sample(self, state: Dict[str, Any]):
+        try:
+            stats = self._read_stats(state["container"])
+        except Exception as e:
+            self.failures += 1
+            logger.debug(f"Failed to read stats for {state['container'].name}: {str(e)}")
+            return
+
+        now = time.monotonic()
+        memory_stats = stats.get("memory_stats") or {}
+        usage = memory_stats.get("usage", 0)
+        details = memory_stats.get("stats") or {}
+        # Page cache is reclaimable, so it does not count towards the need
+        usage -= details.get("inactive_file", details.get("cache", 0))
+        if state["baseline_memory"] is None:
+            state["baseline_memory"] = usage
+        state["peak_memory"] = max(state["peak_memory"], usage - state["baseline_memory"])
+
+        cpu_total = ((stats.get("cpu_stats") or {}).get("cpu_usage") or {}).get("total_usage")
+        if cpu_total is not None:
+            if state["last_cpu"] is not None:
+                previous_total, previous_time = state["last_cpu"]
+                if now > previous_time:
+                    cores = (cpu_total - previous_total) / 1e9 / (now - previous_time)
+                    state["peak_cpu"] = max(state["peak_cpu"], cores)
+            state["last_cpu"] = (cpu_total, now)
+
+        state["samples"] += 1
+        self.samples += 1
+
+    def _report(self, state: Dict[str, Any]):
+        if not state["samples"] or self.on_usage is None:
+            return
+        try:
+            self.on_usage({
+                "function_id": state["function_id"],
+                "peak_memory_mb": round(state["peak_memory"] / (1024 * 1024), 2),
+                "peak_cpu": round(state["peak_cpu"], 3),
+                "samples": state["samples"],
+            })
+        except Exception as e:
+            logger.error(f"Failed to record resource usage: {str(e)}")
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Result handed to coalesced waiters when the request executing for them was cancelled
+LEADER_CANCELLED = object()
+
+
+def event_hash(event: Dict[str, Any]) -> str:
+    """Hash of the canonical JSON form of an event, independent of key order"""
+    canonical = json.dumps(event, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class MemoryResultBackend:
+    """Bounded in-process LRU of results with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteResultBackend:
+    """
+    On-disk result store shared by every worker on the host
+
+    Entries past their expiry are ignored on read and pruned, oldest first,
+    whenever the table grows beyond `max_entries`.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, time.time() + ttl, json.dumps(value))
+            )
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._prune()
+
+    def _prune(self):
+        self._conn.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM results WHERE key IN ("
+            "SELECT key FROM results ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class ResultCache:
+    """
+    Memoizes results of functions flagged as cacheable
+
+    Results are keyed by (function id, code hash, dependencies hash, event
+    hash), so editing the code or its dependencies naturally misses. Only
+    successful results are stored. Identical requests that arrive while the
+    first one is still executing wait for it instead of starting their own
+    execution; if that first request is cancelled, one of them executes in
+    its place.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(
+        function_id: int,
+        code_hash: str,
+        event: Dict[str, Any],
+        dependencies: Optional[str] = None
+    ) -> str:
+        dependencies_hash = hashlib.sha256((dependencies or "").encode('utf-8')).hexdigest()[:16]
+        return f"{function_id}:{code_hash}:{dependencies_hash}:{event_hash(event)}"
+
+    async def get_or_execute(
+        self,
+        key: str,
+        ttl: float,
+        execute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Return (result, served_from_cache) for `key`, executing on a miss
+
+        Results are stored for `ttl` seconds; with a `ttl` of 0 identical
+        concurrent requests are still coalesced but nothing is stored. An
+        error shared with a coalesced request is not reported as served
+        from the cache.
+        """
+        while True:
+            cached = self.backend.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached, True
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            # Cancelling this request interrupts the wait, not the shared execution
+            result = await asyncio.shield(inflight)
+            if result is not LEADER_CANCELLED:
+                return result, not result.get("error", False)
+            # The request executing it went away; the first waiter to wake takes over
+            self.coalesced -= 1
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await execute()
+            if not result.get("error", False) and ttl > 0:
+                self.backend.set(key, result, ttl)
+            future.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            future.set_result(LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; don't let the loop warn about it
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+
+def create_result_cache(backend: str, path: str, max_entries: int) -> ResultCache:
+    """Build a ResultCache for the configured backend ("memory" or "sqlite")"""
+    if backend == "sqlite":
+        return ResultCache(SqliteResultBackend(path, max_entries=max_entries))
+    if backend != "memory":
+        logger.error(f"Unknown result cache backend {backend}, using memory")
+    return ResultCache(MemoryResultBackend(max_entries=max_entries))
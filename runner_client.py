@@ -0,0 +1,406 @@
+import json
+import queue
+import struct
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Optional, Iterator, List, Callable, Tuple
+import logging
+
+from payload_exchange import PayloadExchange, encode
+
+logger = logging.getLogger(__name__)
+
+# Runner frames: 4-byte big-endian length followed by a UTF-8 JSON body
+FRAME_HEADER = struct.Struct(">I")
+# Docker attach stream frames: stream type, 3 padding bytes, 4-byte length
+DOCKER_HEADER = struct.Struct(">BxxxI")
+STDOUT, STDERR = 1, 2
+# Frame types that are followed by more frames for the same request
+CONTINUATION_TYPES = ("item", "log")
+# Request key holding fields already encoded as JSON, spliced into the frame
+ENCODED_FIELDS = "_encoded"
+
+
+class RunnerConnectionError(Exception):
+    """The runner connection closed or broke while requests were pending"""
+
+
+class RunnerClient:
+    """
+    Client for a runner container started in serve mode
+
+    Requests are written as length-prefixed JSON frames to the container's
+    stdin over a single attach socket, and responses are read back from the
+    demultiplexed stdout stream by a background thread that routes each one
+    to its caller by request id. Several requests can be in flight at once.
+
+    With a payload `exchange`, events and results too large to frame go
+    through files on the exchange's shared mount instead, in the encoding
+    negotiated with the runner on ping.
+
+    Subclasses can reach runners over other transports by overriding
+    `_connect`, `_write`, `_read_streams` and `_disconnect`.
+    """
+
+    def __init__(self, container, stderr_lines: int = 200, exchange: Optional[PayloadExchange] = None):
+        self.container = container
+        self.name = container.name
+        self.exchange = exchange
+        self.encoding = "json"
+        self._connect()
+        self._write_lock = threading.Lock()
+        self._pending: Dict[str, Any] = {}
+        self._pending_lock = threading.Lock()
+        self._loaded_hashes = set()
+        self._stdout = bytearray()
+        self.stderr_tail = deque(maxlen=stderr_lines)
+        self.closed = False
+
+        self._reader = threading.Thread(
+            target=self._read_loop, name=f"runner-{self.name}", daemon=True
+        )
+        self._reader.start()
+
+    def ping(self, timeout: float = 5) -> bool:
+        """Round-trip a ping frame; True if the runner answered in time"""
+        try:
+            response = self._request({"type": "ping"}, timeout)
+            if self.exchange is not None:
+                self.encoding = self.exchange.choose_encoding(response.get("encodings"))
+            return response.get("status") == "ok"
+        except Exception:
+            return False
+
+    def invoke(
+        self,
+        code_hash: str,
+        event: Dict[str, Any],
+        context: Dict[str, Any],
+        timeout: float,
+        code: Optional[str] = None,
+        code_path: Optional[str] = None,
+        on_output: Optional[Callable[[str], None]] = None,
+        limits: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run the handler identified by `code_hash` with `event`
+
+        With `code_path` the runner loads the code from its artifact mount
+        whenever it does not have the hash cached. Otherwise `code` is sent
+        the first time this connection sees the hash, or again if the runner
+        reports it has evicted the module.
+
+        With `on_output`, the runner streams the handler's output while it
+        runs and `on_output` is called with each chunk as it arrives.
+
+        `limits` ({"memory_mb": ..., "cpu_seconds": ...}) asks the runner to
+        confine the handler itself; runners that fork every invocation
+        enforce them, others ignore them.
+        """
+        request = {
+            "type": "invoke",
+            "code_hash": code_hash,
+            "context": context,
+        }
+        payload_name = self._attach_payload(request, "event", event)
+        if code_path is not None:
+            request["code_path"] = code_path
+        elif code_hash not in self._loaded_hashes:
+            request["code"] = code
+
+        if on_output is not None:
+            request["stream"] = True
+        if limits:
+            request["limits"] = limits
+
+        try:
+            response = self._invoke_request(request, timeout, on_output)
+            if response.get("status") == "code_required" and code is not None:
+                request["code"] = code
+                response = self._invoke_request(request, timeout, on_output)
+
+            self._loaded_hashes.add(code_hash)
+            return self._load_result(response, payload_name)
+        finally:
+            if payload_name is not None:
+                self.exchange.discard([f"{payload_name}.*"])
+
+    def invoke_batch(
+        self,
+        code_hash: str,
+        events: List[Dict[str, Any]],
+        context: Dict[str, Any],
+        timeout: float,
+        parallelism: int = 1,
+        code: Optional[str] = None,
+        code_path: Optional[str] = None,
+        limits: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Run every event through the handler in one runner request
+
+        Yields one "item" response per event as the runner completes it, in
+        completion order, followed by the final "done" (or error) response.
+        `timeout` bounds the wait for each next frame, not the whole batch.
+        """
+        request = {
+            "type": "batch",
+            "code_hash": code_hash,
+            "context": context,
+            "parallelism": parallelism,
+        }
+        if limits:
+            request["limits"] = limits
+        payload_name = self._attach_payload(request, "events", events)
+        if code_path is not None:
+            request["code_path"] = code_path
+        else:
+            # Batches are rare enough that always sending the code is simpler
+            request["code"] = code
+
+        try:
+            for response in self._stream(request, timeout):
+                if response.get("type") == "item":
+                    # Each item's result file is named after its index
+                    response = self._load_result(response, payload_name, f".{response.get('index')}")
+                yield response
+            self._loaded_hashes.add(code_hash)
+        finally:
+            if payload_name is not None:
+                self.exchange.discard([f"{payload_name}.*"])
+
+    def close(self):
+        """Close stdin so the runner exits, and fail anything still pending"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._disconnect()
+        except Exception:
+            pass
+        self._fail_pending(RunnerConnectionError("Runner connection closed"))
+
+    def _connect(self):
+        """Attach to the container; `_sock` carries frames both ways"""
+        self.socket = self.container.attach_socket(
+            params={'stdin': 1, 'stdout': 1, 'stderr': 1, 'stream': 1}
+        )
+        # docker-py hands back a SocketIO wrapper; go through the socket it
+        # wraps (an SSLSocket on TLS daemon connections) rather than its raw
+        # fd, so the bytes pass through TLS. Runners may stay idle longer than
+        # the client's request timeout, so reads must not time out.
+        self._sock = getattr(self.socket, "_sock", self.socket)
+        self._sock.settimeout(None)
+
+    def _disconnect(self):
+        self.socket.close()
+
+    def _read_streams(self) -> Iterator[Tuple[int, bytes]]:
+        """(stream, data) chunks of the runner's output until it goes away"""
+        while True:
+            header = self._read_exact(DOCKER_HEADER.size)
+            if header is None:
+                return
+            stream, length = DOCKER_HEADER.unpack(header)
+            payload = self._read_exact(length)
+            if payload is None:
+                return
+            yield stream, payload
+
+    def _attach_payload(self, request: Dict[str, Any], field: str, value: Any) -> Optional[str]:
+        """
+        Put `value` in `request[field]`, or in a payload file when it is large
+
+        Also offers the runner a file for a large result. Returns the name
+        the request's payload files start with, or None without an exchange.
+
+        The value is sized by its JSON encoding, which is spliced into the
+        frame as is when it stays inline, so it is only serialized once.
+        """
+        if self.exchange is None:
+            request[field] = value
+            return None
+
+        name = self.exchange.new_name()
+        data = encode(value, "json")
+        if len(data) >= self.exchange.threshold:
+            if self.encoding != "json":
+                data = encode(value, self.encoding)
+            request[f"{field}_file"] = self.exchange.write(f"{name}.in", data)
+            request["encoding"] = self.encoding
+        else:
+            request.setdefault(ENCODED_FIELDS, {})[field] = data
+        request["result_file"] = self.exchange.container_path(f"{name}.out")
+        request["result_encoding"] = self.encoding
+        request["result_file_threshold"] = self.exchange.threshold
+        return name
+
+    def _load_result(
+        self,
+        response: Dict[str, Any],
+        payload_name: Optional[str],
+        suffix: str = ""
+    ) -> Dict[str, Any]:
+        """Replace a result the runner wrote to its payload file with the decoded value"""
+        if payload_name is None or "result_file" not in response:
+            return response
+        # Only the file this client named is read, never a path the runner reports
+        response.pop("result_file")
+        response["result"] = self.exchange.read(
+            f"{payload_name}.out{suffix}", response.pop("result_encoding", self.encoding)
+        )
+        return response
+
+    def _invoke_request(
+        self,
+        request: Dict[str, Any],
+        timeout: float,
+        on_output: Optional[Callable[[str], None]]
+    ) -> Dict[str, Any]:
+        if on_output is None:
+            return self._request(request, timeout)
+
+        # Output frames must not extend the overall invocation timeout
+        deadline = time.monotonic() + timeout
+        for response in self._stream(request, timeout, deadline):
+            if response.get("type") == "log":
+                on_output(response.get("data", ""))
+            else:
+                return response
+
+    def _request(self, request: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        if self.closed:
+            raise RunnerConnectionError("Runner connection closed")
+
+        request_id = str(uuid.uuid4())
+        request["id"] = request_id
+        future = Future()
+        with self._pending_lock:
+            self._pending[request_id] = future
+
+        try:
+            body = self._frame_body(request)
+            self._write(FRAME_HEADER.pack(len(body)) + body)
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"Runner did not respond within {timeout} seconds")
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+
+    @staticmethod
+    def _frame_body(request: Dict[str, Any]) -> bytes:
+        """JSON body of a request frame, with already-encoded fields spliced in"""
+        encoded = request.get(ENCODED_FIELDS)
+        if not encoded:
+            return json.dumps(request).encode('utf-8')
+        # Left in the request, which is sent again if the runner asks for code
+        body = json.dumps({key: value for key, value in request.items() if key != ENCODED_FIELDS}).encode('utf-8')
+        # Requests always carry an id, so the object is never empty
+        parts = [body[:-1]]
+        for field, data in encoded.items():
+            parts.append(b", " + json.dumps(field).encode('utf-8') + b": " + data)
+        parts.append(b"}")
+        return b"".join(parts)
+
+    def _stream(
+        self,
+        request: Dict[str, Any],
+        timeout: float,
+        deadline: Optional[float] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Send a request answered by several frames and yield them until the last
+
+        `timeout` bounds the wait for each frame and `deadline` (a
+        time.monotonic() value) the whole exchange.
+        """
+        if self.closed:
+            raise RunnerConnectionError("Runner connection closed")
+
+        request_id = str(uuid.uuid4())
+        request["id"] = request_id
+        frames = queue.Queue()
+        with self._pending_lock:
+            self._pending[request_id] = frames
+
+        try:
+            body = self._frame_body(request)
+            self._write(FRAME_HEADER.pack(len(body)) + body)
+            while True:
+                wait = timeout if deadline is None else min(timeout, deadline - time.monotonic())
+                try:
+                    if wait <= 0:
+                        raise queue.Empty
+                    response = frames.get(timeout=wait)
+                except queue.Empty:
+                    raise TimeoutError(f"Runner did not respond within {timeout} seconds")
+                if isinstance(response, Exception):
+                    raise response
+                yield response
+                if response.get("type") not in CONTINUATION_TYPES:
+                    return
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+
+    def _write(self, data: bytes):
+        with self._write_lock:
+            self._sock.sendall(data)
+
+    def _read_exact(self, size: int) -> Optional[bytes]:
+        chunks = []
+        while size:
+            chunk = self._sock.recv(size)
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def _read_loop(self):
+        try:
+            for stream, payload in self._read_streams():
+                if stream == STDOUT:
+                    self._stdout.extend(payload)
+                    self._dispatch_frames()
+                elif stream == STDERR:
+                    text = payload.decode('utf-8', errors='replace')
+                    self.stderr_tail.extend(text.splitlines())
+        except OSError as e:
+            if not self.closed:
+                logger.error(f"Runner connection to {self.name} failed: {str(e)}")
+        finally:
+            self.closed = True
+            self._fail_pending(RunnerConnectionError(
+                "Runner exited: " + "\n".join(self.stderr_tail)
+            ))
+
+    def _dispatch_frames(self):
+        while len(self._stdout) >= FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(self._stdout)
+            end = FRAME_HEADER.size + length
+            if len(self._stdout) < end:
+                return
+            body = bytes(self._stdout[FRAME_HEADER.size:end])
+            del self._stdout[:end]
+
+            response = json.loads(body.decode('utf-8'))
+            with self._pending_lock:
+                waiter = self._pending.get(response.get("id"))
+            if isinstance(waiter, queue.Queue):
+                waiter.put(response)
+            elif waiter is not None and not waiter.done():
+                waiter.set_result(response)
+
+    def _fail_pending(self, error: Exception):
+        with self._pending_lock:
+            pending = list(self._pending.values())
+        for waiter in pending:
+            if isinstance(waiter, queue.Queue):
+                waiter.put(error)
+            elif not waiter.done():
+                waiter.set_exception(error)
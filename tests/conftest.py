@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+# Read at import by the modules under test, so they run without a daemon or database server
+SCRATCH = tempfile.mkdtemp(prefix="serverless-tests-")
+os.environ.setdefault("DOCKER_CLIENT_FACTORY", "fake_docker:create_client")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(SCRATCH, 'platform.sqlite3')}")
+os.environ.setdefault("ARTIFACT_DIR", os.path.join(SCRATCH, "artifacts"))
+os.environ.setdefault("RUNNER_ARTIFACT_MOUNT", os.environ["ARTIFACT_DIR"])
+os.environ.setdefault("PAYLOAD_DIR", os.path.join(SCRATCH, "payloads"))
+os.environ.setdefault("RUNNER_PAYLOAD_MOUNT", os.environ["PAYLOAD_DIR"])
+
+import fake_docker
+
+RUNNER_IMAGE = "python-runner"
+# What DockerManager passes for serve-mode runners, minus mounts and limits
+RUNNER_OPTIONS = {"environment": {"RUNNER_MODE": "serve"}, "stdin_open": True}
+
+
+@pytest.fixture
+def api():
+    """A client for the platform's HTTP API on an empty database, without starting any backend"""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    main.Base.metadata.create_all(bind=main.engine)
+    yield TestClient(main.app)
+    main.Base.metadata.drop_all(bind=main.engine)
+    main.function_cache.invalidate()
+
+
+@pytest.fixture
+def docker_client():
+    """A fake Docker daemon with the Python runner image built"""
+    client = fake_docker.create_client()
+    client.images.build(path=os.path.join(ROOT, "docker-runners", "python-runner"), tag=RUNNER_IMAGE)
+    yield client
+    client.close()
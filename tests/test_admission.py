@@ -0,0 +1,116 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def function(function_id, reserved=None, maximum=None):
+    return SimpleNamespace(id=function_id, reserved_concurrency=reserved, max_concurrency=maximum)
+
+
+def test_admits_up_to_budget_then_rejects():
+    async def scenario():
+        controller = AdmissionController(budget=2, queue_size=0)
+        await controller.acquire(function(1))
+        await controller.acquire(function(2))
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(function(3))
+        assert rejected.value.retry_after == controller.retry_after
+        assert (controller.admitted, controller.rejected) == (2, 1)
+
+    asyncio.run(scenario())
+
+
+def test_waiter_is_admitted_when_a_slot_is_released():
+    async def scenario():
+        controller = AdmissionController(budget=1, queue_timeout=1)
+        await controller.acquire(function(1))
+        waiter = asyncio.create_task(controller.acquire(function(2)))
+        await asyncio.sleep(0)
+        assert controller.stats()["waiting"] == 1
+
+        controller.release(1)
+        waited_ms = await waiter
+
+        assert waited_ms >= 0
+        assert controller.stats()["by_function"] == {2: {"running": 1, "reserved": 0, "max": None}}
+
+    asyncio.run(scenario())
+
+
+def test_waiter_is_rejected_when_the_wait_runs_out():
+    async def scenario():
+        controller = AdmissionController(budget=1, queue_timeout=0.05)
+        await controller.acquire(function(1))
+
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire(function(2))
+        assert controller.stats()["waiting"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_immediately():
+    async def scenario():
+        controller = AdmissionController(budget=1, queue_size=1, queue_timeout=1)
+        await controller.acquire(function(1))
+        waiter = asyncio.create_task(controller.acquire(function(2)))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire(function(3))
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.stats()["waiting"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_reserved_slots_are_kept_for_their_function():
+    async def scenario():
+        controller = AdmissionController(budget=2, queue_size=0)
+        reserved = function(1, reserved=1)
+        controller.configure(reserved.id, 1, None)
+        await controller.acquire(function(2))
+
+        # The only unreserved slot is taken, but function 1 still has its own
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire(function(3))
+        await controller.acquire(reserved)
+        assert controller.stats()["running"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_capped_function_does_not_hold_up_others():
+    async def scenario():
+        controller = AdmissionController(budget=3, queue_timeout=1)
+        capped = function(1, maximum=1)
+        await controller.acquire(capped)
+        blocked = asyncio.create_task(controller.acquire(capped))
+        await asyncio.sleep(0)
+
+        # Queued behind the capped waiter, yet admitted right away
+        await controller.acquire(function(2))
+        assert not blocked.done()
+
+        controller.release(capped.id)
+        await blocked
+        assert controller.stats()["by_function"][capped.id]["running"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_admit_releases_the_slot_on_exit():
+    async def scenario():
+        controller = AdmissionController(budget=1)
+        async with controller.admit(function(1)):
+            assert controller.stats()["running"] == 1
+        assert controller.stats()["running"] == 0
+
+    asyncio.run(scenario())
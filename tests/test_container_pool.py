@@ -0,0 +1,165 @@
+import time
+
+import pytest
+
+from conftest import RUNNER_IMAGE, RUNNER_OPTIONS
+from container_pool import ContainerPool, MANAGED_LABEL, OWNER_LABEL
+from runner_client import RunnerClient
+
+
+def connect(container):
+    runner = RunnerClient(container)
+    assert runner.ping(timeout=10)
+    return runner
+
+
+@pytest.fixture
+def make_pool(docker_client):
+    pools = []
+
+    def make(**options):
+        options.setdefault("min_size", 0)
+        pool = ContainerPool(docker_client, container_options=RUNNER_OPTIONS, connect=connect, **options)
+        pool.register("python", RUNNER_IMAGE)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_checkout_misses_then_hits_released_container(make_pool):
+    pool = make_pool()
+
+    first = pool.checkout("python", timeout=1)
+    pool.release(first)
+    second = pool.checkout("python", timeout=1)
+
+    assert second is first
+    stats = pool.stats()["python"]
+    assert (stats["misses"], stats["hits"], stats["created"]) == (1, 1, 1)
+    assert stats["busy"] == 1
+    pool.release(second)
+
+
+def test_start_fills_to_min_size(make_pool):
+    pool = make_pool(min_size=2)
+    pool.start()
+
+    assert pool.idle_count("python") == 2
+    pooled = pool.checkout("python", timeout=1)
+    assert pool.stats()["python"]["hits"] == 1
+    assert pooled.runner.ping()
+    pool.release(pooled)
+
+
+def test_checkout_waits_for_release_at_max_size(make_pool):
+    pool = make_pool(max_size=1)
+    pooled = pool.checkout("python", timeout=1)
+
+    with pytest.raises(TimeoutError):
+        pool.checkout("python", timeout=0.1)
+
+    pool.release(pooled)
+    assert pool.checkout("python", timeout=0.1) is pooled
+    pool.release(pooled)
+
+
+def test_checkout_of_unregistered_key_fails(make_pool):
+    pool = make_pool()
+
+    with pytest.raises(ValueError):
+        pool.checkout("cobol", timeout=1)
+
+
+def test_release_recycles_after_max_uses(make_pool, docker_client):
+    pool = make_pool(max_uses=2)
+    pooled = pool.checkout("python", timeout=1)
+    pool.release(pooled)
+    pooled = pool.checkout("python", timeout=1)
+    pool.release(pooled)
+
+    stats = pool.stats()["python"]
+    assert stats["recycled"] == 1
+    assert stats["total"] == 0
+    assert not pool.owns(pooled.container.id)
+    assert docker_client.containers.list(all=True) == []
+
+
+def test_release_discards_unhealthy_container(make_pool):
+    pool = make_pool()
+    pooled = pool.checkout("python", timeout=1)
+    pool.release(pooled, healthy=False)
+
+    stats = pool.stats()["python"]
+    assert stats["unhealthy"] == 1
+    assert stats["total"] == 0
+    assert pool.checkout("python", timeout=1) is not pooled
+
+
+def test_containers_are_labelled_with_owner(make_pool):
+    pool = make_pool(owner="instance-a")
+    pooled = pool.checkout("python", timeout=1)
+
+    assert pooled.container.labels[MANAGED_LABEL] == "true"
+    assert pooled.container.labels[OWNER_LABEL] == "instance-a"
+    assert pool.owns(pooled.container.id)
+    pool.release(pooled)
+
+
+def test_maintain_replaces_dead_idle_container(make_pool):
+    pool = make_pool(min_size=1, maintenance_interval=0)
+    pool.fill("python")
+    pooled = pool.checkout("python", timeout=1)
+    pool.release(pooled)
+    pooled.container.kill()
+
+    pool.maintain()
+
+    stats = pool.stats()["python"]
+    assert stats["unhealthy"] == 1
+    assert stats["idle"] == 1
+    replacement = pool.checkout("python", timeout=1)
+    assert replacement is not pooled
+    assert replacement.runner.ping()
+    pool.release(replacement)
+
+
+def test_maintain_keeps_healthy_idle_containers(make_pool):
+    pool = make_pool(min_size=2, maintenance_interval=0)
+    pool.fill("python")
+
+    pool.maintain()
+
+    stats = pool.stats()["python"]
+    assert (stats["idle"], stats["created"], stats["unhealthy"]) == (2, 2, 0)
+
+
+def test_maintain_evicts_idle_containers_above_min_size(make_pool):
+    pool = make_pool(min_size=1, idle_timeout=0.05)
+    first = pool.checkout("python", timeout=1)
+    second = pool.checkout("python", timeout=1)
+    pool.release(first)
+    time.sleep(0.1)
+    pool.release(second)
+    time.sleep(0.1)
+
+    pool.maintain()
+
+    stats = pool.stats()["python"]
+    assert stats["evicted"] == 1
+    assert stats["total"] == 1
+    # The least recently used container goes first
+    assert pool.checkout("python", timeout=1) is second
+    pool.release(second)
+
+
+def test_shutdown_removes_idle_containers(make_pool, docker_client):
+    pool = make_pool(min_size=2)
+    pool.start()
+
+    pool.shutdown()
+
+    assert pool.stats()["python"]["total"] == 0
+    assert docker_client.containers.list(all=True) == []
@@ -0,0 +1,109 @@
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from conftest import RUNNER_IMAGE, RUNNER_OPTIONS
+from container_pool import MANAGED_LABEL, OWNER_LABEL
+from container_reaper import ContainerReaper, default_owner
+
+
+@pytest.fixture
+def make_container(docker_client):
+    def make(name, owner=None, managed=True):
+        labels = {MANAGED_LABEL: "true"} if managed else {}
+        if owner is not None:
+            labels[OWNER_LABEL] = owner
+        return docker_client.containers.run(RUNNER_IMAGE, name=name, labels=labels, **RUNNER_OPTIONS)
+
+    return make
+
+
+@pytest.fixture
+def make_reaper(docker_client):
+    reapers = []
+
+    def make(**options):
+        options.setdefault("sweep_interval", 0)
+        reaper = ContainerReaper(docker_client, "test", **options)
+        reapers.append(reaper)
+        return reaper
+
+    yield make
+    for reaper in reapers:
+        reaper.shutdown()
+
+
+def names(docker_client):
+    return sorted(container.name for container in docker_client.containers.list(all=True))
+
+
+def exited_owner():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return f"{socket.gethostname()}-{process.pid}"
+
+
+def test_default_owner_is_unique_to_the_process(make_reaper):
+    assert make_reaper().owner == default_owner()
+    assert default_owner() != exited_owner()
+
+
+def test_first_sweep_removes_only_this_owners_containers(make_reaper, make_container, docker_client):
+    make_container("function-mine", owner="a")
+    make_container("function-unlabelled")
+    make_container("function-other", owner="b")
+    make_container("function-unmanaged", managed=False)
+    reaper = make_reaper(owner="a")
+
+    assert reaper.sweep(immediate=True) == 1
+
+    assert names(docker_client) == ["function-other", "function-unlabelled", "function-unmanaged"]
+
+
+def test_unlabelled_containers_are_removed_on_the_second_sweep(make_reaper, make_container, docker_client):
+    make_container("function-unlabelled")
+    reaper = make_reaper(owner="a")
+
+    assert reaper.sweep(immediate=True) == 0
+    assert reaper.sweep() == 1
+
+    assert names(docker_client) == []
+    assert reaper.stats()["orphans"] == 1
+
+
+def test_containers_of_an_exited_process_are_removed_on_the_second_sweep(make_reaper, make_container, docker_client):
+    make_container("function-exited", owner=exited_owner())
+    make_container("function-live", owner=default_owner())
+    reaper = make_reaper(owner="a")
+
+    reaper.sweep(immediate=True)
+    reaper.sweep()
+
+    assert names(docker_client) == ["function-live"]
+
+
+def test_claimed_containers_are_left_alone(make_reaper, make_container, docker_client):
+    owned = make_container("function-owned", owner="a")
+    reaper = make_reaper(owner="a", is_owned=lambda container_id: container_id == owned.id)
+    make_container("function-new", owner="a")
+
+    # A container claimed between the two sweeps is not taken
+    reaper.sweep()
+    reaper.is_owned = lambda container_id: True
+    assert reaper.sweep() == 0
+
+    assert names(docker_client) == ["function-new", "function-owned"]
+
+
+def test_submitted_containers_are_removed_in_the_background(make_reaper, make_container, docker_client):
+    reaper = make_reaper(owner="a")
+    reaper.start()
+    for n in range(3):
+        reaper.submit(make_container(f"function-spent-{n}", owner="a"))
+
+    reaper.shutdown()
+
+    assert names(docker_client) == []
+    assert reaper.stats() == {"removed": 3, "failed": 0, "orphans": 0, "sweeps": 0, "pending": 0}
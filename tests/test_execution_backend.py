@@ -0,0 +1,132 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from execution_backend import ExecutionBackend
+
+
+class StubBackend(ExecutionBackend):
+    """Runs nothing: executions block until `proceed` is set"""
+
+    name = "stub"
+    supported_languages = {"python": "stub"}
+
+    def __init__(self, max_concurrency=1):
+        super().__init__(max_concurrency)
+        self.proceed = threading.Event()
+        self.started = []
+        self.finished = []
+        self.killed = []
+        self.batch_error = None
+
+    def _execute_sync(self, function_id, function_name, language, code, event, timeout, **options):
+        execution = options["execution"]
+        execution["pooled"] = SimpleNamespace(name=f"runner-{function_id}")
+        self.started.append(function_id)
+        self.proceed.wait(5)
+        self.finished.append(function_id)
+        return {"error": False, "result": function_id, "logs": None}
+
+    def _execute_batch_sync(self, function_id, function_name, language, code, events, timeout,
+                            dependencies, parallelism, memory_mb=None, cpu=None, execution=None):
+        execution["pooled"] = SimpleNamespace(name=f"runner-{function_id}")
+        try:
+            for index in range(len(events)):
+                if self.batch_error is not None and index == 1:
+                    raise self.batch_error
+                yield {"index": index, "error": False, "result": index}
+                if index == 0:
+                    self.proceed.wait(5)
+        finally:
+            self.finished.append(function_id)
+
+    def _kill(self, pooled):
+        self.killed.append(pooled.name)
+        self.proceed.set()
+
+
+async def wait_until(condition, timeout=2):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+def execute(backend, function_id):
+    return backend.execute_function(function_id, function_id, "python", "", {})
+
+
+def test_abandoned_execution_keeps_its_slot_until_its_thread_returns():
+    async def scenario():
+        backend = StubBackend(max_concurrency=1)
+        # Stays blocked: killing the stub does not release it here
+        backend._kill = lambda pooled: backend.killed.append(pooled.name)
+        first = asyncio.create_task(execute(backend, "first"))
+        await wait_until(lambda: backend.started == ["first"])
+
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        second = asyncio.create_task(execute(backend, "second"))
+        await asyncio.sleep(0.1)
+
+        assert backend.killed == ["runner-first"]
+        assert backend.started == ["first"]
+
+        backend.proceed.set()
+        assert (await second)["result"] == "second"
+        assert backend.finished == ["first", "second"]
+        backend.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_slot_is_released_after_a_normal_execution():
+    async def scenario():
+        backend = StubBackend(max_concurrency=1)
+        backend.proceed.set()
+
+        results = await asyncio.gather(execute(backend, "a"), execute(backend, "b"))
+
+        assert [result["result"] for result in results] == ["a", "b"]
+        backend.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_batch_consumer_going_away_kills_the_runner_and_frees_the_slot():
+    async def scenario():
+        backend = StubBackend(max_concurrency=1)
+        batch = backend.execute_batch("batch", "batch", "python", "", [{}, {}, {}])
+
+        assert (await batch.__anext__())["index"] == 0
+        await batch.aclose()
+        await wait_until(lambda: backend.finished == ["batch"])
+
+        assert backend.killed == ["runner-batch"]
+        # The next execution gets the slot once the producer has stopped
+        assert (await asyncio.wait_for(execute(backend, "next"), 2))["result"] == "next"
+        backend.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_batch_producer_errors_reach_the_consumer():
+    async def scenario():
+        backend = StubBackend(max_concurrency=1)
+        backend.batch_error = RuntimeError("runner vanished")
+        backend.proceed.set()
+        received = []
+
+        with pytest.raises(RuntimeError, match="runner vanished"):
+            async for item in backend.execute_batch("batch", "batch", "python", "", [{}, {}, {}]):
+                received.append(item["index"])
+
+        assert received == [0]
+        assert backend.killed == []
+        backend.cleanup()
+
+    asyncio.run(scenario())
@@ -0,0 +1,155 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# main before execution_history, which imports from it
+from main import Base, Execution, ExecutionRollup, SessionLocal
+from execution_history import ExecutionRecorder, bucket_start, histogram_percentile, latency_bucket
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.sqlite3'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def entry(n, function_id=1, duration_ms=10.0, started_at=None, **fields):
+    return dict({
+        "execution_id": f"exec-{function_id}-{n}",
+        "function_id": function_id,
+        "started_at": started_at or datetime(2024, 1, 1, 12, 1),
+        "duration_ms": duration_ms,
+        "exit_code": 0,
+        "error": False,
+        "cache_hit": False,
+        "output_bytes": 100,
+    }, **fields)
+
+
+def rollups(session_factory):
+    db = session_factory()
+    try:
+        return {
+            (row.function_id, row.bucket_start): row
+            for row in db.query(ExecutionRollup).all()
+        }
+    finally:
+        db.close()
+
+
+def test_percentile_interpolates_within_the_bucket():
+    counts = [0] * 17
+    counts[latency_bucket(8)] = 10  # (5, 10]
+
+    assert histogram_percentile(counts, 0.5, max_ms=9) == 7.5
+    assert histogram_percentile(counts, 1.0, max_ms=9) == 9
+    assert histogram_percentile([0] * 17, 0.5, max_ms=0) == 0.0
+
+
+def test_bucket_start_rounds_down():
+    assert bucket_start(datetime(2024, 1, 1, 12, 7, 30), 300) == datetime(2024, 1, 1, 12, 5)
+
+
+def test_flush_writes_rows_and_folds_them_into_rollups(session_factory):
+    async def scenario():
+        recorder = ExecutionRecorder(session_factory, bucket_seconds=300)
+        await recorder.record(entry(1, duration_ms=10))
+        await recorder.record(entry(2, duration_ms=30, error=True, exit_code=124))
+        await recorder.record(entry(3, started_at=datetime(2024, 1, 1, 12, 6)))
+        await recorder.record(entry(4, function_id=2))
+        await recorder.flush()
+        return recorder
+
+    recorder = asyncio.run(scenario())
+
+    db = session_factory()
+    try:
+        assert db.query(Execution).count() == 4
+    finally:
+        db.close()
+    rows = rollups(session_factory)
+    assert set(rows) == {
+        (1, datetime(2024, 1, 1, 12, 0)), (1, datetime(2024, 1, 1, 12, 5)), (2, datetime(2024, 1, 1, 12, 0))
+    }
+    first = rows[(1, datetime(2024, 1, 1, 12, 0))]
+    assert (first.count, first.errors, first.timeouts) == (2, 1, 1)
+    assert (first.duration_sum_ms, first.duration_max_ms) == (40, 30)
+    assert sum(json.loads(first.latency_histogram)) == 2
+    assert recorder.stats()["written"] == 4
+
+
+def test_later_batches_merge_into_existing_rollups(session_factory):
+    async def scenario():
+        recorder = ExecutionRecorder(session_factory)
+        for n in range(3):
+            await recorder.record(entry(n, duration_ms=5 * (n + 1)))
+            await recorder.flush()
+
+    asyncio.run(scenario())
+
+    (row,) = rollups(session_factory).values()
+    assert (row.count, row.duration_sum_ms, row.duration_max_ms, row.output_bytes) == (3, 30, 15, 300)
+    assert json.loads(row.latency_histogram)[latency_bucket(10)] == 1
+
+
+def test_usage_samples_are_folded_without_raw_rows(session_factory):
+    async def scenario():
+        recorder = ExecutionRecorder(session_factory)
+        recorder.record_usage({"function_id": 1, "peak_memory_mb": 100.0, "peak_cpu": 0.4})
+        recorder.record_usage({"function_id": 1, "peak_memory_mb": 300.0, "peak_cpu": 1.2})
+        await recorder.flush()
+
+    asyncio.run(scenario())
+
+    (row,) = rollups(session_factory).values()
+    assert (row.count, row.usage_samples, row.peak_memory_mb, row.peak_cpu) == (0, 2, 300.0, 1.2)
+    assert sum(json.loads(row.memory_histogram)) == 2
+
+
+def test_full_buffer_drops_without_a_writer_and_waits_for_one(session_factory):
+    async def scenario():
+        idle = ExecutionRecorder(session_factory, max_buffer=1)
+        assert await idle.record(entry(1))
+        assert not await idle.record(entry(2))
+        assert idle.stats()["dropped"] == 1
+
+        recorder = ExecutionRecorder(session_factory, max_buffer=1, flush_interval=60, backpressure_timeout=5)
+        recorder.start()
+        try:
+            assert await recorder.record(entry(3))
+            # Held until the writer, woken by the full buffer, makes room
+            assert await recorder.record(entry(4))
+        finally:
+            await recorder.stop()
+        assert (recorder.stats()["written"], recorder.stats()["dropped"]) == (2, 0)
+
+    asyncio.run(scenario())
+
+
+def test_stats_endpoint_serves_rollups(api):
+    function_id = api.post(
+        "/api/functions/", json={"name": "f", "route": "/f", "language": "python", "code": "x"}
+    ).json()["id"]
+    now = datetime.utcnow()
+
+    async def record():
+        recorder = ExecutionRecorder(SessionLocal)
+        for n, duration_ms in enumerate((10, 20, 30, 40)):
+            await recorder.record(entry(n, function_id, duration_ms, now, error=n == 3))
+        await recorder.record(entry(9, function_id, started_at=now - timedelta(hours=48)))
+        await recorder.flush()
+
+    asyncio.run(record())
+    stats = api.get(f"/api/functions/{function_id}/stats", params={"hours": 1}).json()
+
+    totals = stats["totals"]
+    assert (totals["count"], totals["errors"], totals["error_rate"], totals["max_ms"]) == (4, 1, 0.25, 40)
+    assert 10 <= totals["p50_ms"] <= totals["p99_ms"] <= 40
+    assert len(stats["buckets"]) == 1
+    assert api.get("/api/functions/999/stats").status_code == 404
@@ -0,0 +1,162 @@
+import os
+
+import pytest
+
+import fake_docker
+from conftest import ROOT, RUNNER_IMAGE, RUNNER_OPTIONS
+from container_pool import ContainerPool
+from docker_manager import create_docker_client
+from execution_hosts import ExecutionHost, HostScheduler, NoHostAvailable
+from image_builder import ImageBuilder
+
+DEPENDENCIES = "requests==2.31.0"
+
+
+def mark_ready(host):
+    host.set_runtime_state("python", "ready")
+
+
+@pytest.fixture
+def make_host():
+    hosts = []
+
+    def make(name, capacity=2, warm=False, prepare=mark_ready):
+        client = fake_docker.create_client(base_url=name)
+        client.images.build(path=os.path.join(ROOT, "docker-runners", "python-runner"), tag=RUNNER_IMAGE)
+        pool = ContainerPool(client, min_size=0, container_options=RUNNER_OPTIONS)
+        pool.register("python", RUNNER_IMAGE, min_size=1 if warm else 0)
+        pool.fill("python")
+        builder = ImageBuilder(client, {"python": RUNNER_IMAGE})
+        host = ExecutionHost(name, client, pool, builder, capacity, prepare=prepare)
+        host.prepare()
+        hosts.append(host)
+        return host
+
+    yield make
+    for host in hosts:
+        host.pool.shutdown()
+        host.image_builder.shutdown()
+        host.client.close()
+
+
+def build_function_image(host, tmp_path):
+    code_file = tmp_path / "function.py"
+    code_file.write_text("def handler(event, context):\n    return event\n")
+    return host.image_builder.resolve("1", "python", str(code_file), "code-key", DEPENDENCIES, timeout=10)
+
+
+def test_warm_host_is_preferred_over_less_loaded_one(make_host):
+    cold = make_host("cold")
+    warm = make_host("warm", warm=True)
+    scheduler = HostScheduler([cold, warm], health_interval=0)
+    warm.inflight = 1
+
+    assert scheduler.acquire("python") is warm
+    assert (warm.inflight, warm.placed) == (2, 1)
+
+
+def test_host_with_image_is_preferred_over_less_loaded_one(make_host, tmp_path):
+    plain = make_host("plain")
+    built = make_host("built")
+    image = build_function_image(built, tmp_path)
+    scheduler = HostScheduler([plain, built], health_interval=0)
+    built.inflight = 1
+
+    assert built.has_image(image) and not plain.has_image(image)
+    assert scheduler.acquire(image, image=image) is built
+
+
+def test_least_loaded_strategy_ignores_warm_containers(make_host):
+    cold = make_host("cold")
+    warm = make_host("warm", warm=True)
+    scheduler = HostScheduler([warm, cold], strategy="least-loaded", health_interval=0)
+    warm.inflight = 1
+
+    assert scheduler.acquire("python") is cold
+
+
+def test_full_host_is_skipped_until_all_are_full(make_host):
+    full = make_host("full", capacity=1, warm=True)
+    other = make_host("other", capacity=1)
+    scheduler = HostScheduler([full, other], health_interval=0)
+    full.inflight = 1
+
+    assert scheduler.acquire("python") is other
+    # Both at capacity: every healthy host is a candidate again
+    assert scheduler.acquire("python") is full
+
+    scheduler.release(full)
+    scheduler.release(other)
+    assert (full.inflight, other.inflight) == (1, 0)
+
+
+def test_unhealthy_and_unready_hosts_are_not_used(make_host):
+    broken = make_host("broken", warm=True)
+    building = make_host("building", prepare=lambda host: host.set_runtime_state("python", "building"))
+    ready = make_host("ready")
+    scheduler = HostScheduler([broken, building, ready], health_interval=0)
+    broken.healthy = False
+
+    assert scheduler.acquire("python", language="python") is ready
+
+    ready.healthy = False
+    with pytest.raises(NoHostAvailable, match="ready for python"):
+        scheduler.acquire("python", language="python")
+    building.healthy = False
+    with pytest.raises(NoHostAvailable, match="No healthy"):
+        scheduler.acquire("python")
+
+
+def test_failures_take_host_out_until_it_answers_again(make_host, monkeypatch):
+    host = make_host("flaky")
+    scheduler = HostScheduler([host], failure_threshold=2, health_interval=0)
+
+    scheduler.report_failure(host, "connection reset")
+    assert host.healthy
+    scheduler.report_failure(host, "connection reset")
+    assert not host.healthy and host.last_error == "connection reset"
+
+    monkeypatch.setenv("FAKE_DOCKER_DOWN_HOSTS", "flaky")
+    scheduler.check_health()
+    assert not host.healthy
+
+    monkeypatch.delenv("FAKE_DOCKER_DOWN_HOSTS")
+    scheduler.check_health()
+    assert host.healthy and host.failures == 0
+
+
+def test_unreachable_host_is_prepared_once_it_answers(monkeypatch):
+    monkeypatch.setenv("FAKE_DOCKER_DOWN_HOSTS", "late")
+    client = fake_docker.create_client(base_url="late")
+    builder = ImageBuilder(client, {"python": RUNNER_IMAGE})
+    host = ExecutionHost("late", client, ContainerPool(client, min_size=0), builder, 2, prepare=mark_ready)
+    scheduler = HostScheduler([host], health_interval=0)
+
+    scheduler.check_health()
+    assert not host.prepared and not host.healthy
+
+    monkeypatch.delenv("FAKE_DOCKER_DOWN_HOSTS")
+    scheduler.check_health()
+    assert host.prepared and host.is_ready("python")
+    assert scheduler.acquire("python", language="python") is host
+    builder.shutdown()
+
+
+def test_client_for_unreachable_daemon_is_created_without_contacting_it(monkeypatch):
+    monkeypatch.delenv("DOCKER_CLIENT_FACTORY")
+    client = create_docker_client("tcp://127.0.0.1:1")
+    builder = ImageBuilder(client, {"python": RUNNER_IMAGE})
+    host = ExecutionHost("down", client, ContainerPool(client, min_size=0), builder, 2, prepare=mark_ready)
+    scheduler = HostScheduler([host], failure_threshold=1, health_interval=0)
+
+    scheduler.check_health()
+
+    assert not host.healthy and not host.prepared
+    assert host.last_error
+    builder.shutdown()
+    client.close()
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        HostScheduler([], strategy="random")
@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+# main before executor, which imports from it
+from main import Function, SessionLocal
+from executor import resolve_function
+from function_cache import FunctionCache
+
+
+def function(route="/a", code="v1"):
+    return Function(id=1, name=route, route=route, language="python", code=code, timeout=30000, active=True)
+
+
+def test_hit_after_put_returns_a_detached_snapshot():
+    cache = FunctionCache()
+    row = function()
+    cache.put("/a", row)
+    row.code = "changed"
+
+    cached = cache.get("/a")
+
+    assert (cached.route, cached.code, cached.timeout) == ("/a", "v1", 30000)
+    assert cache.get("/b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_ttl():
+    cache = FunctionCache(ttl=0.01)
+    cache.put("/a", function())
+    time.sleep(0.02)
+
+    assert cache.get("/a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = FunctionCache(max_size=2)
+    for route in ("/a", "/b"):
+        cache.put(route, function(route))
+    cache.get("/a")
+    cache.put("/c", function("/c"))
+
+    assert cache.get("/b") is None
+    assert cache.get("/a") is not None and cache.get("/c") is not None
+
+
+def test_invalidate_drops_routes_or_everything():
+    cache = FunctionCache()
+    for route in ("/a", "/b", "/c"):
+        cache.put(route, function(route))
+
+    cache.invalidate("/a")
+    assert cache.get("/a") is None and cache.get("/b") is not None
+    cache.invalidate()
+    assert cache.stats()["size"] == 0
+
+
+def test_lookup_racing_a_write_is_not_stored():
+    cache = FunctionCache()
+    generation = cache.generation
+    cache.invalidate("/a")
+
+    snapshot = cache.put("/a", function(code="stale"), generation)
+
+    assert snapshot.code == "stale"
+    assert cache.get("/a") is None
+
+
+def test_version_change_from_another_worker_clears_the_cache():
+    versions = [1]
+    cache = FunctionCache(version_loader=lambda: versions[0], version_check_interval=0)
+    cache.get("/a")
+    cache.put("/a", function())
+    assert cache.get("/a") is not None
+
+    versions[0] = 2
+
+    assert cache.get("/a") is None
+    assert cache.stats()["version"] == 2
+
+
+def test_aget_polls_the_async_version_loader():
+    async def scenario():
+        versions = [1]
+
+        async def load_version():
+            return versions[0]
+
+        cache = FunctionCache(
+            version_loader=lambda: 1 / 0, version_check_interval=0, async_version_loader=load_version
+        )
+        await cache.aget("/a")
+        cache.put("/a", function())
+        assert await cache.aget("/a") is not None
+
+        versions[0] = 2
+        assert await cache.aget("/a") is None
+
+    asyncio.run(scenario())
+
+
+def test_writes_through_the_api_invalidate_the_route(api):
+    created = api.post("/api/functions/", json={"name": "f", "route": "/f", "language": "python", "code": "v1"}).json()
+    db = SessionLocal()
+    try:
+        assert resolve_function("f", db).code == "v1"
+        api.put(f"/api/functions/{created['id']}", json={"code": "v2"})
+        assert resolve_function("f", db).code == "v2"
+
+        api.put(f"/api/functions/{created['id']}", json={"route": "/g"})
+        assert resolve_function("g", db).code == "v2"
+        api.delete(f"/api/functions/{created['id']}")
+        with pytest.raises(HTTPException):
+            resolve_function("g", db)
+    finally:
+        db.close()
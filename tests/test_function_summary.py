@@ -0,0 +1,58 @@
+import pytest
+
+
+@pytest.fixture
+def functions(api):
+    """Six functions, alternating between Python and JavaScript, the last Python one inactive"""
+    ids = []
+    for n in range(6):
+        language = "python" if n % 2 == 0 else "javascript"
+        created = api.post("/api/functions/", json={
+            "name": f"f{n}", "route": f"/f{n}", "language": language, "code": "x" * 1000
+        }).json()
+        ids.append(created["id"])
+    api.put(f"/api/functions/{ids[4]}", json={"active": False})
+    return ids
+
+
+def test_pages_follow_the_cursor_without_code(api, functions):
+    first = api.get("/api/functions/summary", params={"limit": 4}).json()
+    second = api.get("/api/functions/summary", params={"limit": 4, "after": first["next_cursor"]}).json()
+
+    assert [item["id"] for item in first["items"]] == functions[:4]
+    assert first["next_cursor"] == functions[3]
+    assert [item["id"] for item in second["items"]] == functions[4:]
+    assert second["next_cursor"] is None
+    assert all("code" not in item for item in first["items"] + second["items"])
+
+
+def test_filters_apply_before_paging(api, functions):
+    page = api.get("/api/functions/summary", params={"language": "python", "active": True, "limit": 1}).json()
+    rest = api.get("/api/functions/summary", params={
+        "language": "python", "active": True, "after": page["next_cursor"]
+    }).json()
+
+    assert [item["id"] for item in page["items"] + rest["items"]] == functions[0:4:2]
+
+
+def test_unchanged_listing_is_not_modified(api, functions):
+    response = api.get("/api/functions/summary")
+    etag = response.headers["ETag"]
+
+    unchanged = api.get("/api/functions/summary", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+
+    # Another page or filter is a different representation
+    assert api.get("/api/functions/summary", params={"limit": 2}, headers={"If-None-Match": etag}).status_code == 200
+
+    api.put(f"/api/functions/{functions[0]}", json={"timeout": 1000})
+    changed = api.get("/api/functions/summary", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_etag_in_a_list_matches(api, functions):
+    etag = api.get("/api/functions/summary").headers["ETag"]
+
+    assert api.get("/api/functions/summary", headers={"If-None-Match": f'"other", {etag}'}).status_code == 304
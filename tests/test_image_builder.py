@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+import fake_docker
+from conftest import ROOT, RUNNER_IMAGE
+from image_builder import ImageBuilder, RUNNER_DIGEST_LABEL
+
+DEPENDENCIES = "requests==2.31.0\n"
+RUNNER_DIR = os.path.join(ROOT, "docker-runners", "python-runner")
+
+
+@pytest.fixture
+def builder(docker_client):
+    builder = ImageBuilder(docker_client, {"python": RUNNER_IMAGE})
+    yield builder
+    builder.shutdown()
+
+
+def test_dependency_declarations_are_normalized():
+    normalized = ImageBuilder.normalize_dependencies("python", "b==1  # pinned\n\na>=2\nb==1\n")
+
+    assert normalized == "a>=2\nb==1\n"
+    with pytest.raises(ValueError):
+        ImageBuilder.normalize_dependencies("python", "--index-url http://example.com\n")
+    with pytest.raises(ValueError):
+        ImageBuilder.normalize_dependencies("javascript", "[]")
+
+
+def test_dependency_sets_share_an_image(builder):
+    assert builder.dependency_image("python", "b\na\n") == builder.dependency_image("python", "a\nb\n")
+    assert builder.dependency_image("python", "a\n") != builder.dependency_image("python", "a\nb\n")
+
+
+def test_rebuilt_base_image_changes_dependent_tags(builder, docker_client, tmp_path):
+    code_file = tmp_path / "function.py"
+    code_file.write_text("def handler(event, context):\n    return event\n")
+    first = builder.resolve("1", "python", str(code_file), "code-key", DEPENDENCIES, timeout=10)
+    first_deps = builder.dependency_image("python", DEPENDENCIES)
+
+    docker_client.images.build(path=RUNNER_DIR, tag=RUNNER_IMAGE)
+    # Cached until the platform (re)builds the base image itself
+    assert builder.function_image("1", "python", "code-key", DEPENDENCIES) == first
+    builder.refresh_base_image("python")
+    second = builder.resolve("1", "python", str(code_file), "code-key", DEPENDENCIES, timeout=10)
+
+    assert second != first
+    assert builder.dependency_image("python", DEPENDENCIES) != first_deps
+    assert docker_client.images.get(second)
+
+
+def test_hosts_with_the_same_runner_sources_agree_on_tags():
+    clients = [fake_docker.create_client(base_url=name) for name in ("a", "b")]
+    for client in clients:
+        client.images.build(path=RUNNER_DIR, tag=RUNNER_IMAGE, labels={RUNNER_DIGEST_LABEL: "digest"})
+    builders = [ImageBuilder(client, {"python": RUNNER_IMAGE}) for client in clients]
+
+    tags = {builder.function_image("1", "python", "code-key", DEPENDENCIES) for builder in builders}
+
+    assert len(tags) == 1
+    for builder, client in zip(builders, clients):
+        builder.shutdown()
+        client.close()
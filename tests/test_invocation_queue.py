@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from main import Base, Function, Invocation
+from invocation_queue import InvocationQueue, attempt_execution_id
+
+
+async def never_called(function_id, event, execution_id):
+    raise AssertionError("the tests drive the queue through _claim and _finish")
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'queue.sqlite3'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def queue(session_factory):
+    return InvocationQueue(session_factory, never_called, max_attempts=3, retry_backoff=2.0, stale_after=60)
+
+
+def enqueue(queue, session_factory, event=None, function_id=1):
+    db = session_factory()
+    try:
+        return queue.enqueue(db, function_id, event or {"n": 1}).id
+    finally:
+        db.close()
+
+
+def add_function(session_factory, timeout):
+    db = session_factory()
+    try:
+        function = Function(name="slow", route="slow", language="python", code="", timeout=timeout)
+        db.add(function)
+        db.commit()
+        return function.id
+    finally:
+        db.close()
+
+
+def started(session_factory, seconds_ago):
+    db = session_factory()
+    try:
+        db.query(Invocation).update({Invocation.started_at: datetime.utcnow() - timedelta(seconds=seconds_ago)})
+        db.commit()
+    finally:
+        db.close()
+
+
+def load(session_factory, invocation_id):
+    db = session_factory()
+    try:
+        return db.query(Invocation).filter(Invocation.id == invocation_id).first()
+    finally:
+        db.close()
+
+
+def make_available(session_factory, invocation_id):
+    db = session_factory()
+    try:
+        db.query(Invocation).filter(Invocation.id == invocation_id).update(
+            {Invocation.available_at: datetime.utcnow()}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_claim_runs_first_attempt_under_the_invocation_id(queue, session_factory):
+    invocation_id = enqueue(queue, session_factory, {"a": 1})
+    execution_id = load(session_factory, invocation_id).execution_id
+
+    claimed = queue._claim("worker-1")
+
+    assert claimed == (invocation_id, 1, {"a": 1}, execution_id)
+    invocation = load(session_factory, invocation_id)
+    assert (invocation.status, invocation.attempts, invocation.worker) == ("running", 1, "worker-1")
+    assert queue._claim("worker-2") is None
+
+
+def test_success_is_recorded(queue, session_factory):
+    invocation_id = enqueue(queue, session_factory)
+    queue._claim("worker")
+
+    queue._finish(invocation_id, {"error": False, "result": {"ok": True}, "logs": "hi"})
+
+    invocation = load(session_factory, invocation_id)
+    assert (invocation.status, invocation.result, invocation.logs) == ("succeeded", '{"ok": true}', "hi")
+    assert queue.completed == 1
+
+
+def test_failures_are_retried_with_backoff_then_dead_lettered(queue, session_factory):
+    invocation_id = enqueue(queue, session_factory)
+
+    for attempt in (1, 2):
+        before = datetime.utcnow()
+        claimed = queue._claim("worker")
+        assert claimed[3] == attempt_execution_id(load(session_factory, invocation_id).execution_id, attempt)
+        queue._finish(invocation_id, {"error": True, "message": "boom"})
+
+        invocation = load(session_factory, invocation_id)
+        assert invocation.status == "queued"
+        assert invocation.available_at >= before + timedelta(seconds=2.0 ** attempt)
+        # Not runnable again until the backoff is over
+        assert queue._claim("worker") is None
+        make_available(session_factory, invocation_id)
+
+    queue._claim("worker")
+    queue._finish(invocation_id, {"error": True, "message": "boom"})
+
+    invocation = load(session_factory, invocation_id)
+    assert (invocation.status, invocation.attempts, invocation.error_message) == ("dead", 3, "boom")
+    assert invocation.finished_at is not None
+    assert (queue.retried, queue.dead_lettered) == (2, 1)
+
+
+def test_permanent_failure_is_dead_lettered_at_once(queue, session_factory):
+    invocation_id = enqueue(queue, session_factory)
+    queue._claim("worker")
+
+    queue._finish(invocation_id, {"error": True, "permanent": True, "message": "Function not found"})
+
+    invocation = load(session_factory, invocation_id)
+    assert (invocation.status, invocation.attempts) == ("dead", 1)
+    assert queue.retried == 0
+
+
+def test_throttled_attempt_does_not_count(queue, session_factory):
+    invocation_id = enqueue(queue, session_factory)
+    queue._claim("worker")
+
+    queue._finish(invocation_id, {"error": True, "throttled": True, "message": "Throttled"})
+
+    invocation = load(session_factory, invocation_id)
+    assert (invocation.status, invocation.attempts) == ("queued", 0)
+    assert invocation.available_at > datetime.utcnow()
+    assert (queue.throttled, queue.retried) == (1, 0)
+
+
+def test_stale_running_rows_are_requeued_or_dead_lettered(queue, session_factory):
+    retried = enqueue(queue, session_factory)
+    exhausted = enqueue(queue, session_factory)
+    queue._claim("worker")
+    queue._claim("worker")
+
+    started(session_factory, 120)
+    db = session_factory()
+    try:
+        db.query(Invocation).filter(Invocation.id == exhausted).update({Invocation.attempts: 3})
+        db.commit()
+    finally:
+        db.close()
+
+    queue._requeue_stale()
+
+    assert load(session_factory, retried).status == "queued"
+    assert load(session_factory, exhausted).status == "dead"
+    assert queue.dead_lettered == 1
+
+
+def test_recent_running_rows_are_left_alone(queue, session_factory):
+    invocation_id = enqueue(queue, session_factory)
+    queue._claim("worker")
+
+    queue._requeue_stale()
+
+    assert load(session_factory, invocation_id).status == "running"
+
+
+def test_rows_are_not_stale_before_their_function_could_time_out(queue, session_factory):
+    function_id = add_function(session_factory, timeout=3600 * 1000)
+    invocation_id = enqueue(queue, session_factory, function_id=function_id)
+    queue._claim("worker")
+
+    # Well past stale_after, but still within the function's own timeout
+    started(session_factory, 1800)
+    queue._requeue_stale()
+    assert load(session_factory, invocation_id).status == "running"
+
+    started(session_factory, 3600 + 120)
+    queue._requeue_stale()
+    assert load(session_factory, invocation_id).status == "queued"
+
+
+def test_attempt_execution_id():
+    assert attempt_execution_id("exec-1", 1) == "exec-1"
+    assert attempt_execution_id("exec-1", 3) == "exec-1-3"
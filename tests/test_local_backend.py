@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+
+from local_backend import LocalProcessBackend
+
+PYTHON_CODE = (
+    "import os\n"
+    "COUNT = [0]\n\n"
+    "def handler(event, context):\n"
+    "    COUNT[0] += 1\n"
+    "    if event.get('spin'):\n"
+    "        while True:\n"
+    "            pass\n"
+    "    if event.get('fail'):\n"
+    "        raise ValueError('boom')\n"
+    "    print('called')\n"
+    "    return {'count': COUNT[0], 'event': event}\n"
+)
+JAVASCRIPT_CODE = (
+    "exports.handler = async (event, context) => {\n"
+    "    if (event.spin) { while (true) {} }\n"
+    "    console.log('called');\n"
+    "    return {event};\n"
+    "};\n"
+)
+BOTH_LANGUAGES = pytest.mark.parametrize(
+    "language,code", [("python", PYTHON_CODE), ("javascript", JAVASCRIPT_CODE)], ids=["python", "javascript"]
+)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setenv("LOCAL_POOL_MIN_SIZE", "0")
+    monkeypatch.setenv("PYTHON_PRELOAD_MODULES", "")
+    backend = LocalProcessBackend()
+    backend.prepare()
+    yield backend
+    backend.cleanup()
+
+
+def execute(backend, language, code, event, **options):
+    return asyncio.run(backend.execute_function("1", "test", language, code, event, **options))
+
+
+@BOTH_LANGUAGES
+def test_result_contract_matches_the_docker_backend(backend, language, code):
+    result = execute(backend, language, code, {"n": 1})
+
+    assert result["error"] is False
+    assert result["result"]["event"] == {"n": 1}
+    assert result["logs"] == "called\n"
+    assert backend.pool_stats()[language]["created"] == 1
+
+
+def test_python_calls_do_not_share_state(backend):
+    first = execute(backend, "python", PYTHON_CODE, {})
+    second = execute(backend, "python", PYTHON_CODE, {})
+
+    assert first["result"]["count"] == second["result"]["count"] == 1
+    assert backend.pool_stats()["python"]["hits"] == 1
+
+
+def test_handler_errors_keep_the_runner(backend):
+    failed = execute(backend, "python", PYTHON_CODE, {"fail": True})
+
+    assert failed["error"] and "boom" in failed["logs"]
+    assert execute(backend, "python", PYTHON_CODE, {})["error"] is False
+    assert backend.pool_stats()["python"]["unhealthy"] == 0
+
+
+@BOTH_LANGUAGES
+def test_cpu_limit_stops_a_spinning_handler_before_the_timeout(backend, language, code):
+    started = time.perf_counter()
+    result = execute(backend, language, code, {"spin": True}, timeout=10000, cpu=0.1)
+
+    assert result["error"] and not result.get("timeout")
+    assert "CPU time" in result["message"] + (result.get("logs") or "")
+    assert time.perf_counter() - started < 5
+    # The next call is not held to the spent budget
+    assert execute(backend, language, code, {"n": 2})["result"]["event"] == {"n": 2}
+
+
+def test_functions_with_dependencies_are_refused(backend):
+    result = execute(backend, "python", PYTHON_CODE, {}, dependencies="requests")
+
+    assert result["error"] and "dependencies" in result["message"]
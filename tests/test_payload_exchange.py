@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+
+from conftest import ROOT, RUNNER_IMAGE, RUNNER_OPTIONS
+from payload_exchange import PayloadExchange, encode, supported_encodings
+from runner_client import RunnerClient
+
+THRESHOLD = 1024
+HANDLER = "def handler(event, context):\n    return {'size': len(event['blob']), 'echo': event['blob'] * event['repeat']}\n"
+JS_HANDLER = "exports.handler = async (event) => ({size: event.blob.length, echo: event.blob.repeat(event.repeat)});\n"
+
+
+@pytest.fixture
+def exchange(tmp_path):
+    # Fake containers are local processes, so they see the directory at its own path
+    return PayloadExchange(str(tmp_path), mount=str(tmp_path), threshold=THRESHOLD)
+
+
+@pytest.fixture
+def connect(docker_client, exchange):
+    runners = []
+
+    def connect(image=RUNNER_IMAGE):
+        container = docker_client.containers.run(image, name=f"function-payload-{len(runners)}", **RUNNER_OPTIONS)
+        runner = RunnerClient(container, exchange=exchange)
+        assert runner.ping(timeout=10)
+        runners.append(runner)
+        return runner
+
+    yield connect
+    for runner in runners:
+        runner.close()
+
+
+def test_encoding_is_negotiated_with_the_runner(tmp_path):
+    auto = PayloadExchange(str(tmp_path), mount="/payloads")
+    pinned = PayloadExchange(str(tmp_path), mount="/payloads", encoding="json")
+
+    assert auto.choose_encoding(["msgpack", "json"]) == supported_encodings()[0]
+    assert auto.choose_encoding(None) == "json"
+    assert pinned.choose_encoding(["msgpack", "json"]) == "json"
+    assert auto.container_path("x.in") == "/payloads/x.in"
+
+
+@pytest.mark.parametrize("encoding", supported_encodings())
+def test_written_files_are_read_back_once(exchange, encoding):
+    value = {"blob": "x" * 10, "n": [1, 2]}
+    exchange.write("a.out", encode(value, encoding))
+
+    assert exchange.read("a.out", encoding) == value
+    assert os.listdir(exchange.root) == []
+    assert exchange.stats()["files_read"] == 1
+
+
+def test_garbage_collection_removes_only_old_files(exchange):
+    exchange.write("old.in", b"{}")
+    exchange.write("new.in", b"{}")
+    an_hour_ago = time.time() - 3600
+    os.utime(os.path.join(exchange.root, "old.in"), (an_hour_ago, an_hour_ago))
+
+    assert exchange.collect_garbage(min_age=60) == 1
+    assert os.listdir(exchange.root) == ["new.in"]
+
+
+@pytest.mark.parametrize(
+    "image,code", [(RUNNER_IMAGE, HANDLER), ("javascript-runner", JS_HANDLER)], ids=["python", "javascript"]
+)
+def test_large_payloads_go_through_files(docker_client, connect, exchange, image, code):
+    if image != RUNNER_IMAGE:
+        docker_client.images.build(path=os.path.join(ROOT, "docker-runners", "javascript-runner"), tag=image)
+    runner = connect(image)
+    blob = "y" * (THRESHOLD * 4)
+
+    response = runner.invoke("large", {"blob": blob, "repeat": 2}, {}, timeout=10, code=code)
+
+    assert response["result"] == {"size": len(blob), "echo": blob * 2}
+    stats = exchange.stats()
+    assert (stats["files_written"], stats["files_read"]) == (1, 1)
+    assert os.listdir(exchange.root) == []
+
+
+def test_small_payloads_stay_in_the_frame(connect, exchange):
+    runner = connect()
+
+    response = runner.invoke("small", {"blob": "z", "repeat": 3}, {}, timeout=10, code=HANDLER)
+
+    assert response["result"] == {"size": 1, "echo": "zzz"}
+    assert exchange.stats()["files_written"] == exchange.stats()["files_read"] == 0
+    assert os.listdir(exchange.root) == []
@@ -0,0 +1,64 @@
+import pytest
+
+from conftest import RUNNER_IMAGE, RUNNER_OPTIONS
+from runner_client import RunnerClient
+
+HANDLER = "import os\n\ndef handler(event, context):\n    return {'event': event, 'pid': os.getpid()}\n"
+
+
+@pytest.fixture
+def start_runner(docker_client):
+    runners = []
+
+    def start(**environment):
+        options = dict(RUNNER_OPTIONS, environment=dict(RUNNER_OPTIONS["environment"], **environment))
+        container = docker_client.containers.run(RUNNER_IMAGE, name=f"function-test-{len(runners)}", **options)
+        runner = RunnerClient(container)
+        assert runner.ping(timeout=10)
+        runners.append(runner)
+        return runner
+
+    yield start
+    for runner in runners:
+        runner.close()
+
+
+def invoke(runner, code_hash, code=None, event=None):
+    return runner.invoke(code_hash, event or {}, {}, timeout=10, code=code)
+
+
+def test_zygote_survives_handler_exiting_at_import(start_runner):
+    runner = start_runner(RUNNER_ZYGOTE="1")
+    assert invoke(runner, "good", HANDLER, {"n": 1})["status"] == "ok"
+
+    failed = invoke(runner, "exits", "import sys\nsys.exit(3)\n")
+    assert failed["status"] == "error"
+    assert not failed.get("fatal")
+
+    response = invoke(runner, "good", event={"n": 2})
+    assert (response["status"], response["result"]["event"]) == ("ok", {"n": 2})
+    assert runner.ping()
+
+
+def test_dead_zygote_retires_the_runner(start_runner):
+    runner = start_runner(RUNNER_ZYGOTE="1")
+    invoke(runner, "kills", "import os\nos._exit(1)\n")
+
+    response = invoke(runner, "good", HANDLER)
+
+    assert response["status"] == "error"
+    assert response["fatal"]
+    assert not runner.ping()
+
+
+def test_zygote_children_inherit_cached_handlers(start_runner):
+    runner = start_runner(RUNNER_ZYGOTE="1")
+    code = "import os\nIMPORTED_IN = os.getpid()\n\ndef handler(event, context):\n    return [IMPORTED_IN, os.getpid()]\n"
+
+    first = invoke(runner, "inherited", code)["result"]
+    second = invoke(runner, "inherited")["result"]
+
+    # Imported once, in the zygote, and forked into a new child for each call
+    assert first[0] == second[0]
+    assert first[0] not in (first[1], second[1])
+    assert first[1] != second[1]
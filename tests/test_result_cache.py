@@ -0,0 +1,176 @@
+import asyncio
+import time
+
+import pytest
+
+from result_cache import MemoryResultBackend, ResultCache, SqliteResultBackend, event_hash
+
+
+class Counting:
+    """An execute callable that counts its calls and finishes when released"""
+
+    def __init__(self, result=None):
+        self.calls = 0
+        self.result = result or {"error": False, "result": 1}
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return dict(self.result, call=self.calls)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_event_hash_ignores_key_order():
+    assert event_hash({"a": 1, "b": [1, 2]}) == event_hash({"b": [1, 2], "a": 1})
+    assert event_hash({"a": 1}) != event_hash({"a": 2})
+
+
+def test_key_changes_with_code_and_dependencies():
+    base = ResultCache.key(1, "code", {"a": 1}, "requests==2.31.0")
+
+    assert ResultCache.key(1, "code", {"a": 1}, "requests==2.31.0") == base
+    assert ResultCache.key(1, "other", {"a": 1}, "requests==2.31.0") != base
+    assert ResultCache.key(1, "code", {"a": 1}, "requests==2.32.0") != base
+    assert ResultCache.key(1, "code", {"a": 1}) != base
+
+
+def test_memory_backend_expires_and_evicts_least_recently_used():
+    backend = MemoryResultBackend(max_entries=2)
+    backend.set("a", {"v": "a"}, ttl=60)
+    backend.set("b", {"v": "b"}, ttl=60)
+    backend.get("a")
+    backend.set("c", {"v": "c"}, ttl=60)
+
+    assert backend.get("b") is None
+    assert (backend.get("a"), backend.get("c")) == ({"v": "a"}, {"v": "c"})
+
+    backend.set("short", {"v": "short"}, ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get("short") is None
+
+
+def test_sqlite_backend_round_trips_and_expires(tmp_path):
+    backend = SqliteResultBackend(str(tmp_path / "results.sqlite3"))
+    backend.set("k", {"error": False, "result": [1, 2]}, ttl=60)
+    backend.set("gone", {"error": False}, ttl=-1)
+
+    assert backend.get("k") == {"error": False, "result": [1, 2]}
+    assert backend.get("gone") is None
+    assert len(backend) == 2
+
+
+def test_successful_result_is_served_from_cache():
+    async def scenario():
+        cache = ResultCache(MemoryResultBackend())
+        execute = Counting()
+        execute.release.set()
+
+        first = await cache.get_or_execute("k", 60, execute)
+        second = await cache.get_or_execute("k", 60, execute)
+
+        assert first == (dict(execute.result, call=1), False)
+        assert second == (dict(execute.result, call=1), True)
+        assert execute.calls == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_requests_share_one_execution():
+    async def scenario():
+        cache = ResultCache(MemoryResultBackend())
+        execute = Counting()
+        tasks = [asyncio.create_task(cache.get_or_execute("k", 60, execute)) for _ in range(3)]
+        await settle()
+        execute.release.set()
+
+        results = await asyncio.gather(*tasks)
+
+        assert execute.calls == 1
+        assert [cached for _, cached in results] == [False, True, True]
+        assert cache.stats()["coalesced"] == 2
+        assert cache.stats()["inflight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_errors_are_shared_but_not_cached():
+    async def scenario():
+        cache = ResultCache(MemoryResultBackend())
+        execute = Counting({"error": True, "message": "boom"})
+        leader = asyncio.create_task(cache.get_or_execute("k", 60, execute))
+        await settle()
+        waiter = asyncio.create_task(cache.get_or_execute("k", 60, execute))
+        await settle()
+        execute.release.set()
+
+        assert (await leader)[1] is False
+        result, cached = await waiter
+        assert result["error"] and cached is False
+        assert len(cache.backend) == 0
+
+    asyncio.run(scenario())
+
+
+def test_waiter_takes_over_when_the_leader_is_cancelled():
+    async def scenario():
+        cache = ResultCache(MemoryResultBackend())
+        execute = Counting()
+        leader = asyncio.create_task(cache.get_or_execute("k", 60, execute))
+        await settle()
+        waiters = [asyncio.create_task(cache.get_or_execute("k", 60, execute)) for _ in range(2)]
+        await settle()
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        await settle()
+        execute.release.set()
+        results = await asyncio.gather(*waiters)
+
+        # One waiter ran it again and the other shared that run
+        assert execute.calls == 2
+        assert sorted(cached for _, cached in results) == [False, True]
+        assert {result["call"] for result, _ in results} == {2}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_disturb_the_execution():
+    async def scenario():
+        cache = ResultCache(MemoryResultBackend())
+        execute = Counting()
+        leader = asyncio.create_task(cache.get_or_execute("k", 60, execute))
+        await settle()
+        waiter = asyncio.create_task(cache.get_or_execute("k", 60, execute))
+        await settle()
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        execute.release.set()
+
+        assert await leader == (dict(execute.result, call=1), False)
+        assert execute.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_zero_ttl_coalesces_without_storing():
+    async def scenario():
+        cache = ResultCache(MemoryResultBackend())
+        execute = Counting()
+        execute.release.set()
+
+        await cache.get_or_execute("k", 0, execute)
+        await cache.get_or_execute("k", 0, execute)
+
+        assert execute.calls == 2
+        assert len(cache.backend) == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,165 @@
+import importlib.util
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from conftest import ROOT, RUNNER_IMAGE, RUNNER_OPTIONS
+from runner_client import DOCKER_HEADER, FRAME_HEADER, STDERR, STDOUT, RunnerClient, RunnerConnectionError
+
+
+def load_entrypoint():
+    path = os.path.join(ROOT, "docker-runners", "python-runner", "entrypoint.py")
+    spec = importlib.util.spec_from_file_location("python_runner_entrypoint", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ScriptedContainer:
+    """A container whose attach socket the test writes Docker stream frames to"""
+
+    name = "function-scripted"
+
+    def __init__(self):
+        self.client_end, self.runner_end = socket.socketpair()
+        self.requests = self.runner_end.makefile("rb")
+
+    def attach_socket(self, params):
+        return self.client_end
+
+    def read_request(self):
+        (length,) = FRAME_HEADER.unpack(self.requests.read(FRAME_HEADER.size))
+        return json.loads(self.requests.read(length))
+
+    def send(self, stream, data):
+        self.runner_end.sendall(DOCKER_HEADER.pack(stream, len(data)) + data)
+
+    def exit(self):
+        self.requests.close()
+        self.runner_end.close()
+
+    def respond(self, response, chunk_size=None):
+        """Send `response` as one runner frame, split over Docker frames of `chunk_size`"""
+        body = json.dumps(response).encode("utf-8")
+        frame = FRAME_HEADER.pack(len(body)) + body
+        chunk_size = chunk_size or len(frame)
+        for start in range(0, len(frame), chunk_size):
+            self.send(STDOUT, frame[start:start + chunk_size])
+
+
+@pytest.fixture
+def scripted():
+    container = ScriptedContainer()
+    yield container, RunnerClient(container)
+    container.exit()
+
+
+def in_background(call, *args, **kwargs):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = call(*args, **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def test_responses_are_routed_by_request_id(scripted):
+    container, client = scripted
+    first, first_outcome = in_background(client.invoke, "a", {"n": 1}, {}, timeout=5, code="code")
+    first_request = container.read_request()
+    second, second_outcome = in_background(client.invoke, "b", {"n": 2}, {}, timeout=5, code="code")
+    second_request = container.read_request()
+
+    # Answered out of order, split across stream frames, with stderr in between
+    container.respond({"id": second_request["id"], "status": "ok", "result": 2}, chunk_size=7)
+    container.send(STDERR, b"warming up\n")
+    container.respond({"id": first_request["id"], "status": "ok", "result": 1}, chunk_size=3)
+    first.join(5)
+    second.join(5)
+
+    assert (first_outcome["result"]["result"], second_outcome["result"]["result"]) == (1, 2)
+    assert (first_request["event"], second_request["event"]) == ({"n": 1}, {"n": 2})
+    assert list(client.stderr_tail) == ["warming up"]
+
+
+def test_code_is_sent_once_and_again_when_the_runner_asks(scripted):
+    container, client = scripted
+    thread, _ = in_background(client.invoke, "a", {}, {}, timeout=5, code="code")
+    request = container.read_request()
+    container.respond({"id": request["id"], "status": "ok"})
+    thread.join(5)
+    assert request["code"] == "code"
+
+    thread, outcome = in_background(client.invoke, "a", {}, {}, timeout=5, code="code")
+    request = container.read_request()
+    assert "code" not in request
+    container.respond({"id": request["id"], "status": "code_required"})
+    retry = container.read_request()
+    container.respond({"id": retry["id"], "status": "ok", "result": "reloaded"})
+    thread.join(5)
+
+    assert retry["code"] == "code"
+    assert outcome["result"]["result"] == "reloaded"
+
+
+def test_runner_exit_fails_pending_requests_with_its_stderr(scripted):
+    container, client = scripted
+    thread, outcome = in_background(client.invoke, "a", {}, {}, timeout=5, code="code")
+    container.read_request()
+
+    container.send(STDERR, b"Traceback: boom\n")
+    container.exit()
+    thread.join(5)
+
+    assert isinstance(outcome["error"], RunnerConnectionError)
+    assert "boom" in str(outcome["error"])
+    assert client.closed and not client.ping(timeout=1)
+
+
+def test_unanswered_request_times_out(scripted):
+    _, client = scripted
+
+    with pytest.raises(TimeoutError):
+        client.invoke("a", {}, {}, timeout=0.1, code="code")
+
+
+def test_module_cache_evicts_least_recently_used():
+    entrypoint = load_entrypoint()
+    loaded = []
+    cache = entrypoint.ModuleCache(2, loader=lambda code_hash, code, code_path: loaded.append(code_hash) or code)
+
+    for code_hash in ("a", "b"):
+        cache.load(code_hash, f"handler {code_hash}")
+    assert cache.get("a") == "handler a"
+    cache.load("c", "handler c")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("handler a", "handler c")
+    assert loaded == ["a", "b", "c"]
+
+
+def test_runner_reloads_an_evicted_handler(docker_client):
+    options = dict(RUNNER_OPTIONS, environment=dict(RUNNER_OPTIONS["environment"], RUNNER_MODULE_CACHE="1"))
+    runner = RunnerClient(docker_client.containers.run(RUNNER_IMAGE, name="function-cache", **options))
+    assert runner.ping(timeout=10)
+    code = "import uuid\nLOADED = uuid.uuid4().hex\n\ndef handler(event, context):\n    return LOADED\n"
+
+    try:
+        first = runner.invoke("a", {}, {}, timeout=10, code=code)["result"]
+        cached = runner.invoke("a", {}, {}, timeout=10, code=code)["result"]
+        runner.invoke("b", {}, {}, timeout=10, code=code)
+        # "a" was evicted by "b", so the runner asks for its code again
+        reloaded = runner.invoke("a", {}, {}, timeout=10, code=code)["result"]
+    finally:
+        runner.close()
+
+    assert first == cached
+    assert reloaded != first